@@ -1,17 +1,60 @@
-import random
-import cv2
-import mediapipe as mp
+import importlib
 import streamlit as st
-import tempfile
+import threading
+import time
 import os
-import numpy as np
-import pandas as pd
-
-# CSV file to store player data
-CSV_FILE = "soccer_player_data.csv"
-
-# Function to analyze self-assessment and determine weakest skill
-def analyze_skills(dribbling, passing, shooting, speed, agility):
+import weakref
+
+from analysis_jobs import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobManager, job_key
+from landmark_export import LANDMARK_FORMATS, available_formats, frame_timestamps, write_landmarks
+from movement_index import get_movement_index, movement_features
+from pipeline_metrics import DEFAULT_TRACE_DIR, get_metrics, profile_trace, serve_prometheus
+from player_store import AI, SELF, get_player_store, self_vs_ai, skill_trends
+from pose_cache import cache_key, get_pose_cache, hash_video
+from pose_pool import get_pose_pool
+from rules_engine import get_rules_engine
+from scratch import ScratchFullError, get_scratch
+from skill_metrics import SKILLS, compute_skill_metrics, rate_skills
+from uploads import deferred_download, spool_upload
+from video_encoders import (
+    ENCODER_BACKENDS, OUTPUT_FORMATS, QUALITY_PRESETS, RESOLUTION_PRESETS, find_ffmpeg, open_capture, open_encoder,
+)
+
+# Bump when the analysis output changes so older cached results are not reused
+ANALYSIS_VERSION = 5
+
+# Modules only video analysis needs (OpenCV and the pose pipeline). They are imported
+# where they are used, so the page renders without loading them, and ahead of the
+# first analysis by the background warm-up.
+ANALYSIS_MODULES = [
+    "cv2", "video_pipeline", "pose_sampling", "pose_tracking", "multi_player", "segment_parallel", "live_analysis",
+]
+
+# Worker hosts for segment-parallel analysis, as "host:port,host:port" (see segment_parallel);
+# without any, segments run on local processes
+WORKER_HOSTS = [host.strip() for host in os.environ.get("AI_SOCCER_WORKER_HOSTS", "").split(",") if host.strip()]
+
+# Matches listed under "Players who move like you" and "Drills closest to how you move"
+SIMILAR_PLAYERS = 5
+MATCHED_DRILLS = 3
+
+# Rendered outputs are budgeted at this many times the source file's size when making
+# room for them on the tmpfs or the disk (mp4v renders, the largest, come to about 1.5 times)
+RENDER_SIZE_FACTOR = 2
+
+# Prometheus export of the pipeline metrics: AI_SOCCER_METRICS_PORT serves them at
+# http://AI_SOCCER_METRICS_HOST:port/metrics, AI_SOCCER_METRICS_TEXTFILE keeps a text file
+# up to date for node_exporter's textfile collector. Either one switches collection on.
+METRICS_PORT = os.environ.get("AI_SOCCER_METRICS_PORT")
+METRICS_HOST = os.environ.get("AI_SOCCER_METRICS_HOST", "127.0.0.1")
+METRICS_TEXTFILE = os.environ.get("AI_SOCCER_METRICS_TEXTFILE")
+
+# Set AI_SOCCER_WARM_UP=0 to skip the background warm-up (e.g. on a machine short of memory)
+WARM_UP = os.environ.get("AI_SOCCER_WARM_UP", "1") != "0"
+
+# Function to analyze self-assessment and determine weakest skill.
+# rng (a seed or numpy Generator) makes the drill sample reproducible.
+def analyze_skills(dribbling, passing, shooting, speed, agility, rng=None):
     skills = {
         "Dribbling": dribbling,
         "Passing": passing,
@@ -19,76 +62,19 @@ def analyze_skills(dribbling, passing, shooting, speed, agility):
         "Speed": speed,
         "Agility": agility
     }
-    
-    sorted_skills = sorted(skills.items(), key=lambda x: x[1])
-    weakest_skill = sorted_skills[0][0]  
-    
-    drill_suggestions = {
-        "Dribbling": ["Cone Dribbling Drill", "1v1 Dribble Challenge", "Fast Feet Drills"],
-        "Passing": ["Wall Passing Drill", "Triangle Passing", "Long Pass Accuracy"],
-        "Shooting": ["Target Shooting", "One-Touch Finishing", "Shooting Under Pressure"],
-        "Speed": ["Sprint Intervals", "Ladder Drills", "Reaction Sprint Training"],
-        "Agility": ["Cone Weaving", "Quick Change of Direction", "Lateral Hurdle Jumps"]
-    }
-    
-    recommended_drills = random.sample(drill_suggestions[weakest_skill], 2)  
-    
-    return weakest_skill, recommended_drills
-
-# Function to generate AI skill ratings
-def generate_ai_ratings():
-    return { 
-        "Dribbling": random.randint(3, 9),
-        "Passing": random.randint(3, 9),
-        "Shooting": random.randint(3, 9),
-        "Speed": random.randint(3, 9),
-        "Agility": random.randint(3, 9)
-    }
-
-def generate_detailed_ai_feedback(ai_ratings):
-    feedback = {}
-    for skill, rating in ai_ratings.items():
-        if skill == "Dribbling":
-            if rating >= 7:
-                feedback[skill] = ("✅ Excellent ball control! Keep refining speed.", (0, 255, 0))
-            elif rating >= 5:
-                feedback[skill] = ("⚠️ Decent dribbling, but improve control at higher speeds.", (255, 255, 0))
-            else:
-                feedback[skill] = ("❌ Struggles with dribbling. Focus on close ball control.", (0, 0, 255))
-        
-        elif skill == "Passing":
-            if rating >= 7:
-                feedback[skill] = ("✅ Strong passing accuracy. Try increasing pass speed.", (0, 255, 0))
-            elif rating >= 5:
-                feedback[skill] = ("⚠️ Moderate passing. Work on consistency under pressure.", (255, 255, 0))
-            else:
-                feedback[skill] = ("❌ Passing needs work. Focus on target accuracy.", (0, 0, 255))
+    return get_rules_engine().weakest_and_drills(skills, rng)
 
-        elif skill == "Shooting":
-            if rating >= 7:
-                feedback[skill] = ("✅ Great shot power! Try improving shot placement.", (0, 255, 0))
-            elif rating >= 5:
-                feedback[skill] = ("⚠️ Decent shooting. Work on shot angles.", (255, 255, 0))
-            else:
-                feedback[skill] = ("❌ Shooting needs improvement. Focus on follow-through.", (0, 0, 255))
-
-        elif skill == "Speed":
-            if rating >= 7:
-                feedback[skill] = ("✅ Fast sprint speed! Work on endurance.", (0, 255, 0))
-            elif rating >= 5:
-                feedback[skill] = ("⚠️ Average speed. Try explosive sprint drills.", (255, 255, 0))
-            else:
-                feedback[skill] = ("❌ Speed is low. Focus on acceleration training.", (0, 0, 255))
-
-        elif skill == "Agility":
-            if rating >= 7:
-                feedback[skill] = ("✅ Quick footwork! Maintain consistency in lateral moves.", (0, 255, 0))
-            elif rating >= 5:
-                feedback[skill] = ("⚠️ Agility is decent. Improve quick direction changes.", (255, 255, 0))
-            else:
-                feedback[skill] = ("❌ Agility needs improvement. Do ladder and cone drills.", (0, 0, 255))
+# Function to generate AI skill ratings from the pose landmarks of a clip.
+# Returns (ratings, metrics); both are None if the player was not tracked long enough.
+def generate_ai_ratings(landmarks, fps, aspect=1.0):
+    metrics = compute_skill_metrics(landmarks, fps, aspect)
+    if metrics is None:
+        return None, None
+    return rate_skills(metrics), metrics
 
-    return feedback
+# Function to generate the detailed per-skill feedback from the rules catalog (feedback_rules.json)
+def generate_detailed_ai_feedback(ai_ratings):
+    return get_rules_engine().feedback(ai_ratings)
 
 
 # Function to generate AI feedback
@@ -104,60 +90,514 @@ def generate_ai_feedback(ai_ratings):
     return feedback
 
 # Function to determine AI-recommended drills
-def get_ai_recommended_drills(ai_ratings):
-    weakest_skill = min(ai_ratings, key=ai_ratings.get)  # Find the lowest-rated skill
-    _, drills = analyze_skills(
-        ai_ratings["Dribbling"], ai_ratings["Passing"], ai_ratings["Shooting"], ai_ratings["Speed"], ai_ratings["Agility"]
-    )
-    return weakest_skill, drills
-
-# Function to process the video and overlay AI feedback
-def process_video(video_path):
-    mp_pose = mp.solutions.pose
-    pose = mp_pose.Pose()
-    cap = cv2.VideoCapture(video_path)
-
-    temp_output_path = os.path.join(tempfile.gettempdir(), "processed_video.mp4")
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    fps = int(cap.get(cv2.CAP_PROP_FPS)) or 30
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
-    out = cv2.VideoWriter(temp_output_path, fourcc, fps, (width, height))
-
-    ai_ratings = generate_ai_ratings()  # AI generates ratings
-    ai_feedback = generate_detailed_ai_feedback(ai_ratings)  # AI generates detailed feedback
-    weakest_skill, recommended_drills = get_ai_recommended_drills(ai_ratings)  # AI determines drills
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = pose.process(image_rgb)
-
-        if results.pose_landmarks:
-            for landmark in results.pose_landmarks.landmark:
-                h, w, _ = frame.shape
-                x, y = int(landmark.x * w), int(landmark.y * h)
-                cv2.circle(frame, (x, y), 8, (0, 255, 0), -1)
-
-        # Keep detailed AI feedback text on screen at all times with smaller font
-        y_offset = 50
-        font_scale = 0.6  # Reduce font size
-        font_thickness = 1  # Reduce thickness for smaller text
-        for skill, (text, color) in ai_feedback.items():
-            cv2.rectangle(frame, (30, y_offset - 20), (800, y_offset + 10), (0, 0, 0), -1)  # Background for readability
-            cv2.putText(frame, text, (40, y_offset), cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, font_thickness, cv2.LINE_AA)
-            y_offset += 30  # Reduce spacing for compact display
-
-        out.write(frame)
+def get_ai_recommended_drills(ai_ratings, rng=None):
+    return get_rules_engine().weakest_and_drills(ai_ratings, rng)
+
+# Function to rate every player of a (frames, players, 33, 4) multi-player landmark array.
+# seen is the number of frames each player was posed in; players too briefly seen to rate are left out.
+def rate_players(landmarks, seen, fps, aspect):
+    players = []
+    for index in range(landmarks.shape[1]):
+        ai_ratings, metrics = generate_ai_ratings(landmarks[:, index], fps, aspect)
+        if ai_ratings is None:
+            continue
+        weakest_skill, drills = get_ai_recommended_drills(ai_ratings)
+        players.append({
+            "player": index + 1,
+            "frames": seen[index],
+            "ai_ratings": ai_ratings,
+            "weakest_skill": weakest_skill,
+            "recommended_drills": drills,
+            "metrics": metrics,
+        })
+    return players
+
+# Function to process the video and overlay AI feedback.
+# The clip is analyzed first (pose landmarks for every frame), rated from those
+# landmarks, and then rendered with the keypoints and feedback drawn on.
+# workers > 1 spreads pose inference over that many processes, detecting each frame on
+# its own (static image mode) so the result does not depend on how frames were split.
+# segments > 1 splits the clip into that many time segments instead, each analyzed (in
+# static image mode too) and rendered with its own capture and pose estimator on a local
+# process (workers of them, default one per CPU) or on the worker hosts listed in hosts
+# ("host:port", see segment_parallel), and stitches the landmarks and encoded parts back together.
+# stride / scale / roi switch to sampled analysis: inference on every Nth frame,
+# on a downscaled copy and/or a crop around the player, with interpolation between.
+# tracking carries state across frames instead: the crop follows the player's predicted
+# position, near-still frames reuse the last result and the landmarks are smoothed
+# (see pose_tracking); it combines with scale and roi but not with stride.
+# multi_player detects and follows every player (see multi_player) in the same single
+# decode pass; each is rated in output_info["players"], the returned ratings are those of
+# the player seen longest and the video labels players P1, P2, ... in the same order.
+# hw_decode lets OpenCV decode the clip on the GPU when it can.
+# output picks what is written: "video" (the annotated clip), "overlay" (keypoints and
+# feedback alone on a transparent WebM track) or "landmarks" (the pose data alone: no
+# render pass at all).
+# encoder / resolution / quality choose the backend and presets from video_encoders.
+# landmark_format is the file format of the landmarks (see landmark_export): the output
+# itself for "landmarks", and a second file in output_info["landmarks"] next to a video
+# or overlay when export_landmarks is set. Either way they carry per-frame timestamps.
+# Analyses and renders are cached separately by video content and settings, so the same
+# clip is only analyzed once and a different output setting only re-renders it;
+# pass content_hash when it is already known to skip re-reading the file.
+# output_info["movement"] is the clip's movement feature vector (see movement_index), for
+# finding players and reference drills that move alike; None if it could not be computed.
+# progress(frames_done, frames_total), if given, is called as frames are analyzed and written.
+# trace=True records a cProfile trace of the run; its path is returned in output_info["trace"].
+# Returns (output_path, ratings, feedback, weakest_skill, drills, output_info).
+def process_video(video_path, model_complexity=1, static_image_mode=False, workers=1, stride=1, scale=1.0, roi=False,
+                  tracking=False, multi_player=False, hw_decode=False, output="video", encoder="auto", resolution="source", quality="balanced",
+                  landmark_format="npz", export_landmarks=False, segments=1, hosts=None, use_cache=True, content_hash=None,
+                  progress=None, trace=False):
+    if trace:
+        trace_name = time.strftime("process_video_%Y%m%d_%H%M%S") + f"_{threading.get_ident()}.prof"
+        trace_path = os.path.join(DEFAULT_TRACE_DIR, trace_name)
+        with profile_trace(trace_path):
+            result = process_video(video_path, model_complexity, static_image_mode, workers, stride, scale, roi,
+                                   tracking, multi_player, hw_decode, output, encoder, resolution, quality, landmark_format,
+                                   export_landmarks, segments, hosts, use_cache, content_hash, progress)
+        return result[:5] + (dict(result[5], trace=trace_path),)
+
+    import cv2
+    from multi_player import run_multi_player
+    from pose_sampling import run_sampled
+    from pose_tracking import run_tracked
+    from segment_parallel import render_segmented, run_segmented, segment_pool
+    from video_pipeline import expected_frame_count, render_overlay, render_video, run_parallel, run_serial
+
+    pipeline_stats = get_metrics()
+    sampled = stride > 1 or scale < 1.0 or roi or tracking
+    if sampled and workers > 1:
+        raise ValueError("Sampled analysis runs on a single worker")
+    if tracking and stride > 1:
+        raise ValueError("Tracking analyzes every frame; use stride 1")
+    if multi_player and (workers > 1 or stride > 1 or roi or tracking):
+        raise ValueError("Multi-player analysis runs on a single worker without stride, ROI or tracking")
+    if segments > 1 and (sampled or multi_player):
+        raise ValueError("Segment-parallel analysis runs every frame at full resolution for a single player")
+    if output not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output: {output}")
+    if landmark_format not in LANDMARK_FORMATS:
+        raise ValueError(f"Unknown landmark format: {landmark_format}")
+    pose_options = {"model_complexity": model_complexity, "static_image_mode": static_image_mode}
+    if workers > 1 or segments > 1:
+        # run_parallel and run_segmented detect every frame on its own; keyed that way so the cache says so
+        pose_options["static_image_mode"] = True
+    analysis_settings = dict(pose_options, stride=stride, scale=scale, roi=roi, tracking=tracking,
+                             multi_player=multi_player, hw_decode=hw_decode, version=ANALYSIS_VERSION)
+    render_settings = {"output": output, "encoder": encoder, "resolution": resolution, "quality": quality}
+
+    analysis = None
+    if use_cache:
+        cache = get_pose_cache()
+        content_hash = content_hash or hash_video(video_path)
+        analysis_key = cache_key(content_hash, analysis_settings)
+        render_key = cache_key(content_hash, dict(analysis_settings, **render_settings))
+        if output != "landmarks":
+            rendered = cache.get(render_key)
+            if rendered is not None and rendered["video_path"] is not None:
+                analysis = cache.get(analysis_key) if export_landmarks else None
+                # A landmark export needs the analysis entry too, which may have been evicted
+                if not export_landmarks or (analysis is not None and analysis["landmarks_path"] is not None):
+                    pipeline_stats.inc("render_cache_hits")
+                    result = analysis_result(rendered["video_path"], rendered, output)
+                    if export_landmarks:
+                        result[5]["landmarks"] = export_landmark_file(
+                            cache.load_landmarks(analysis_key), rendered["fps"], landmark_format
+                        )
+                    return result
+        analysis = cache.get(analysis_key)
+        if analysis is not None and analysis["landmarks_path"] is None:
+            analysis = None
+        pipeline_stats.inc("analysis_cache_hits" if analysis is not None else "analysis_cache_misses")
+
+    cap = open_capture(video_path, hw_decode)
+    on_frames = None
+    if progress is not None:
+        # Every frame is visited once to analyze it and once more to render it
+        passes = (analysis is None) + (output != "landmarks")
+        frames_total = passes * expected_frame_count(cap)
+        frames_done = 0
+
+        def on_frames(count):
+            nonlocal frames_done
+            frames_done += count
+            progress(frames_done, max(frames_total, frames_done))
+
+    if analysis is None:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        seen = None
+        try:
+            if multi_player:
+                landmarks, seen = run_multi_player(cap, pose_options, scale=scale, on_frames=on_frames)
+            elif segments > 1:
+                with segment_pool(workers if workers > 1 else None, hosts) as pool:
+                    landmarks = run_segmented(video_path, pool, segments, pose_options, hw_decode, on_frames)
+            elif workers > 1:
+                landmarks = run_parallel(cap, workers=workers, pose_options=pose_options, on_frames=on_frames)
+            else:
+                # Borrow a warm Pose model from the process-wide pool instead of building one per video
+                with get_pose_pool().pose(**pose_options) as pose:
+                    if tracking:
+                        landmarks = run_tracked(cap, pose, roi=roi, scale=scale, on_frames=on_frames)
+                    elif sampled:
+                        landmarks = run_sampled(cap, pose, stride=stride, scale=scale, roi=roi, on_frames=on_frames)
+                    else:
+                        landmarks = run_serial(cap, pose, on_frames=on_frames)
+        finally:
+            cap.release()
+
+        pipeline_stats.inc("videos_analyzed")
+        players = None
+        if multi_player:
+            players = rate_players(landmarks, seen, fps, width / max(height, 1))
+            main_player = max(players, key=lambda player: player["frames"], default=None)
+            ai_ratings, metrics = (main_player["ai_ratings"], main_player["metrics"]) if main_player else (None, None)
+        else:
+            ai_ratings, metrics = generate_ai_ratings(landmarks, fps, width / max(height, 1))  # AI rates the movement
+        if ai_ratings is None:
+            raise ValueError("No player could be tracked in this video. Try a clip where your whole body is visible.")
+        main_landmarks = landmarks[:, main_player["player"] - 1] if multi_player else landmarks
+        movement = movement_features(main_landmarks, fps, width / max(height, 1))
+        ai_feedback = generate_detailed_ai_feedback(ai_ratings)  # AI generates detailed feedback
+        weakest_skill, recommended_drills = get_ai_recommended_drills(ai_ratings)  # AI determines drills
+        analysis = {
+            "ai_ratings": ai_ratings,
+            "ai_feedback": ai_feedback,
+            "weakest_skill": weakest_skill,
+            "recommended_drills": recommended_drills,
+            "metrics": metrics,
+            "movement": None if movement is None else movement.tolist(),
+            "fps": fps,
+            "width": width,
+            "height": height,
+        }
+        if players is not None:
+            analysis["players"] = players
+            analysis["main_player"] = main_player["player"]
+        if use_cache:
+            analysis = cache.put(analysis_key, landmarks, analysis)
+    else:
+        cap.release()
+        landmarks = cache.load_landmarks(analysis_key)
+
+    scratch = get_scratch()
+    try:
+        if output == "landmarks":
+            exported = export_landmark_file(landmarks, analysis["fps"], landmark_format)
+            return analysis_result(exported["path"], analysis, output, landmark_format)
+
+        # Each run renders into its own workspace so concurrent analyses never overwrite each other.
+        # Renders headed for the cache go on the tmpfs when one is configured, and their workspace
+        # is dropped once the file has moved into the cache; uncached ones stay until evicted.
+        suffix = os.path.splitext(OUTPUT_FORMATS[output][0])[1]
+        # Segment renders from worker hosts need the workspace on storage they share, so not the tmpfs
+        workspace = scratch.workspace(hot=use_cache and not hosts,
+                                      needed=RENDER_SIZE_FACTOR * os.path.getsize(video_path))
+        temp_output_path = workspace.file(suffix, "processed_video_")
+        ai_feedback = {skill: (text, tuple(color)) for skill, (text, color) in analysis["ai_feedback"].items()}
+        size = (analysis["width"], analysis["height"])
+        try:
+            with scratch.pinned(workspace.name):
+                if segments > 1 and landmarks.ndim == 3 and find_ffmpeg() is not None:
+                    # Parts are joined with ffmpeg; without it the render below runs in one piece
+                    with segment_pool(workers if workers > 1 else None, hosts) as pool:
+                        encode_stats = render_segmented(
+                            video_path, temp_output_path, pool, segments, landmarks, ai_feedback, analysis["fps"], size,
+                            output, encoder, resolution, quality, hw_decode, on_frames,
+                        )
+                else:
+                    out = open_encoder(temp_output_path, analysis["fps"], size, backend=encoder, resolution=resolution,
+                                       quality=quality, alpha=output == "overlay")
+                    with out:
+                        if output == "overlay":
+                            render_overlay(out, landmarks, ai_feedback, size, on_frames=on_frames)
+                        else:
+                            cap = open_capture(video_path, hw_decode)
+                            try:
+                                render_video(cap, out, landmarks, ai_feedback, on_frames=on_frames)
+                            finally:
+                                cap.release()
+                    encode_stats = out.stats()
+
+                pipeline_stats.inc("videos_rendered")
+                meta = dict(analysis, encode=encode_stats)
+                meta.pop("video_path", None)
+                meta.pop("landmarks_path", None)
+                if use_cache:
+                    temp_output_path = cache.put(render_key, None, meta, video_path=temp_output_path)["video_path"]
+                    workspace.remove()
+        except BaseException:
+            workspace.remove()
+            raise
+        result = analysis_result(temp_output_path, meta, output)
+        if export_landmarks:
+            result[5]["landmarks"] = export_landmark_file(landmarks, analysis["fps"], landmark_format)
+        return result
+    finally:
+        # Every output path leaves files in scratch (exports, uncached renders)
+        scratch.evict()
+
+
+# Function to write a clip's landmarks with their frame timestamps to a new scratch file
+# in one of LANDMARK_FORMATS. Returns {"path", "file_name", "mime"}.
+def export_landmark_file(landmarks, fps, landmark_format):
+    file_name, mime = LANDMARK_FORMATS[landmark_format]
+    # The uncompressed size (landmarks plus a float64 timestamp per frame) bounds every format
+    needed = landmarks.nbytes + 8 * len(landmarks)
+    path = get_scratch().workspace(needed=needed).file(os.path.splitext(file_name)[1], "landmarks_")
+    write_landmarks(path, landmarks, frame_timestamps(len(landmarks), fps), landmark_format)
+    return {"path": path, "file_name": file_name, "mime": mime}
+
+
+# Function to shape an analysis (fresh or cached) into process_video's return value
+def analysis_result(path, analysis, output, landmark_format="npz"):
+    ai_feedback = {skill: (text, tuple(color)) for skill, (text, color) in analysis["ai_feedback"].items()}
+    file_name, mime = LANDMARK_FORMATS[landmark_format] if output == "landmarks" else OUTPUT_FORMATS[output]
+    output_info = {"output": output, "file_name": file_name, "mime": mime, "encode": analysis.get("encode"),
+                   "movement": analysis.get("movement")}
+    if "players" in analysis:
+        output_info["players"] = analysis["players"]
+        output_info["main_player"] = analysis["main_player"]
+    return (path, analysis["ai_ratings"], ai_feedback, analysis["weakest_skill"],
+            analysis["recommended_drills"], output_info)
+
+
+# Function to get the process-wide job manager that runs analyses in the background
+@st.cache_resource
+def get_job_manager():
+    return JobManager(process_video)
+
+
+# Function to import the analysis modules and ready a pose estimator for the default
+# settings, so the first analysis does not pay for loading them
+def warm_up():
+    for name in ANALYSIS_MODULES:
+        importlib.import_module(name)
+    get_pose_pool().warm_up(model_complexity=1, static_image_mode=False)
+
+
+# Function to run warm_up() on a background thread, once per process
+@st.cache_resource
+def start_warm_up():
+    thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+# Function to start the configured Prometheus export, once per process
+@st.cache_resource
+def start_metrics_export():
+    if not (METRICS_PORT or METRICS_TEXTFILE):
+        return None
+    get_metrics().enable(True, textfile=METRICS_TEXTFILE)
+    return serve_prometheus(int(METRICS_PORT), METRICS_HOST) if METRICS_PORT else None
+
+
+# Function to show the ratings and drills of every player found by multi-player analysis
+def show_players(players, main_player):
+    import pandas as pd
+    st.write("### 👥 Players in the Clip:")
+    st.caption(f"The ratings above are for P{main_player}, the player seen longest.")
+    rows = [
+        dict({"Player": f"P{player['player']}", "Frames": player["frames"]}, **player["ai_ratings"],
+             **{"Weakest skill": player["weakest_skill"]})
+        for player in players
+    ]
+    st.dataframe(pd.DataFrame(rows), hide_index=True)
+    for player in players:
+        with st.expander(f"🔥 Drills for P{player['player']}"):
+            for drill in player["recommended_drills"]:
+                st.write(f"- {drill}")
 
-    cap.release()
-    out.release()
 
-    return temp_output_path, ai_ratings, ai_feedback, weakest_skill, recommended_drills
+# Function to get this browser session's scratch workspace, where its uploads live.
+# It is removed when Streamlit drops the session, or by the scratch quota once idle.
+def get_session_workspace():
+    scratch = get_scratch()
+    workspace = st.session_state.get("scratch_workspace")
+    if workspace is None or not workspace.exists():
+        workspace = scratch.workspace()
+        weakref.finalize(workspace, scratch.remove, workspace.name)
+        st.session_state["scratch_workspace"] = workspace
+    workspace.touch()
+    return workspace
+
+
+# Function to show a running job's progress, polling until it finishes
+@st.fragment(run_every=1.0)
+def show_job_progress(job_id):
+    # Keep the upload being analyzed from looking idle to the scratch quota
+    get_session_workspace()
+    manager = get_job_manager()
+    job = manager.get(job_id)
+    if job["status"] not in (QUEUED, RUNNING):
+        st.rerun()
+    if job["status"] == QUEUED:
+        st.progress(0.0, text="Waiting for a free analysis worker...")
+    else:
+        text = f"Analyzing frames: {job['frames_done']}/{job['frames_total']}"
+        if job["eta_seconds"] is not None:
+            text += f" (about {int(job['eta_seconds']) + 1}s left)"
+        st.progress(job["progress"], text=text)
+    if st.button("✖ Cancel analysis"):
+        manager.cancel(job_id)
+        st.rerun()
+
+
+# Function to show live per-stage timings, memory and counters of the video pipeline
+@st.fragment(run_every=2.0)
+def show_pipeline_metrics():
+    import pandas as pd
+    metrics = get_metrics()
+    summary = metrics.summary()
+    if summary:
+        st.dataframe(pd.DataFrame(summary).round(2), hide_index=True)
+    else:
+        st.caption("No frames processed since metrics were switched on.")
+    gauges = metrics.gauges()
+    if "rss_bytes" in gauges:
+        st.caption(
+            f"Memory: {gauges['rss_bytes'] / 1024 ** 2:.0f} MB resident, "
+            f"{gauges['rss_peak_bytes'] / 1024 ** 2:.0f} MB peak"
+        )
+    usage = get_scratch().usage()
+    st.caption(
+        f"Scratch: {usage['workspaces']} workspaces, {usage['bytes'] / 1024 ** 2:.0f} of "
+        f"{usage['max_bytes'] / 1024 ** 2:.0f} MB"
+        + (f", tmpfs {usage['hot_bytes'] / 1024 ** 2:.0f} of {usage['hot_max_bytes'] / 1024 ** 2:.0f} MB"
+           if usage["hot_max_bytes"] else "")
+    )
+    counters = metrics.counters()
+    if counters:
+        st.caption(", ".join(f"{name.replace('_', ' ')}: {value}" for name, value in sorted(counters.items())))
+    st.download_button("📥 Prometheus metrics", metrics.render_prometheus(), file_name="metrics.prom",
+                       mime="text/plain")
+
+
+# Function to rate recent live landmarks and turn them into the detailed feedback panel
+def live_feedback(landmarks, fps, aspect):
+    ai_ratings, _ = generate_ai_ratings(landmarks, fps, aspect)
+    return generate_detailed_ai_feedback(ai_ratings) if ai_ratings else None
+
+
+# A browser session's live analyzer, as kept in its session state. The analyzer's own
+# threads keep it alive, so it is stopped when this handle is dropped along with the
+# session instead, like the session's scratch workspace is removed.
+class LiveSession:
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        weakref.finalize(self, analyzer.stop)
+
+
+# Function to show the newest annotated live frame and latency stats, refreshed in place
+@st.fragment(run_every=0.2)
+def show_live_view():
+    live = st.session_state.get("live_analyzer")
+    if live is None:
+        return
+    analyzer = live.analyzer
+    frame = analyzer.latest_frame()
+    if frame is not None:
+        st.image(frame, channels="BGR")
+    stats = analyzer.stats()
+    if stats["error"]:
+        st.error(f"Live analysis stopped: {stats['error']}")
+    elif stats["latency_p50_ms"] is not None:
+        st.caption(
+            f"{stats['analysis_fps']:.1f} of {stats['capture_fps']:.1f} frames/s analyzed, "
+            f"{stats['dropped']} dropped, latency {stats['latency_p50_ms']:.0f} ms "
+            f"(p95 {stats['latency_p95_ms']:.0f} ms), inference at {stats['scale']:.0%} resolution"
+        )
+
+
+# Function to run live analysis from a camera, stream URL or looping file
+def show_live_analysis(player_name):
+    with st.expander("🔴 Live Analysis (camera or stream)"):
+        source = st.text_input("Camera index, stream URL or video file", value="0")
+        budget_ms = st.slider("Latency budget (ms)", 100, 1000, 250, step=50)
+        live = st.session_state.get("live_analyzer")
+        if live is None:
+            if st.button("▶ Start live analysis"):
+                from live_analysis import LiveAnalyzer
+                # The session's landmarks are recorded as they are analyzed, for download afterwards
+                recording = get_session_workspace().file(".npy", "live_landmarks_")
+                analyzer = LiveAnalyzer(source, latency_budget=budget_ms / 1000, feedback_fn=live_feedback,
+                                        record_path=recording)
+                st.session_state["live_analyzer"] = LiveSession(analyzer.start())
+                st.session_state["live_recording"] = recording
+                st.session_state.pop("live_result", None)
+                st.rerun()
+        else:
+            analyzer = live.analyzer
+            analyzer.latency_budget = budget_ms / 1000
+            if st.button("⏹ Stop live analysis"):
+                analyzer.stop()
+                del st.session_state["live_analyzer"]
+                ai_ratings, _ = generate_ai_ratings(*analyzer.recent_landmarks())
+                if ai_ratings is not None:
+                    get_player_store().record(player_name, AI, ai_ratings)
+                st.session_state["live_result"] = ai_ratings
+                st.rerun()
+            show_live_view()
+
+        if "live_result" in st.session_state:
+            ai_ratings = st.session_state["live_result"]
+            if ai_ratings is None:
+                st.warning("No player was tracked long enough to rate this session.")
+            else:
+                ai_feedback = generate_detailed_ai_feedback(ai_ratings)
+                st.write("### 📊 Live Session Ratings:")
+                for skill, rating in ai_ratings.items():
+                    st.write(f"**{skill}:** {rating}/10 - {ai_feedback[skill][0]}")
+                weakest_skill, drills = get_ai_recommended_drills(ai_ratings)
+                st.write(f"### 🏆 Weakest Skill: **{weakest_skill}**")
+                for drill in drills:
+                    st.write(f"- {drill}")
+            recording = st.session_state.get("live_recording")
+            if recording and os.path.exists(recording):
+                st.download_button("📥 Download Session Landmarks", data=deferred_download(recording),
+                                   file_name="live_landmarks.npy", mime=LANDMARK_FORMATS["npy"][1])
+
+
+# Function to show the other players whose sessions move most like this clip, and the
+# reference drill clips for the weakest skill that are closest to it
+def show_similar_movement(player_name, movement, weakest_skill):
+    index = get_movement_index()
+    players = index.similar_players(movement, player_name, k=SIMILAR_PLAYERS)
+    drills = index.match_drills(movement, weakest_skill, k=MATCHED_DRILLS)
+    if players:
+        st.write("### 👥 Players Who Move Like You:")
+        for match in players:
+            st.write(f"- **{match['player']}** ({match['score']:.0%} similar)")
+    if drills:
+        st.write(f"### 🎯 {weakest_skill} Drills Closest to How You Move:")
+        for match in drills:
+            st.write(f"- {match['label']} ({match['score']:.0%} similar)")
+
+
+# Function to show a player's saved self-assessments and AI ratings over time
+def show_player_history(player_name):
+    store = get_player_store()
+    # Checked first so a new player's page does not load pandas for an empty table
+    if not store.count(player_name):
+        return
+    history = store.history(player_name)
+    with st.expander(f"📈 Your Progress ({len(history)} saved ratings)"):
+        freq = st.radio("Group by", ["D", "W", "M"], index=1, horizontal=True,
+                        format_func={"D": "Day", "W": "Week", "M": "Month"}.get)
+        trends = skill_trends(history, freq)
+        for source, label in ((SELF, "Self-assessment"), (AI, "AI ratings")):
+            rows = trends[trends["source"] == source]
+            if not rows.empty:
+                st.write(f"**{label}**")
+                st.line_chart(rows.set_index("period")[SKILLS])
+        gap = self_vs_ai(history)
+        if not gap.empty:
+            st.write("**Self-assessment minus AI rating** (positive: you rate yourself higher)")
+            st.dataframe(gap.round(1), hide_index=True)
 
 
 # Streamlit UI
@@ -187,24 +627,141 @@ def main():
             }
 
             weakest_skill, drills = analyze_skills(dribbling, passing, shooting, speed, agility)
+            get_player_store().record(player_name, SELF, self_ratings)
 
             st.success(f"Your weakest skill is: **{weakest_skill}**")
             st.write("### 🔥 AI Recommended Drills:")
             for drill in drills:
                 st.write(f"- {drill}")
 
+        show_player_history(player_name)
+        show_live_analysis(player_name)
+
         st.header("📹 Upload Soccer Training Video for AI Analysis")
+        with st.expander("⚙️ Analysis settings"):
+            workers = st.number_input(
+                "Worker processes for video analysis", min_value=1, max_value=os.cpu_count() or 1, value=1,
+                help="With more than one, each frame is detected on its own instead of tracked from the last.",
+            )
+            segments = st.number_input(
+                "Split long videos into time segments analyzed in parallel", min_value=1, max_value=64, value=1,
+                help="Each segment gets its own decoder and pose model"
+                     + (f" on {len(WORKER_HOSTS)} worker hosts." if WORKER_HOSTS else "."),
+            )
+            stride = st.slider("Analyze every Nth frame", 1, 10, 1)
+            scale = st.select_slider("Analysis resolution", options=[0.25, 0.5, 0.75, 1.0], value=1.0)
+            roi = st.checkbox("Track a region around the player")
+            tracking = st.checkbox(
+                "Smooth and track the player across frames",
+                help="Steadier keypoints; frames where nothing moves reuse the previous result.",
+            )
+            multi_player = st.checkbox(
+                "Several players in the clip",
+                help="Detects and rates every player; the video labels them P1, P2, ...",
+            )
+            hw_decode = st.checkbox("Decode video on the GPU when available")
+            if multi_player and (workers > 1 or stride > 1 or roi or tracking):
+                st.info("Multi-player analysis runs on a single worker and analyzes every frame.")
+                workers, stride, roi, tracking = 1, 1, False, False
+            if segments > 1 and (multi_player or stride > 1 or scale < 1.0 or roi or tracking):
+                st.info("Segment-parallel analysis runs every frame at full resolution for a single player.")
+                segments = 1
+            if tracking and stride > 1:
+                st.info("Tracking analyzes every frame.")
+                stride = 1
+            if workers > 1 and (stride > 1 or scale < 1.0 or roi or tracking):
+                st.info("Sampled analysis runs on a single worker.")
+                workers = 1
+        with st.expander("🎞️ Output settings"):
+            output_labels = {
+                "video": "Annotated video",
+                "overlay": "Overlay track only (transparent WebM)",
+                "landmarks": "Landmarks only (no video)",
+            }
+            output = st.radio("Output", list(output_labels), format_func=output_labels.get)
+            encoder = st.selectbox("Encoder", ENCODER_BACKENDS, disabled=output != "video")
+            resolution = st.selectbox("Resolution", list(RESOLUTION_PRESETS), disabled=output == "landmarks")
+            quality = st.select_slider("Quality", options=list(QUALITY_PRESETS), value="balanced",
+                                       disabled=output == "landmarks")
+            export_landmarks = st.checkbox("Also download the pose landmarks", disabled=output == "landmarks")
+            landmark_format = st.selectbox(
+                "Landmark file format", available_formats(), disabled=output != "landmarks" and not export_landmarks,
+                help="Per-frame keypoints with timestamps. NumPy files can be memory-mapped; Parquet suits dataframes.",
+            )
+            export_landmarks = export_landmarks and output != "landmarks"
+        with st.expander("🔬 Profiling"):
+            metrics = get_metrics()
+            collect = st.toggle("Collect per-stage pipeline metrics (for all sessions)", value=metrics.enabled)
+            if collect != metrics.enabled:
+                metrics.enable(collect)
+            trace = st.checkbox("Record a cProfile trace of the analysis")
+            if collect:
+                show_pipeline_metrics()
         uploaded_video = st.file_uploader("Upload a soccer video", type=["mp4", "mov", "avi"])
 
         if uploaded_video is not None:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as temp_file:
-                temp_file.write(uploaded_video.read())
-                temp_video_path = temp_file.name
+            # Stream the upload to disk once per file instead of copying it into memory on every rerun
+            spooled = st.session_state.get("spooled_upload")
+            if spooled is None or spooled[0] != uploaded_video.file_id or not os.path.exists(spooled[1]):
+                workspace = get_session_workspace()
+                if spooled is not None and os.path.exists(spooled[1]):
+                    os.remove(spooled[1])  # This session's previous upload
+                try:
+                    with get_scratch().reserve(uploaded_video.size):
+                        spooled = (uploaded_video.file_id, *spool_upload(uploaded_video, workspace.path))
+                except ScratchFullError:
+                    st.error("The server is short on disk space right now. Please try again in a few minutes.")
+                    return
+                st.session_state["spooled_upload"] = spooled
+            _, temp_video_path, content_hash = spooled
 
             st.video(temp_video_path)
-            st.write("Processing video... This may take a moment.")
 
-            processed_video_path, ai_ratings, ai_feedback, ai_weakest_skill, ai_drills = process_video(temp_video_path)
+            # Analysis runs as a background job; reruns find it again by clip and settings
+            manager = get_job_manager()
+            settings = {
+                "workers": workers, "stride": stride, "scale": scale, "roi": roi, "tracking": tracking,
+                "multi_player": multi_player, "hw_decode": hw_decode, "output": output, "encoder": encoder,
+                "resolution": resolution, "quality": quality, "landmark_format": landmark_format,
+                "export_landmarks": export_landmarks, "segments": segments,
+                "hosts": WORKER_HOSTS if segments > 1 and WORKER_HOSTS else None, "trace": trace,
+            }
+            session_jobs = st.session_state.setdefault("analysis_jobs", {})
+            request_key = job_key(content_hash, settings)
+            if request_key not in session_jobs:
+                session_jobs[request_key] = manager.submit(temp_video_path, content_hash, settings)
+            job = manager.get(session_jobs[request_key])
+
+            if job is None or job["status"] in (CANCELLED, FAILED):
+                if job is not None and job["status"] == FAILED:
+                    st.error("Error processing video. Please try again.")
+                    st.caption(job["error"].strip().splitlines()[-1])
+                else:
+                    st.warning("Video analysis was cancelled.")
+                if st.button("🔁 Analyze video again"):
+                    del session_jobs[request_key]
+                    st.rerun()
+                return
+            exported = job["status"] == DONE and job["result"][5].get("landmarks")
+            if job["status"] == DONE and (not os.path.exists(job["result"][0])
+                                          or (exported and not os.path.exists(exported["path"]))):
+                # An output file has since been evicted from the cache or scratch space: analyze again
+                session_jobs[request_key] = manager.submit(temp_video_path, content_hash, settings, force=True)
+                st.rerun()
+            if job["status"] != DONE:
+                st.write("Processing video... This may take a moment.")
+                show_job_progress(job["id"])
+                return
+
+            processed_video_path, ai_ratings, ai_feedback, ai_weakest_skill, ai_drills, output_info = job["result"]
+
+            # Record each finished analysis once per session, not on every rerun
+            recorded_jobs = st.session_state.setdefault("recorded_jobs", set())
+            if job["id"] not in recorded_jobs:
+                get_player_store().record(player_name, AI, ai_ratings, content_hash=content_hash)
+                if output_info["movement"] is not None:
+                    get_movement_index().add_clip(output_info["movement"], player=player_name, content_hash=content_hash)
+                recorded_jobs.add(job["id"])
 
             st.success("✅ AI analysis complete! Check below for results.")
             st.write("### 📊 AI Skill Ratings:")
@@ -216,16 +773,49 @@ def main():
             for drill in ai_drills:
                 st.write(f"- {drill}")
 
-            st.write("### 🎥 AI-Assessed Video:")
-            st.video(processed_video_path)
-
-            with open(processed_video_path, "rb") as processed_video_file:
+            if output_info["movement"] is not None:
+                show_similar_movement(player_name, output_info["movement"], ai_weakest_skill)
+
+            if output_info.get("players"):
+                show_players(output_info["players"], output_info["main_player"])
+
+            if output_info["output"] != "landmarks":
+                st.write("### 🎥 AI-Assessed Video:")
+                st.video(processed_video_path, format=output_info["mime"])
+                encode = output_info["encode"]
+                if encode and encode["fps"]:
+                    st.caption(
+                        f"Encoded with {encode['codec']}: {encode['fps']:.0f} frames/s, "
+                        f"{encode['bytes'] / 1024 ** 2:.1f} MB"
+                    )
+
+            labels = {"video": "📥 Download Processed Video", "overlay": "📥 Download Overlay Track",
+                      "landmarks": "📥 Download Landmarks"}
+            st.download_button(
+                label=labels[output_info["output"]],
+                data=deferred_download(processed_video_path),
+                file_name=output_info["file_name"],
+                mime=output_info["mime"]
+            )
+            exported = output_info.get("landmarks")
+            if exported:
+                st.download_button(
+                    label="📥 Download Landmarks",
+                    data=deferred_download(exported["path"]),
+                    file_name=exported["file_name"],
+                    mime=exported["mime"]
+                )
+            if output_info.get("trace") and os.path.exists(output_info["trace"]):
                 st.download_button(
-                    label="📥 Download Processed Video",
-                    data=processed_video_file,
-                    file_name="processed_video.mp4",
-                    mime="video/mp4"
+                    label="📥 Download cProfile Trace",
+                    data=deferred_download(output_info["trace"]),
+                    file_name=os.path.basename(output_info["trace"]),
+                    mime="application/octet-stream"
                 )
 
 if __name__ == "__main__":
+    start_metrics_export()
     main()
+    # Started once the page has been sent, so loading the analysis stack never delays it
+    if WARM_UP:
+        start_warm_up()
@@ -0,0 +1,202 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Where the job table lives unless a path is passed explicitly
+DEFAULT_JOBS_DB = os.path.join(tempfile.gettempdir(), "ai_soccer_jobs.db")
+
+# Analyses allowed to run at the same time; further jobs wait in the queue
+DEFAULT_MAX_RUNNING = 2
+
+# Minimum seconds between progress writes for one job
+PROGRESS_INTERVAL = 0.5
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+# Raised from a job's progress callback to stop the analysis it is running
+class JobCancelled(Exception):
+    pass
+
+
+# Function to check whether a process with this PID still exists
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Function to build the key used to find an existing job for the same clip and settings
+def job_key(content_hash, settings):
+    return content_hash + ":" + json.dumps(settings, sort_keys=True)
+
+
+# Runs video analyses on a bounded thread pool and records their state in SQLite,
+# so a Streamlit rerun (or another session) can find a job by ID and pick up its
+# progress or finished result. `runner` is called as
+# runner(video_path, progress=callback, content_hash=..., **settings) and must
+# return a JSON-serializable result; callback(frames_done, frames_total) may raise
+# JobCancelled.
+class JobManager:
+    def __init__(self, runner, db_path=DEFAULT_JOBS_DB, max_running=DEFAULT_MAX_RUNNING):
+        self.runner = runner
+        self.db_path = db_path
+        self._executor = ThreadPoolExecutor(max_workers=max_running, thread_name_prefix="analysis-job")
+        self._lock = threading.Lock()
+        self._cancel_events = {}
+        self._futures = {}
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, job_key TEXT NOT NULL, status TEXT NOT NULL,"
+                " video_path TEXT NOT NULL, settings TEXT NOT NULL,"
+                " frames_done INTEGER NOT NULL DEFAULT 0, frames_total INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL, started_at REAL, finished_at REAL,"
+                " owner_pid INTEGER NOT NULL, result TEXT, error TEXT)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_by_key ON jobs (job_key, created_at)")
+            # Jobs whose owning process died can never finish
+            rows = db.execute(
+                "SELECT id, owner_pid FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchall()
+            for row in rows:
+                if not _pid_alive(row["owner_pid"]):
+                    db.execute(
+                        "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                        (FAILED, "Interrupted by a server restart", time.time(), row["id"]),
+                    )
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    # Function to queue an analysis and return its job ID. An unfinished or
+    # successful job for the same clip and settings is reused instead, unless
+    # force is set, in which case only an unfinished one is.
+    def submit(self, video_path, content_hash, settings, force=False):
+        key = job_key(content_hash, settings)
+        reusable = (QUEUED, RUNNING) if force else (QUEUED, RUNNING, DONE)
+        with self._lock:
+            with self._connect() as db:
+                row = db.execute(
+                    f"SELECT id FROM jobs WHERE job_key = ? AND status IN ({', '.join('?' * len(reusable))})"
+                    " ORDER BY created_at DESC LIMIT 1",
+                    (key, *reusable),
+                ).fetchone()
+                if row is not None:
+                    return row["id"]
+                job_id = uuid.uuid4().hex
+                db.execute(
+                    "INSERT INTO jobs (id, job_key, status, video_path, settings, created_at, owner_pid)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, key, QUEUED, video_path, json.dumps(settings), time.time(), os.getpid()),
+                )
+            self._cancel_events[job_id] = threading.Event()
+            self._futures[job_id] = self._executor.submit(
+                self._run, job_id, video_path, content_hash, settings
+            )
+        return job_id
+
+    def _run(self, job_id, video_path, content_hash, settings):
+        with self._lock:
+            cancel = self._cancel_events.get(job_id)
+        if cancel is None:
+            # cancel() already stopped the future and recorded it
+            return
+        if cancel.is_set():
+            # Cancelled after this thread picked the job up but before it started
+            self._update(job_id, status=CANCELLED, finished_at=time.time())
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+                self._futures.pop(job_id, None)
+            return
+        self._update(job_id, status=RUNNING, started_at=time.time())
+        last_write = [0.0]
+
+        def progress(frames_done, frames_total):
+            if cancel.is_set():
+                raise JobCancelled()
+            now = time.monotonic()
+            if now - last_write[0] >= PROGRESS_INTERVAL or frames_done >= frames_total:
+                last_write[0] = now
+                self._update(job_id, frames_done=frames_done, frames_total=frames_total)
+
+        try:
+            result = self.runner(video_path, progress=progress, content_hash=content_hash, **settings)
+        except JobCancelled:
+            self._update(job_id, status=CANCELLED, finished_at=time.time())
+        except Exception:
+            self._update(job_id, status=FAILED, error=traceback.format_exc(), finished_at=time.time())
+        else:
+            self._update(job_id, status=DONE, result=json.dumps(result), finished_at=time.time())
+        finally:
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+                self._futures.pop(job_id, None)
+
+    def _update(self, job_id, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    # Function to request cancellation; queued jobs never start, running ones stop at the next frame
+    def cancel(self, job_id):
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+            future = self._futures.get(job_id)
+        if event is None:
+            return False
+        event.set()
+        if future is not None and future.cancel():
+            self._update(job_id, status=CANCELLED, finished_at=time.time())
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+                self._futures.pop(job_id, None)
+        return True
+
+    # Function to read a job's state as a dict, with progress fraction and ETA in seconds
+    def get(self, job_id):
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["settings"] = json.loads(job["settings"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        done, total = job["frames_done"], job["frames_total"]
+        job["progress"] = min(1.0, done / total) if total else 0.0
+        job["eta_seconds"] = None
+        if job["status"] == RUNNING and job["started_at"] and 0 < done < total:
+            elapsed = time.time() - job["started_at"]
+            job["eta_seconds"] = elapsed / done * (total - done)
+        return job
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            events = list(self._cancel_events.values())
+        for event in events:
+            event.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,220 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+
+from landmark_export import LANDMARK_FORMATS
+from movement_index import DEFAULT_INDEX_DIR, MovementIndex
+from player_store import AI, DEFAULT_STORE_PATH, PlayerStore
+from pose_cache import hash_video
+from video_encoders import ENCODER_BACKENDS, OUTPUT_FORMATS, QUALITY_PRESETS, RESOLUTION_PRESETS
+
+# File types picked up when scanning a directory (same as the upload widget)
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi")
+
+
+# Function to find video clips under a directory. The player for each clip is the
+# name of the folder it sits in, unless one player is given for all of them.
+# exclude is a folder not to descend into (e.g. an output folder inside the scanned one).
+def scan_directory(directory, player=None, exclude=None):
+    clips = []
+    exclude = os.path.abspath(exclude) if exclude else None
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != exclude)
+        for name in sorted(files):
+            if name.lower().endswith(VIDEO_EXTENSIONS) and not name.startswith("."):
+                path = os.path.join(root, name)
+                clips.append((path, player or os.path.basename(os.path.dirname(os.path.abspath(path)))))
+    return clips
+
+
+# Function to read clips from a manifest: a CSV with path and player columns, or
+# JSON lines with the same keys. Relative paths are taken from the manifest's folder.
+def read_manifest(manifest_path, player=None):
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, newline="") as f:
+        if manifest_path.lower().endswith((".jsonl", ".json")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    clips = []
+    for row in rows:
+        name = row.get("player") or player
+        if not name:
+            raise ValueError(f"No player for {row['path']} in {manifest_path}; add a player column or pass --player")
+        clips.append((os.path.join(base, row["path"]), name))
+    return clips
+
+
+# Worker process setup: one analysis per core, so keep OpenCV from starting its own thread pool
+def _init_worker():
+    cv2.setNumThreads(1)
+
+
+# Function to analyze one clip in a worker process and save the AI ratings to the player store.
+# Clips whose ratings are already stored for the player are skipped unless force is set,
+# which is what makes a rerun after a crash pick up where it stopped.
+# With index_dir, the clip's movement is also added to that movement index.
+def analyze_clip(path, player, settings, store_path, force=False, output_dir=None, index_dir=None):
+    from ai_soccer_webapp import process_video
+
+    start = time.perf_counter()
+    row = {"path": path, "player": player}
+    try:
+        content_hash = hash_video(path)
+        row["content_hash"] = content_hash
+        store = PlayerStore(store_path)
+        if not force and store.has_ratings(player, content_hash, AI):
+            row["status"] = "skipped"
+            return row
+        cap = cv2.VideoCapture(path)
+        row["frames"] = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        output_path, ai_ratings, ai_feedback, weakest_skill, drills, output_info = process_video(
+            path, content_hash=content_hash, **settings
+        )
+        store.record(player, AI, ai_ratings, content_hash=content_hash)
+        if index_dir is not None and output_info["movement"] is not None:
+            MovementIndex(index_dir).add_clip(output_info["movement"], player=player, content_hash=content_hash)
+        if output_dir is not None:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            extension = os.path.splitext(output_info["file_name"])[1]
+            target = os.path.join(output_dir, player, f"{stem}_{content_hash[:8]}{extension}")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(output_path, target)
+            row["output"] = target
+            if "landmarks" in output_info:
+                extension = os.path.splitext(output_info["landmarks"]["file_name"])[1]
+                landmarks_target = os.path.join(output_dir, player, f"{stem}_{content_hash[:8]}_landmarks{extension}")
+                shutil.copyfile(output_info["landmarks"]["path"], landmarks_target)
+                row["landmarks"] = landmarks_target
+        row.update(
+            status="done",
+            ai_ratings=ai_ratings,
+            feedback={skill: text for skill, (text, color) in ai_feedback.items()},
+            weakest_skill=weakest_skill,
+            recommended_drills=drills,
+        )
+        if "players" in output_info:
+            row["players"] = [
+                {key: player[key] for key in ("player", "frames", "ai_ratings", "weakest_skill", "recommended_drills")}
+                for player in output_info["players"]
+            ]
+    except Exception as e:
+        row.update(status="failed", error=f"{type(e).__name__}: {e}")
+    finally:
+        row["seconds"] = time.perf_counter() - start
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a folder (or manifest) of training clips without the web UI.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="Folder to scan for clips; each clip's player is its folder name")
+    source.add_argument("--manifest", help="CSV or JSONL listing clips with path and player")
+    parser.add_argument("--player", help="Player name for every clip")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Clips analyzed at once")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="Player history database")
+    parser.add_argument("--index", default=DEFAULT_INDEX_DIR, help="Movement index to add each clip to")
+    parser.add_argument("--report", help="Append one JSON line per clip to this file")
+    parser.add_argument("--output-dir", help="Copy each clip's output file here, under the player's name")
+    parser.add_argument("--force", action="store_true", help="Re-analyze clips that already have stored ratings")
+    parser.add_argument("--model-complexity", type=int, default=1)
+    parser.add_argument("--static-image-mode", action="store_true")
+    parser.add_argument("--stride", type=int, default=1)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--roi", action="store_true")
+    parser.add_argument("--tracking", action="store_true", help="Smooth and track the player across frames")
+    parser.add_argument("--multi-player", action="store_true",
+                        help="Rate every player in each clip; the clip's player is credited with the one seen longest")
+    parser.add_argument("--hw-decode", action="store_true")
+    parser.add_argument("--output", choices=list(OUTPUT_FORMATS), default="landmarks",
+                        help="What to write per clip (landmarks skips the render pass)")
+    parser.add_argument("--encoder", choices=ENCODER_BACKENDS, default="auto")
+    parser.add_argument("--resolution", choices=list(RESOLUTION_PRESETS), default="source")
+    parser.add_argument("--quality", choices=list(QUALITY_PRESETS), default="balanced")
+    parser.add_argument("--landmark-format", choices=list(LANDMARK_FORMATS), default="npz",
+                        help="File format of the landmarks (parquet needs pyarrow)")
+    parser.add_argument("--export-landmarks", action="store_true",
+                        help="Also write the landmarks next to each video or overlay output")
+    parser.add_argument("--segments", type=int, default=1,
+                        help="Split each clip into this many time segments analyzed in parallel")
+    parser.add_argument("--hosts", help="Worker hosts for the segments, as host:port,host:port "
+                                        "(started with `python segment_parallel.py serve`)")
+    args = parser.parse_args()
+
+    clips = scan_directory(args.dir, args.player, args.output_dir) if args.dir else read_manifest(args.manifest, args.player)
+    if not clips:
+        parser.error("No clips found")
+    # Longest clips first, so one long clip does not leave the other workers idle at the end
+    clips.sort(key=lambda clip: os.path.getsize(clip[0]) if os.path.exists(clip[0]) else 0, reverse=True)
+    settings = {
+        "model_complexity": args.model_complexity, "static_image_mode": args.static_image_mode,
+        "stride": args.stride, "scale": args.scale, "roi": args.roi, "tracking": args.tracking,
+        "multi_player": args.multi_player, "hw_decode": args.hw_decode, "output": args.output,
+        "encoder": args.encoder, "resolution": args.resolution, "quality": args.quality,
+        "landmark_format": args.landmark_format, "export_landmarks": args.export_landmarks,
+        "segments": args.segments, "hosts": args.hosts.split(",") if args.hosts else None,
+    }
+    # Create the table once up front instead of racing to do it in every worker
+    PlayerStore(args.store)
+    MovementIndex(args.index)
+
+    jobs = max(1, min(args.jobs, len(clips)))
+    print(f"Analyzing {len(clips)} clips with {jobs} worker processes")
+    counts = {"done": 0, "skipped": 0, "failed": 0}
+    frames = 0
+    start = time.perf_counter()
+    report = open(args.report, "a") if args.report else None
+    executor = ProcessPoolExecutor(
+        max_workers=jobs, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+    )
+    try:
+        pending = {
+            executor.submit(analyze_clip, path, player, settings, args.store, args.force, args.output_dir, args.index)
+            for path, player in clips
+        }
+        finished = 0
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                row = future.result()
+                finished += 1
+                counts[row["status"]] += 1
+                line = f"[{finished}/{len(clips)}] {row['path']} ({row['player']}): {row['status']}"
+                if row["status"] == "done":
+                    frames += row.get("frames", 0)
+                    ratings = ", ".join(f"{skill} {rating}" for skill, rating in row["ai_ratings"].items())
+                    line += f" in {row['seconds']:.1f}s - {ratings}"
+                elif row["status"] == "failed":
+                    line += f" - {row['error']}"
+                print(line, flush=True)
+                if report is not None:
+                    report.write(json.dumps(row) + "\n")
+                    report.flush()
+    except KeyboardInterrupt:
+        print("Interrupted; finished clips are saved and will be skipped on the next run.")
+        sys.exit(130)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        if report is not None:
+            report.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"{counts['done']} analyzed, {counts['skipped']} skipped, {counts['failed']} failed in {elapsed:.1f}s"
+        + (f" ({frames / elapsed:.1f} frames/s)" if frames else "")
+    )
+    if counts["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
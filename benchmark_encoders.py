@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import tempfile
+
+import cv2
+
+from video_encoders import (
+    ENCODER_BACKENDS, RESOLUTION_PRESETS, available_hardware_encoders, exact_fps, find_ffmpeg, open_encoder,
+)
+
+# Frames decoded up front and fed to every encoder, so decoding is not part of the timing
+DEFAULT_MAX_FRAMES = 300
+
+
+# Function to decode up to max_frames frames of a clip into memory
+def load_frames(video_path, max_frames=DEFAULT_MAX_FRAMES):
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    frames = []
+    try:
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+    finally:
+        cap.release()
+    return frames, fps
+
+
+# Function to encode the frames with one backend and presets and return the encoder's stats
+def time_encode(frames, fps, backend, resolution="source", quality="balanced", alpha=False):
+    height, width = frames[0].shape[:2]
+    suffix = ".webm" if alpha else ".mp4"
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="encode_benchmark_")
+    os.close(fd)
+    try:
+        with open_encoder(path, fps, (width, height), backend=backend, resolution=resolution,
+                          quality=quality, alpha=alpha) as out:
+            for frame in frames:
+                out.write(cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA) if alpha else frame)
+        return out.stats()
+    finally:
+        os.unlink(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare encode throughput and output size of the video encoders.")
+    parser.add_argument("video", help="Path to a video clip")
+    parser.add_argument("--max-frames", type=int, default=DEFAULT_MAX_FRAMES)
+    parser.add_argument("--resolution", action="append", choices=list(RESOLUTION_PRESETS),
+                        help="Resolution preset to test (repeatable, default: source)")
+    parser.add_argument("--quality", default="balanced")
+    parser.add_argument("--json", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    frames, fps = load_frames(args.video, args.max_frames)
+    if not frames:
+        parser.error(f"Could not read any frames from {args.video}")
+    ffmpeg = find_ffmpeg()
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} frames at {width}x{height}, {exact_fps(fps)} fps")
+    print(f"ffmpeg: {ffmpeg or 'not found'}")
+    if ffmpeg:
+        print(f"hardware H.264 encoders: {', '.join(available_hardware_encoders(ffmpeg)) or 'none'}")
+
+    runs = [(backend, False) for backend in ENCODER_BACKENDS if backend != "auto"]
+    if ffmpeg:
+        runs.append(("overlay", True))
+    results = []
+    for resolution in args.resolution or ["source"]:
+        for backend, alpha in runs:
+            try:
+                stats = time_encode(frames, fps, "auto" if alpha else backend, resolution, args.quality, alpha)
+            except RuntimeError as e:
+                print(f"{backend} @ {resolution}: skipped ({e})")
+                continue
+            results.append(dict(stats, label=backend, resolution=resolution))
+
+    print(f"{'backend':<10}{'codec':<14}{'resolution':<12}{'fps':>9}{'MB':>9}{'kbit/s':>9}")
+    duration = len(frames) / fps
+    for row in results:
+        print(
+            f"{row['label']:<10}{row['codec']:<14}{row['resolution']:<12}{row['fps'] or 0:>9.1f}"
+            f"{row['bytes'] / 1024 ** 2:>9.2f}{row['bytes'] * 8 / 1000 / duration:>9.0f}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"video": args.video, "frames": len(frames), "width": width, "height": height,
+                       "fps": fps, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from movement_index import DRILL, FEATURE_BLOCKS, SESSION, MovementIndex
+from skill_metrics import SKILLS
+
+# Clips added per insert call while building the index
+DEFAULT_BATCH = 1000
+
+# Distinct players and drill labels the synthetic clips are spread over
+PLAYERS = 5000
+DRILLS = 40
+
+
+# Function to make n random vectors shaped like movement_features output: a
+# square-rooted normalized histogram per block, scaled to unit length
+def random_vectors(n, rng):
+    blocks = [np.sqrt(rng.dirichlet(np.ones(len(edges) - 1) * 0.5, size=n)) for _, edges in FEATURE_BLOCKS]
+    return (np.hstack(blocks) / np.sqrt(len(blocks))).astype(np.float32)
+
+
+# Function to time a query a number of times and return the median in milliseconds
+def time_query(query, vectors):
+    times = []
+    for vector in vectors:
+        start = time.perf_counter()
+        query(vector)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure movement index inserts and k-nearest-neighbor queries.")
+    parser.add_argument("--clips", type=int, default=100_000, help="Synthetic clips to index")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--index", help="Index directory (default: a temporary one)")
+    parser.add_argument("--json", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory(prefix="movement_index_") as workdir:
+        index = MovementIndex(args.index or workdir)
+        start = time.perf_counter()
+        for first in range(0, args.clips, args.batch):
+            count = min(args.batch, args.clips - first)
+            vectors = random_vectors(count, rng)
+            drills = rng.random(count) < 0.1
+            index.add([
+                {"vector": vector, "kind": DRILL, "label": f"Drill {j % DRILLS}", "skill": SKILLS[j % len(SKILLS)]}
+                if drill else {"vector": vector, "kind": SESSION, "player": f"Player {j % PLAYERS}",
+                               "content_hash": f"{first + i:064x}"}
+                for i, (vector, drill, j) in enumerate(zip(vectors, drills, rng.integers(0, 1 << 30, count)))
+            ])
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        single = [index.add_clip(vector, player="Benchmark") for vector in random_vectors(100, rng)]
+        single_insert_ms = (time.perf_counter() - start) * 1000 / len(single)
+
+        # A fresh instance reads the metadata of every row on its first query
+        reopened = MovementIndex(index.index_dir)
+        queries = random_vectors(args.queries, rng)
+        start = time.perf_counter()
+        reopened.search(queries[0], k=args.k)
+        first_query_ms = (time.perf_counter() - start) * 1000
+
+        results = {
+            "clips": index.count(),
+            "build_seconds": build,
+            "batch_inserts_per_second": args.clips / build,
+            "single_insert_ms": single_insert_ms,
+            "first_query_ms": first_query_ms,
+            "search_ms": time_query(lambda v: reopened.search(v, k=args.k), queries),
+            "similar_players_ms": time_query(lambda v: reopened.similar_players(v, "Player 0", k=args.k), queries),
+            "match_drills_ms": time_query(lambda v: reopened.match_drills(v, SKILLS[0], k=args.k), queries),
+        }
+
+        # The search is exhaustive, so it must agree with a plain matrix product
+        vectors = np.load(reopened.vectors_path, mmap_mode="r")["vector"]
+        expected = np.argsort(-(vectors @ queries[0]), kind="stable")[:args.k]
+        results["exact"] = [match["row"] for match in reopened.search(queries[0], k=args.k)] == expected.tolist()
+
+    print(f"Indexed {results['clips']} clips in {results['build_seconds']:.1f}s "
+          f"({results['batch_inserts_per_second']:.0f} clips/s in batches of {args.batch}; "
+          f"{results['single_insert_ms']:.2f} ms per single insert)")
+    print(f"First query on a fresh instance: {results['first_query_ms']:.1f} ms")
+    for name in ("search", "similar_players", "match_drills"):
+        print(f"{name + ':':<17}{results[name + '_ms']:.2f} ms (median of {args.queries})")
+    print(f"Matches brute force: {results['exact']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from pose_pool import get_pose_pool
+from skill_metrics import SKILLS
+from synthetic_clips import DEFAULT_CORPUS, DEFAULT_CORPUS_DIR, QUICK_CORPUS, build_corpus
+from video_encoders import ENCODER_BACKENDS, open_encoder
+from video_pipeline import FeedbackOverlay, draw_landmark_array, landmarks_to_array
+
+# Stages timed for every frame, in pipeline order
+STAGES = ["decode", "convert", "pose", "overlay", "encode"]
+
+# Feedback panel drawn during the overlay stage (same size as the real one)
+SAMPLE_FEEDBACK = {skill: (f"Decent {skill}, but can be improved.", (255, 255, 0)) for skill in SKILLS}
+
+# Pipeline fps drop (as a fraction of the baseline) that counts as a regression
+DEFAULT_MAX_REGRESSION = 0.10
+
+
+# Function to read this process's peak resident set size in MB (None where unsupported)
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+# Function to summarize per-frame stage times (seconds) as throughput and latency percentiles
+def summarize(seconds):
+    total = float(np.sum(seconds))
+    return {
+        "seconds": total,
+        "fps": len(seconds) / total if total else None,
+        "p50_ms": float(np.percentile(seconds, 50) * 1000),
+        "p99_ms": float(np.percentile(seconds, 99) * 1000),
+    }
+
+
+# Function to push one clip through decode -> color conversion -> pose -> overlay -> encode,
+# timing every stage of every frame. Runs in its own process so peak RSS is per clip.
+def benchmark_clip(video_path, pose_options, encoder="auto", max_frames=None):
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fd, output_path = tempfile.mkstemp(suffix=".mp4", prefix="pipeline_benchmark_")
+    os.close(fd)
+    overlay = FeedbackOverlay(SAMPLE_FEEDBACK)
+    timings = []
+    detected = 0
+    try:
+        with get_pose_pool().pose(**pose_options) as pose:
+            # Warm up the graph on a blank frame so setup is not counted against the first frame
+            pose.process(np.zeros((height, width, 3), dtype=np.uint8))
+            pose.reset()
+            with open_encoder(output_path, fps, (width, height), backend=encoder) as out:
+                clock = time.perf_counter
+                while max_frames is None or len(timings) < max_frames:
+                    t0 = clock()
+                    ret, frame = cap.read()
+                    t1 = clock()
+                    if not ret:
+                        break
+                    image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    t2 = clock()
+                    results = pose.process(image_rgb)
+                    t3 = clock()
+                    landmarks = landmarks_to_array(results)
+                    draw_landmark_array(frame, landmarks)
+                    overlay.apply(frame)
+                    t4 = clock()
+                    out.write(frame)
+                    t5 = clock()
+                    timings.append((t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4))
+                    detected += results.pose_landmarks is not None
+                flush_start = clock()
+            flush = clock() - flush_start
+            encode = out.stats()
+    finally:
+        cap.release()
+        os.unlink(output_path)
+
+    timings = np.array(timings).reshape(-1, len(STAGES))
+    if not len(timings):
+        raise RuntimeError(f"No frames could be decoded from {video_path}")
+    # Encoders buffer frames, so the time to drain them at the end belongs to the encode stage
+    timings[-1, STAGES.index("encode")] += flush
+    return {
+        "video": video_path,
+        "width": width,
+        "height": height,
+        "fps": fps,
+        "frames": len(timings),
+        "detection_rate": detected / len(timings),
+        "encoder": encode["codec"],
+        "output_bytes": encode["bytes"],
+        "stages": {stage: summarize(timings[:, i]) for i, stage in enumerate(STAGES)},
+        "pipeline": summarize(timings.sum(axis=1)),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# Function to run benchmark_clip in a fresh process
+def run_isolated(video_path, pose_options, encoder, max_frames):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(benchmark_clip, video_path, pose_options, encoder, max_frames).result()
+
+
+# Function to compare a run against a baseline run, clip by clip.
+# Returns rows of (clip, measure, baseline fps, current fps, relative change).
+def compare(results, baseline):
+    rows = []
+    for name, clip in results["clips"].items():
+        base = baseline["clips"].get(name)
+        if base is None:
+            continue
+        for measure in ["pipeline"] + STAGES:
+            current = clip["pipeline"] if measure == "pipeline" else clip["stages"][measure]
+            before = base["pipeline"] if measure == "pipeline" else base["stages"].get(measure)
+            if not before or not before["fps"] or not current["fps"]:
+                continue
+            rows.append((name, measure, before["fps"], current["fps"], current["fps"] / before["fps"] - 1))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each stage of the analysis pipeline on a synthetic corpus.")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("--quick", action="store_true", help="Use the small quick-check corpus")
+    parser.add_argument("--clip", action="append", help="Only run clips with this name (repeatable)")
+    parser.add_argument("--video", action="append", help="Also benchmark this video file (repeatable)")
+    parser.add_argument("--max-frames", type=int)
+    parser.add_argument("--model-complexity", type=int, default=1)
+    parser.add_argument("--static-image-mode", action="store_true")
+    parser.add_argument("--encoder", choices=ENCODER_BACKENDS, default="auto")
+    parser.add_argument("--json", help="Write the results as JSON to this path")
+    parser.add_argument("--baseline", help="Earlier --json output to compare against")
+    parser.add_argument("--max-regression", type=float, default=DEFAULT_MAX_REGRESSION,
+                        help="Exit with an error if pipeline fps drops by more than this fraction")
+    args = parser.parse_args()
+
+    specs = QUICK_CORPUS if args.quick else DEFAULT_CORPUS
+    if args.clip:
+        specs = [spec for spec in specs if spec[0] in args.clip]
+    videos = build_corpus(args.corpus_dir, specs)
+    for path in args.video or []:
+        videos[os.path.splitext(os.path.basename(path))[0]] = path
+
+    pose_options = {"model_complexity": args.model_complexity, "static_image_mode": args.static_image_mode}
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(),
+                    "cpus": os.cpu_count(), "python": platform.python_version(),
+                    "opencv": cv2.__version__},
+        "settings": dict(pose_options, encoder=args.encoder, max_frames=args.max_frames),
+        "clips": {},
+    }
+    header = f"{'clip':<24}{'frames':>7}{'fps':>8}{'p50 ms':>8}{'p99 ms':>8}{'RSS MB':>8}  " + "".join(
+        f"{stage + ' fps':>13}" for stage in STAGES
+    )
+    print(header)
+    for name, path in videos.items():
+        clip = run_isolated(path, pose_options, args.encoder, args.max_frames)
+        results["clips"][name] = clip
+        pipeline = clip["pipeline"]
+        rss = clip["peak_rss_mb"]
+        print(
+            f"{name:<24}{clip['frames']:>7}{pipeline['fps']:>8.1f}{pipeline['p50_ms']:>8.1f}{pipeline['p99_ms']:>8.1f}"
+            f"{'-' if rss is None else f'{rss:.0f}':>8}  "
+            + "".join(f"{clip['stages'][stage]['fps']:>13.1f}" for stage in STAGES)
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline)
+        print(f"\n{'clip':<24}{'measure':<10}{'baseline':>10}{'current':>10}{'change':>9}")
+        regressed = []
+        for name, measure, before, current, change in rows:
+            print(f"{name:<24}{measure:<10}{before:>10.1f}{current:>10.1f}{change:>+9.1%}")
+            if measure == "pipeline" and change < -args.max_regression:
+                regressed.append(name)
+        if regressed:
+            print(f"\nPipeline fps regressed by more than {args.max_regression:.0%} on: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from pose_pool import get_pose_pool
+from pose_sampling import run_sampled
+
+# Sampling modes compared against full-rate processing: (label, stride, scale, roi)
+DEFAULT_MODES = [
+    ("stride 2", 2, 1.0, False),
+    ("stride 4", 4, 1.0, False),
+    ("half resolution", 1, 0.5, False),
+    ("ROI crop", 1, 1.0, True),
+    ("stride 3 + half res + ROI", 3, 0.5, True),
+]
+
+
+# Function to time one analysis pass and return its landmarks and elapsed seconds
+def time_analysis(video_path, pose_options, stride=1, scale=1.0, roi=False):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        with get_pose_pool().pose(**pose_options) as pose:
+            start = time.perf_counter()
+            landmarks = run_sampled(cap, pose, stride=stride, scale=scale, roi=roi)
+            elapsed = time.perf_counter() - start
+    finally:
+        cap.release()
+    return landmarks, elapsed
+
+
+# Function to measure landmark error (in pixels) of a sampled run against the full-rate reference
+def landmark_error(reference, sampled, width, height):
+    count = min(len(reference), len(sampled))
+    ref = reference[:count, :, :2].astype(np.float64)
+    got = sampled[:count, :, :2].astype(np.float64)
+    both = ~np.isnan(ref[..., 0]) & ~np.isnan(got[..., 0])
+    ref_frames = ~np.isnan(ref[:, 0, 0])
+    got_frames = ~np.isnan(got[:, 0, 0])
+    if not both.any():
+        return {"mean_px": None, "p95_px": None, "detection_agreement": float(np.mean(ref_frames == got_frames))}
+    delta = (got - ref) * np.array([width, height])
+    dist = np.hypot(delta[..., 0], delta[..., 1])[both]
+    return {
+        "mean_px": float(dist.mean()),
+        "p95_px": float(np.percentile(dist, 95)),
+        "detection_agreement": float(np.mean(ref_frames == got_frames)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sampled pose analysis against full-rate processing.")
+    parser.add_argument("video", help="Path to a video clip")
+    parser.add_argument("--model-complexity", type=int, default=1)
+    parser.add_argument("--static-image-mode", action="store_true")
+    parser.add_argument("--json", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    pose_options = {"model_complexity": args.model_complexity, "static_image_mode": args.static_image_mode}
+    cap = cv2.VideoCapture(args.video)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+
+    # Warm the pooled model so graph setup is not counted against the first mode
+    time_analysis(args.video, pose_options, stride=1000)
+
+    reference, base_time = time_analysis(args.video, pose_options)
+    frames = len(reference)
+    results = [{"mode": "full rate", "seconds": base_time, "fps": frames / base_time, "speedup": 1.0}]
+    for label, stride, scale, roi in DEFAULT_MODES:
+        landmarks, elapsed = time_analysis(args.video, pose_options, stride, scale, roi)
+        row = {"mode": label, "seconds": elapsed, "fps": frames / elapsed, "speedup": base_time / elapsed}
+        row.update(landmark_error(reference, landmarks, width, height))
+        results.append(row)
+
+    print(f"{frames} frames at {width}x{height}")
+    print(f"{'mode':<28}{'fps':>9}{'speedup':>9}{'mean px':>9}{'p95 px':>9}{'det agree':>11}")
+    for row in results:
+        mean = row.get("mean_px")
+        p95 = row.get("p95_px")
+        agree = row.get("detection_agreement")
+        print(
+            f"{row['mode']:<28}{row['fps']:>9.1f}{row['speedup']:>8.2f}x"
+            f"{'-' if mean is None else f'{mean:.2f}':>9}{'-' if p95 is None else f'{p95:.2f}':>9}"
+            f"{'-' if agree is None else f'{agree:.0%}':>11}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"video": args.video, "frames": frames, "width": width, "height": height, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Kept light on purpose: every measurement runs in a fresh interpreter, and this
+# module must not load the analysis stack itself.
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai_soccer_webapp.py")
+
+# Modules whose import cost the lazy loading is meant to keep off the first render
+HEAVY_MODULES = ["numpy", "cv2", "mediapipe", "pandas", "pyarrow"]
+
+# Seconds a user spends between the page appearing and starting an analysis
+DEFAULT_THINK_TIME = 5.0
+
+# Child script: render the page cold, then again with a name entered (the self-assessment page)
+RENDER_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=120).run()
+first = time.perf_counter()
+loaded = [name for name in {heavy!r} if name in sys.modules]
+at.text_input[0].input("Startup Benchmark").run()
+named = time.perf_counter()
+print(json.dumps({{
+    "streamlit_import_seconds": imported - start,
+    "first_render_seconds": first - imported,
+    "self_assessment_render_seconds": named - first,
+    "loaded_on_first_render": loaded,
+    "loaded_on_self_assessment": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+# Child script: import the app, optionally warm up while the "user" picks a clip, then analyze it
+ANALYSIS_SCRIPT = """
+import json, threading, time
+start = time.perf_counter()
+import ai_soccer_webapp as app
+imported = time.perf_counter()
+warm_up_seconds = None
+if {warm!r}:
+    def run():
+        global warm_up_seconds
+        began = time.perf_counter()
+        app.warm_up()
+        warm_up_seconds = time.perf_counter() - began
+    threading.Thread(target=run, daemon=True).start()
+time.sleep({think!r})
+began = time.perf_counter()
+try:
+    app.process_video({video!r}, output="landmarks", use_cache=False)
+    rated = True
+except ValueError:
+    rated = False
+print(json.dumps({{
+    "app_import_seconds": imported - start,
+    "first_analysis_seconds": time.perf_counter() - began,
+    "warm_up_seconds": warm_up_seconds,
+    "rated": rated,
+}}))
+"""
+
+
+# Function to run a child script in a fresh interpreter and return the JSON it prints and
+# the wall time including interpreter start-up
+def run_child(script, env=None):
+    with tempfile.TemporaryDirectory(prefix="startup_benchmark_") as workdir:
+        child_env = dict(os.environ, **(env or {}))
+        repo = os.path.dirname(APP_PATH)
+        child_env["PYTHONPATH"] = os.pathsep.join(filter(None, [repo, child_env.get("PYTHONPATH")]))
+        # A private scratch area, so runs do not touch the real one. The player store and the
+        # movement index default to paths relative to the working directory, so running in
+        # workdir keeps them private as well.
+        child_env.setdefault("AI_SOCCER_SCRATCH_DIR", os.path.join(workdir, "scratch"))
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", script], cwd=workdir, env=child_env,
+                              capture_output=True, text=True)
+        wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"Benchmark child failed:\n{proc.stderr}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["wall_seconds"] = wall
+    return result
+
+
+# Function to repeat a measurement and keep the median of every numeric field
+def median_of(runs):
+    result = dict(runs[0])
+    for key, value in runs[0].items():
+        if isinstance(value, float):
+            values = [run[key] for run in runs if run[key] is not None]
+            result[key] = statistics.median(values) if values else None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the web app's time to first render and first analysis.")
+    parser.add_argument("--video", help="Clip for the first analysis (default: a synthetic player clip)")
+    parser.add_argument("--repeat", type=int, default=3, help="Cold starts per measurement (median is reported)")
+    parser.add_argument("--think-time", type=float, default=DEFAULT_THINK_TIME,
+                        help="Seconds between the page rendering and the analysis starting")
+    parser.add_argument("--json", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    video = args.video
+    if video is None:
+        from synthetic_clips import DEFAULT_CORPUS_DIR, QUICK_CORPUS, build_corpus
+        video = build_corpus(DEFAULT_CORPUS_DIR, QUICK_CORPUS[:1])[QUICK_CORPUS[0][0]]
+
+    # The render is measured without the warm-up so only what the page itself loads is counted
+    render = median_of([
+        run_child(RENDER_SCRIPT.format(app=APP_PATH, heavy=HEAVY_MODULES), {"AI_SOCCER_WARM_UP": "0"})
+        for _ in range(args.repeat)
+    ])
+    analysis = {
+        label: median_of([
+            run_child(ANALYSIS_SCRIPT.format(warm=warm, think=args.think_time, video=os.path.abspath(video)))
+            for _ in range(args.repeat)
+        ])
+        for label, warm in (("cold", False), ("warmed", True))
+    }
+
+    print(f"Streamlit import:          {render['streamlit_import_seconds']:.2f}s")
+    print(f"First render:              {render['first_render_seconds']:.2f}s "
+          f"(loaded: {', '.join(render['loaded_on_first_render']) or 'none of ' + ', '.join(HEAVY_MODULES)})")
+    print(f"Self-assessment render:    {render['self_assessment_render_seconds']:.2f}s "
+          f"(loaded: {', '.join(render['loaded_on_self_assessment']) or 'none'})")
+    print(f"App import:                {analysis['cold']['app_import_seconds']:.2f}s")
+    for label, row in analysis.items():
+        warm_up = "" if row["warm_up_seconds"] is None else f", warm-up took {row['warm_up_seconds']:.2f}s"
+        print(f"{'First analysis (' + label + '):':<27}{row['first_analysis_seconds']:.2f}s{warm_up}")
+    if not analysis["cold"]["rated"]:
+        print("Note: no player was rated in this clip; the timings cover the analysis up to that point.")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"video": video, "think_time": args.think_time, "repeat": args.repeat,
+                       "render": render, "analysis": analysis}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
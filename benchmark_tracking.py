@@ -0,0 +1,107 @@
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from benchmark_sampling import landmark_error
+from pipeline_metrics import get_metrics
+from pose_pool import get_pose_pool
+from pose_tracking import run_tracked
+from video_pipeline import run_serial
+
+# Tracking modes compared against the plain per-frame loop: (label, roi, reuse, smooth)
+DEFAULT_MODES = [
+    ("smoothing only", False, False, True),
+    ("predicted ROI", True, False, False),
+    ("motion reuse", False, True, False),
+    ("ROI + reuse + smoothing", True, True, True),
+]
+
+
+# Function to time one analysis pass (run_serial when mode is None).
+# Returns its landmarks, elapsed seconds and the tracking counters.
+def time_analysis(video_path, pose_options, mode=None):
+    cap = cv2.VideoCapture(video_path)
+    metrics = get_metrics()
+    metrics.reset()
+    try:
+        with get_pose_pool().pose(**pose_options) as pose:
+            start = time.perf_counter()
+            if mode is None:
+                landmarks = run_serial(cap, pose)
+            else:
+                _, roi, reuse, smooth = mode
+                landmarks = run_tracked(cap, pose, roi=roi, reuse=reuse, smooth=smooth)
+            elapsed = time.perf_counter() - start
+    finally:
+        cap.release()
+    return landmarks, elapsed, metrics.counters()
+
+
+# Function to measure frame-to-frame jitter in pixels: the mean size of the second
+# difference of each landmark's position (acceleration), over frames where all three have a pose
+def jitter(landmarks, width, height):
+    xy = landmarks[:, :, :2].astype(np.float64) * np.array([width, height])
+    if len(xy) < 3:
+        return None
+    accel = xy[2:] - 2 * xy[1:-1] + xy[:-2]
+    size = np.hypot(accel[..., 0], accel[..., 1])
+    size = size[~np.isnan(size)]
+    return float(size.mean()) if len(size) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare tracked pose analysis against the per-frame loop.")
+    parser.add_argument("video", help="Path to a video clip")
+    parser.add_argument("--model-complexity", type=int, default=1)
+    parser.add_argument("--static-image-mode", action="store_true")
+    parser.add_argument("--json", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    pose_options = {"model_complexity": args.model_complexity, "static_image_mode": args.static_image_mode}
+    # Needed for the reuse counter; the per-stage timers this also turns on cost microseconds a frame
+    get_metrics().enable(True, sample_memory=False)
+    cap = cv2.VideoCapture(args.video)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+
+    # Warm the pooled model so graph setup is not counted against the first mode
+    time_analysis(args.video, pose_options)
+
+    reference, base_time, _ = time_analysis(args.video, pose_options)
+    frames = len(reference)
+    results = [{
+        "mode": "per-frame loop", "seconds": base_time, "fps": frames / base_time, "speedup": 1.0,
+        "jitter_px": jitter(reference, width, height),
+    }]
+    for mode in DEFAULT_MODES:
+        landmarks, elapsed, counters = time_analysis(args.video, pose_options, mode)
+        row = {"mode": mode[0], "seconds": elapsed, "fps": frames / elapsed, "speedup": base_time / elapsed,
+               "jitter_px": jitter(landmarks, width, height),
+               "reused": counters.get("tracking_reused_frames", 0) / frames}
+        row.update(landmark_error(reference, landmarks, width, height))
+        results.append(row)
+
+    print(f"{frames} frames at {width}x{height}")
+    print(f"{'mode':<28}{'fps':>9}{'speedup':>9}{'jitter':>9}{'mean px':>9}{'p95 px':>9}{'det agree':>11}{'reused':>8}")
+    for row in results:
+        values = [row.get(key) for key in ("jitter_px", "mean_px", "p95_px")]
+        agree = row.get("detection_agreement")
+        reused = row.get("reused")
+        print(
+            f"{row['mode']:<28}{row['fps']:>9.1f}{row['speedup']:>8.2f}x"
+            + "".join(f"{'-' if value is None else f'{value:.2f}':>9}" for value in values)
+            + f"{'-' if agree is None else f'{agree:.0%}':>11}"
+            + f"{'-' if reused is None else f'{reused:.0%}':>8}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"video": args.video, "frames": frames, "width": width, "height": height, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import bisect
+import json
+import os
+import struct
+import zipfile
+
+
+# Landmark export formats: (file name offered for download, MIME type).
+#   npy     - one record per frame (timestamp + landmarks) in a plain .npy file that can be
+#             memory-mapped; written in chunks, and a valid file after every chunk, so it
+#             can be appended to while frames are still being analyzed
+#   npz     - uncompressed .npz holding "timestamps" and "landmarks" arrays; both can be
+#             memory-mapped straight out of the archive
+#   parquet - one row per frame (per player for multi-player clips) with a column per
+#             landmark coordinate, in row groups that a time slice can skip (needs pyarrow)
+LANDMARK_FORMATS = {
+    "npz": ("landmarks.npz", "application/octet-stream"),
+    "npy": ("landmarks.npy", "application/octet-stream"),
+    "parquet": ("landmarks.parquet", "application/vnd.apache.parquet"),
+}
+
+# Frames buffered by LandmarkWriter before they are appended to the file
+CHUNK_FRAMES = 256
+
+# Frames per Parquet row group; a time slice reads only the row groups it overlaps
+ROW_GROUP_FRAMES = 4096
+
+# Key of the Parquet schema metadata recording the landmark layout
+PARQUET_METADATA_KEY = b"ai_soccer_landmarks"
+
+# Landmark coordinates, in the order of the last axis of a (33, 4) landmark array
+COORDINATES = ["x", "y", "z", "visibility"]
+
+
+# Function to guess an export format from a file's extension
+def landmark_format(path):
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    if extension not in LANDMARK_FORMATS:
+        raise ValueError(f"Unknown landmark format: {extension or path}")
+    return extension
+
+
+# Function to list the export formats usable here (Parquet needs pyarrow)
+def available_formats():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return [name for name in LANDMARK_FORMATS if name != "parquet"]
+    return list(LANDMARK_FORMATS)
+
+
+# Function to get the timestamp in seconds of each of `frames` frames at a fixed fps
+def frame_timestamps(frames, fps):
+    import numpy as np
+    return np.arange(frames, dtype=np.float64) / (fps or 30)
+
+
+# Function to get the .npy record type for frames of the given landmark shape:
+# (33, 4) for one player, (players, 33, 4) for multi-player analysis
+def record_dtype(frame_shape):
+    import numpy as np
+    return np.dtype([("timestamp", "<f8"), ("landmarks", "<f4", tuple(frame_shape))])
+
+
+# Function to build a version 1.0 .npy header for `frames` records, padded with spaces to
+# size bytes (default: the next multiple of 64)
+def npy_header(dtype, frames, size=None):
+    import numpy as np
+    header = repr({"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (frames,)})
+    # Magic (6 bytes), version (2) and header length (2) come before the header and its newline
+    size = size or -(-(10 + len(header) + 1) // 64) * 64
+    header = header.ljust(size - 10 - 1) + "\n"
+    return np.lib.format.MAGIC_PREFIX + bytes([1, 0]) + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+# Writes frames to an .npy file of records in chunks. The header is rewritten after
+# every chunk, so the file is always a valid .npy of the frames flushed so far and
+# np.load(path, mmap_mode="r") or read_landmarks() can read it while it grows.
+class LandmarkWriter:
+    def __init__(self, path, frame_shape, chunk_frames=CHUNK_FRAMES):
+        import numpy as np
+        self.path = path
+        self.dtype = record_dtype(frame_shape)
+        self.frames = 0
+        self._chunk = np.empty(max(1, chunk_frames), dtype=self.dtype)
+        self._pending = 0
+        # Room for any frame count, so the header never has to grow
+        self._header_size = len(npy_header(self.dtype, 10 ** 18))
+        self._file = open(path, "wb")
+        self._file.write(npy_header(self.dtype, 0, self._header_size))
+        self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # Function to add one frame's landmarks with its timestamp in seconds
+    def append(self, landmarks, timestamp):
+        self._chunk[self._pending] = (timestamp, landmarks)
+        self._pending += 1
+        if self._pending == len(self._chunk):
+            self.flush()
+
+    # Function to add many frames at once: (frames, ...) landmarks and (frames,) timestamps
+    def extend(self, landmarks, timestamps):
+        for start in range(0, len(landmarks), len(self._chunk)):
+            self.flush()
+            count = min(len(self._chunk), len(landmarks) - start)
+            self._chunk["timestamp"][:count] = timestamps[start:start + count]
+            self._chunk["landmarks"][:count] = landmarks[start:start + count]
+            self._pending = count
+        self.flush()
+
+    # Function to append buffered frames, then update the frame count in the header
+    def flush(self):
+        if self._pending:
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(self._chunk[:self._pending].tobytes())
+            self.frames += self._pending
+            self._pending = 0
+            self._file.seek(0)
+            self._file.write(npy_header(self.dtype, self.frames, self._header_size))
+            self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+# Function to open an .npz member as a memory map, or None when it is compressed
+def _npz_memmap(path, name):
+    import numpy as np
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(name + ".npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    with open(path, "rb") as f:
+        # The member's data follows its local file header (30 bytes plus name and extra field)
+        f.seek(info.header_offset + 26)
+        name_length, extra_length = struct.unpack("<HH", f.read(4))
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if not np.prod(shape):
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape,
+                     order="F" if fortran_order else "C")
+
+
+# Function to write landmarks with their timestamps in one of LANDMARK_FORMATS
+# (default: from the path's extension). landmarks is (frames, 33, 4), or
+# (frames, players, 33, 4) for multi-player analysis; NaN marks frames without a pose.
+def write_landmarks(path, landmarks, timestamps, format=None):
+    import numpy as np
+    format = format or landmark_format(path)
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if len(timestamps) != len(landmarks):
+        raise ValueError("Need one timestamp per frame")
+    if format == "npy":
+        with LandmarkWriter(path, landmarks.shape[1:]) as writer:
+            writer.extend(landmarks, timestamps)
+    elif format == "npz":
+        # Stored uncompressed so the arrays can be memory-mapped
+        with open(path, "wb") as f:
+            np.savez(f, timestamps=timestamps, landmarks=landmarks)
+    elif format == "parquet":
+        _write_parquet(path, landmarks, timestamps)
+    else:
+        raise ValueError(f"Unknown landmark format: {format}")
+    return path
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet landmark export needs pyarrow: pip install pyarrow") from None
+    return pa, pq
+
+
+def _write_parquet(path, landmarks, timestamps):
+    import numpy as np
+    pa, pq = _import_pyarrow()
+    multi = landmarks.ndim == 4
+    players = landmarks.shape[1] if multi else 1
+    points = landmarks.shape[-2]
+    per_row = landmarks.reshape(len(landmarks) * players, points * len(COORDINATES))
+    columns = {
+        "frame": np.repeat(np.arange(len(landmarks), dtype=np.int32), players),
+        "timestamp": np.repeat(timestamps, players),
+    }
+    if multi:
+        columns["player"] = np.tile(np.arange(1, players + 1, dtype=np.int16), len(landmarks))
+    for i in range(points):
+        for j, axis in enumerate(COORDINATES):
+            columns[f"{axis}_{i}"] = per_row[:, i * len(COORDINATES) + j]
+    table = pa.table(columns)
+    layout = {"frames": len(landmarks), "frame_shape": list(landmarks.shape[1:])}
+    table = table.replace_schema_metadata({PARQUET_METADATA_KEY: json.dumps(layout).encode()})
+    pq.write_table(table, path, row_group_size=ROW_GROUP_FRAMES * players)
+
+
+def _read_parquet(path, start, end):
+    import numpy as np
+    pa, pq = _import_pyarrow()
+    parquet = pq.ParquetFile(path)
+    layout = json.loads(parquet.schema_arrow.metadata[PARQUET_METADATA_KEY])
+    timestamp_column = parquet.schema_arrow.get_field_index("timestamp")
+    groups = []
+    for i in range(parquet.num_row_groups):
+        stats = parquet.metadata.row_group(i).column(timestamp_column).statistics
+        # Skip row groups that lie wholly outside [start, end)
+        if stats is not None and stats.has_min_max and (
+                (start is not None and stats.max < start) or (end is not None and stats.min >= end)):
+            continue
+        groups.append(i)
+    shape = tuple(layout["frame_shape"])
+    rows_per_frame = shape[0] if len(shape) == 3 else 1
+    if not groups:
+        return np.empty(0), np.empty((0, *shape), dtype=np.float32)
+    table = parquet.read_row_groups(groups)
+    timestamps = table.column("timestamp").to_numpy()
+    keep = np.ones(len(timestamps), dtype=bool)
+    if start is not None:
+        keep &= timestamps >= start
+    if end is not None:
+        keep &= timestamps < end
+    names = [f"{axis}_{i}" for i in range(shape[-2]) for axis in COORDINATES]
+    values = np.column_stack([table.column(name).to_numpy()[keep] for name in names]).astype(np.float32)
+    landmarks = values.reshape(-1, *shape)
+    return timestamps[keep][::rows_per_frame], landmarks
+
+
+# Function to find the frames with start <= timestamp < end by binary search, touching only
+# the timestamps it compares (timestamps may be a memory map)
+def _time_slice(timestamps, start, end):
+    first = 0 if start is None else bisect.bisect_left(timestamps, start)
+    last = len(timestamps) if end is None else bisect.bisect_left(timestamps, end)
+    return first, max(first, last)
+
+
+# Function to read the frames with start <= timestamp < end seconds (None for open ends)
+# from a file written by write_landmarks or LandmarkWriter. Only the requested slice is
+# read from .npy, uncompressed .npz and Parquet files, not the whole file.
+# Returns (timestamps, landmarks) arrays.
+def read_landmarks(path, start=None, end=None):
+    import numpy as np
+    format = landmark_format(path)
+    if format == "parquet":
+        return _read_parquet(path, start, end)
+    if format == "npy":
+        records = np.load(path, mmap_mode="r")
+        if records.dtype.names is None:
+            # A bare (frames, 33, 4) array: no timestamps stored
+            raise ValueError(f"{path} has no timestamps; it was not written by write_landmarks")
+        first, last = _time_slice(records["timestamp"], start, end)
+        chunk = np.array(records[first:last])
+        return chunk["timestamp"], chunk["landmarks"]
+    with zipfile.ZipFile(path) as archive:
+        members = set(archive.namelist())
+    if "timestamps.npy" not in members or "landmarks.npy" not in members:
+        # e.g. the pose cache's own landmark files, which hold the landmarks alone
+        raise ValueError(f"{path} has no timestamps; it was not written by write_landmarks")
+    timestamps = _npz_memmap(path, "timestamps")
+    landmarks = _npz_memmap(path, "landmarks")
+    if timestamps is None or landmarks is None:
+        # Compressed archive (e.g. saved with np.savez_compressed): these load whole
+        with np.load(path) as data:
+            timestamps, landmarks = data["timestamps"], data["landmarks"]
+    first, last = _time_slice(timestamps, start, end)
+    return np.array(timestamps[first:last]), np.array(landmarks[first:last])
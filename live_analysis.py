@@ -0,0 +1,284 @@
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from landmark_export import LandmarkWriter
+from pipeline_metrics import get_metrics
+from pose_pool import get_live_pose_pool
+from pose_sampling import infer_landmarks
+from pose_tracking import OneEuroFilter, smooth_landmarks
+from video_pipeline import NUM_LANDMARKS, FeedbackOverlay, draw_landmark_array
+
+# Default end-to-end latency budget (capture to annotated frame), in seconds
+DEFAULT_LATENCY_BUDGET = 0.25
+
+# Inference resolution limits for the latency controller
+MIN_SCALE = 0.25
+MAX_SCALE = 1.0
+
+# The controller looks at the latency of this many recent frames before adjusting the scale
+CONTROL_WINDOW = 10
+
+# Scale steps: shrink when over budget, grow back when under this share of it
+SCALE_DOWN = 0.8
+SCALE_UP = 1.1
+HEADROOM = 0.6
+
+# Seconds between feedback panel refreshes, and how much recent movement they rate
+FEEDBACK_INTERVAL = 5.0
+FEEDBACK_WINDOW = 10.0
+
+# Landmark history kept for the session ratings, in seconds
+MAX_HISTORY_SECONDS = 600
+
+# Seconds a new session waits for a free pose estimator before giving up
+LIVE_ACQUIRE_TIMEOUT = 10
+
+# Seconds to wait before reopening a stream that stopped delivering frames
+RECONNECT_DELAY = 1.0
+
+
+# Function to turn a source string into what cv2.VideoCapture expects:
+# "0" -> camera index 0, anything else (file path, rtsp:// or http:// URL) as is
+def parse_source(source):
+    source = str(source).strip()
+    return int(source) if source.isdigit() else source
+
+
+# Single-slot mailbox holding only the newest frame. A frame that is replaced
+# before anyone takes it is dropped, so a slow consumer never builds a backlog.
+class LatestFrame:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._cond.notify()
+
+    def take(self, timeout=None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._item is not None, timeout):
+                return None
+            item, self._item = self._item, None
+            return item
+
+
+# Function to resample irregularly timed landmarks onto a uniform frame rate,
+# holding each analyzed frame until the next one (frames are dropped unevenly in live mode)
+def resample_landmarks(times, landmarks, fps):
+    times = np.asarray(times, dtype=np.float64)
+    if len(times) < 2:
+        return np.asarray(landmarks, dtype=np.float32)
+    grid = np.arange(times[0], times[-1], 1.0 / fps)
+    index = np.searchsorted(times, grid, side="right") - 1
+    return np.asarray(landmarks, dtype=np.float32)[index]
+
+
+# Runs pose estimation on a camera, stream or (looping) file in real time.
+# A capture thread keeps only the newest frame; an analysis thread takes it, runs
+# pose, draws the keypoints and feedback panel and publishes the annotated frame.
+# When frames arrive faster than they can be analyzed the extra ones are dropped,
+# and if latency still exceeds the budget the inference resolution is lowered.
+# Landmarks are smoothed with a One Euro filter on capture time, which also keeps
+# the overlay steady across those uneven gaps.
+# feedback_fn(landmarks, fps, aspect), if given, is called every FEEDBACK_INTERVAL
+# seconds with recent landmarks and returns a feedback dict for the panel (or None).
+# record_path, if given, is an .npy file every analyzed frame's landmarks are appended
+# to as they come, with seconds since start() as timestamps (see landmark_export).
+class LiveAnalyzer:
+    def __init__(self, source, pose_options=None, latency_budget=DEFAULT_LATENCY_BUDGET, loop=True,
+                 feedback_fn=None, ai_feedback=None, record_path=None):
+        self.source = parse_source(source)
+        self.pose_options = pose_options or {}
+        self.latency_budget = latency_budget
+        self.loop = loop
+        self.feedback_fn = feedback_fn
+        self.ai_feedback = ai_feedback or {}
+        self.record_path = record_path
+        self.scale = MAX_SCALE
+        self.error = None
+        self.frame_size = None
+        self._frames = LatestFrame()
+        self._output_lock = threading.Lock()
+        self._output = None
+        self._latencies = deque(maxlen=100)
+        self._history = deque()
+        self._captured = 0
+        self._analyzed = 0
+        self._started_at = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def is_file(self):
+        return isinstance(self.source, str) and "://" not in self.source and os.path.exists(self.source)
+
+    def start(self):
+        self._started_at = time.monotonic()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="live-capture", daemon=True),
+            threading.Thread(target=self._analyze_loop, name="live-analysis", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        # Cameras queue frames in the driver; keep that queue as short as possible
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    # Capture stage: read frames as they come (files are paced to their frame rate
+    # and looped, like a camera) and hand the newest one to the analysis thread
+    def _capture_loop(self):
+        cap = self._open()
+        try:
+            if not cap.isOpened():
+                raise RuntimeError(f"Could not open video source {self.source!r}")
+            frame_interval = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30) if self.is_file else 0.0
+            next_due = time.monotonic()
+            while not self._stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    if self.is_file and self.loop:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    if self.is_file:
+                        break
+                    # A stream hiccup: reconnect instead of giving up
+                    cap.release()
+                    self._stop.wait(RECONNECT_DELAY)
+                    cap = self._open()
+                    continue
+                if frame_interval:
+                    next_due += frame_interval
+                    delay = next_due - time.monotonic()
+                    if delay > 0:
+                        self._stop.wait(delay)
+                    else:
+                        next_due = time.monotonic()
+                self._captured += 1
+                self._frames.put((frame, time.monotonic()))
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            cap.release()
+            self._stop.set()
+
+    # Analysis stage: pose on the newest frame, overlay, publish, and keep latency in budget
+    def _analyze_loop(self):
+        overlay = FeedbackOverlay(self.ai_feedback)
+        last_feedback = time.monotonic()
+        timer = get_metrics().timer()
+        smoother = OneEuroFilter()
+        recorder = None
+        try:
+            if self.record_path is not None:
+                recorder = LandmarkWriter(self.record_path, (NUM_LANDMARKS, 4))
+            with get_live_pose_pool().pose(timeout=LIVE_ACQUIRE_TIMEOUT, **self.pose_options) as pose:
+                while not self._stop.is_set():
+                    item = self._frames.take(timeout=0.1)
+                    if item is None:
+                        continue
+                    frame, captured_at = item
+                    self.frame_size = (frame.shape[1], frame.shape[0])
+                    timer.start()
+                    landmarks = infer_landmarks(frame, pose, self.scale, timer=timer)
+                    smooth_landmarks(landmarks, smoother, captured_at)
+                    if recorder is not None:
+                        recorder.append(landmarks, captured_at - self._started_at)
+                    draw_landmark_array(frame, landmarks)
+                    timer.lap("draw")
+                    overlay.apply(frame)
+                    timer.lap("overlay")
+                    now = time.monotonic()
+                    with self._output_lock:
+                        self._output = frame
+                        self._latencies.append(now - captured_at)
+                        self._history.append((captured_at, landmarks))
+                        while self._history and now - self._history[0][0] > MAX_HISTORY_SECONDS:
+                            self._history.popleft()
+                    self._analyzed += 1
+                    if self._analyzed % CONTROL_WINDOW == 0:
+                        self._adjust_scale()
+                    if self.feedback_fn is not None and now - last_feedback >= FEEDBACK_INTERVAL:
+                        last_feedback = now
+                        feedback = self.feedback_fn(*self.recent_landmarks(FEEDBACK_WINDOW))
+                        if feedback:
+                            self.ai_feedback = feedback
+                            overlay = FeedbackOverlay(feedback)
+        except TimeoutError:
+            # Every live estimator is taken by other sessions
+            self.error = "Too many live sessions are running, please try again later"
+            self._stop.set()
+        except Exception as e:
+            self.error = str(e)
+            self._stop.set()
+        finally:
+            if recorder is not None:
+                recorder.close()
+
+    def _adjust_scale(self):
+        with self._output_lock:
+            recent = sorted(list(self._latencies)[-CONTROL_WINDOW:])
+        latency = recent[len(recent) // 2]
+        if latency > self.latency_budget:
+            self.scale = max(MIN_SCALE, self.scale * SCALE_DOWN)
+        elif latency < self.latency_budget * HEADROOM:
+            self.scale = min(MAX_SCALE, self.scale * SCALE_UP)
+
+    # Function to get the newest annotated BGR frame (None until the first one is ready)
+    def latest_frame(self):
+        with self._output_lock:
+            return self._output
+
+    # Function to get the landmarks of the last `seconds` (all when None) resampled to a
+    # uniform rate, as (landmarks, fps, aspect) ready for compute_skill_metrics
+    def recent_landmarks(self, seconds=None):
+        with self._output_lock:
+            history = list(self._history)
+        if seconds is not None and history:
+            history = [item for item in history if item[0] >= history[-1][0] - seconds]
+        if len(history) < 2:
+            return np.empty((0, 33, 4), dtype=np.float32), 30.0, 1.0
+        times = [t for t, _ in history]
+        fps = max(1.0, (len(times) - 1) / (times[-1] - times[0]))
+        width, height = self.frame_size or (1, 1)
+        return resample_landmarks(times, [lm for _, lm in history], fps), fps, width / max(height, 1)
+
+    # Function to report capture / analysis rates, drops and latency so far
+    def stats(self):
+        elapsed = max(1e-9, time.monotonic() - (self._started_at or time.monotonic()))
+        with self._output_lock:
+            latencies = sorted(self._latencies)
+        return {
+            "seconds": elapsed,
+            "captured": self._captured,
+            "analyzed": self._analyzed,
+            "dropped": self._frames.dropped,
+            "capture_fps": self._captured / elapsed,
+            "analysis_fps": self._analyzed / elapsed,
+            "latency_p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else None,
+            "latency_p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None,
+            "scale": self.scale,
+            "error": self.error,
+        }
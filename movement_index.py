@@ -0,0 +1,427 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+from landmark_export import npy_header
+from player_store import player_key
+from skill_metrics import (
+    LEFT_ANKLE, LEFT_HIP, LEFT_KNEE, LEFT_SHOULDER, MIN_TRACKED_FRAMES, MIN_VISIBILITY, RIGHT_ANKLE, RIGHT_HIP,
+    RIGHT_KNEE, RIGHT_SHOULDER, SKILLS, fill_gaps, joint_angle, smooth,
+)
+
+# Where the index lives unless a directory is passed explicitly (next to the player store)
+DEFAULT_INDEX_DIR = "movement_index"
+
+# Bump when movement_features changes; an index built with other features has to be rebuilt
+FEATURE_VERSION = 1
+
+# What an indexed clip is: an analyzed training session, or a reference clip of a drill
+SESSION = "session"
+DRILL = "drill"
+KINDS = [SESSION, DRILL]
+
+# MediaPipe Pose landmark indices used here besides the ones skill_metrics uses
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+
+# Joint angles histogrammed into the feature vector: the angle at the middle point.
+# "hips" is the midpoint of the hips, so "stride" is the angle between the thighs.
+JOINT_ANGLES = {
+    "left_knee": (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE),
+    "right_knee": (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE),
+    "left_hip": (LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE),
+    "right_hip": (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_KNEE),
+    "left_elbow": (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+    "right_elbow": (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+    "stride": (LEFT_KNEE, "hips", RIGHT_KNEE),
+}
+
+# Bin edges of the histograms: joint angles (degrees), trunk lean from upright (degrees,
+# positive leaning right), hip speed (torso lengths / s) and knee angular speed (degrees / s)
+ANGLE_EDGES = [15.0 * i for i in range(13)]
+LEAN_EDGES = [15.0 * i - 90.0 for i in range(13)]
+SPEED_EDGES = [0.0, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, float("inf")]
+KNEE_SPEED_EDGES = [0.0, 25.0, 50.0, 100.0, 200.0, 400.0, 800.0, 1600.0, float("inf")]
+
+# Histograms making up a feature vector, in order
+FEATURE_BLOCKS = [(name, ANGLE_EDGES) for name in JOINT_ANGLES] + [
+    ("trunk_lean", LEAN_EDGES), ("hip_speed", SPEED_EDGES), ("knee_speed", KNEE_SPEED_EDGES),
+]
+FEATURE_DIM = sum(len(edges) - 1 for _, edges in FEATURE_BLOCKS)
+
+# Vectors scored per step of a search, bounding its scratch memory on large indexes
+SEARCH_BLOCK_ROWS = 65536
+
+VECTORS_FILE = "vectors.npy"
+INDEX_FILE = "index.db"
+
+
+# Function to turn a (frames, 33, 4) landmark series into a movement feature vector: a
+# normalized histogram per joint angle, of trunk lean and of hip and knee speed, so clips
+# of any length, framing and distance to the camera compare. aspect is the frame's width /
+# height. Each histogram is square-rooted and the vector scaled to at most unit length,
+# so the dot product of two vectors is the mean Bhattacharyya coefficient of their
+# histograms: 1 for identical movement, 0 for none in common. Histograms of joints that
+# are never visible are left at zero. Returns None when the player is tracked in too few frames.
+def movement_features(landmarks, fps, aspect=1.0):
+    import numpy as np
+    fps = float(fps) or 30.0
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    visible = landmarks[..., 3] >= MIN_VISIBILITY
+    tracked = visible[:, [LEFT_HIP, RIGHT_HIP]].all(axis=1)
+    if tracked.sum() < MIN_TRACKED_FRAMES:
+        return None
+
+    # As in compute_skill_metrics: the tracked span, short dropouts filled, lightly smoothed
+    first, last = np.flatnonzero(tracked)[[0, -1]]
+    points = landmarks[first:last + 1, :, :2].astype(np.float64)
+    points[~visible[first:last + 1]] = np.nan
+    points[..., 0] *= aspect
+    points = smooth(fill_gaps(points), max(1, round(fps / 10)))
+    hips = (points[:, LEFT_HIP] + points[:, RIGHT_HIP]) / 2
+    shoulders = (points[:, LEFT_SHOULDER] + points[:, RIGHT_SHOULDER]) / 2
+
+    def point(index):
+        return hips if index == "hips" else points[:, index]
+
+    series = {name: joint_angle(point(a), point(b), point(c)) for name, (a, b, c) in JOINT_ANGLES.items()}
+    trunk = shoulders - hips
+    series["trunk_lean"] = np.degrees(np.arctan2(trunk[:, 0], -trunk[:, 1]))
+    torso = np.nanmedian(np.linalg.norm(trunk, axis=1)) if not np.isnan(trunk).all() else np.nan
+    if not torso > 0:
+        torso = 3 * np.nanmedian(np.linalg.norm(points[:, LEFT_HIP] - points[:, RIGHT_HIP], axis=1)) or 1.0
+    series["hip_speed"] = np.linalg.norm(np.gradient(hips, axis=0), axis=1) * fps / torso
+    series["knee_speed"] = np.concatenate([
+        np.abs(np.gradient(series[name])) * fps for name in ("left_knee", "right_knee")
+    ])
+
+    blocks = []
+    for name, edges in FEATURE_BLOCKS:
+        values = series[name][~np.isnan(series[name])]
+        counts = np.histogram(np.clip(values, edges[0], edges[-1]), edges)[0].astype(np.float64)
+        blocks.append(np.sqrt(counts / counts.sum()) if counts.sum() else counts)
+    return (np.concatenate(blocks) / np.sqrt(len(blocks))).astype(np.float32)
+
+
+# On-disk k-nearest-neighbor index of movement feature vectors. The vectors are the rows
+# of a .npy file (np.load(..., mmap_mode="r") opens it as a memory map) that inserts
+# append to, rewriting the row count in its fixed-size header. An SQLite table in the
+# same directory holds what each row is: a player's session (with the clip's content
+# hash) or a labeled reference clip of a drill. Writers take SQLite's write lock around
+# each insert, so sessions and batch jobs in several processes can add clips at once;
+# searches read the memory map and never block them.
+class MovementIndex:
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR):
+        import numpy as np
+        self.index_dir = index_dir
+        self.vectors_path = os.path.join(index_dir, VECTORS_FILE)
+        self.dtype = np.dtype([("vector", "<f4", (FEATURE_DIM,))])
+        # Room for any row count, so the header never has to grow
+        self._header_size = len(npy_header(self.dtype, 10 ** 18))
+        self._lock = threading.Lock()
+        self._rows = 0
+        self._vectors = None
+        # Per-row metadata kept in memory for filtering, extended as rows are added
+        self._kinds = np.empty(0, dtype=np.int8)
+        self._players = np.empty(0, dtype=np.int32)
+        self._labels = np.empty(0, dtype=np.int32)
+        self._skills = np.empty(0, dtype=np.int8)
+        self._player_ids = {}
+        self._label_ids = {}
+        os.makedirs(index_dir, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS clips ("
+                " row INTEGER PRIMARY KEY, kind TEXT NOT NULL, player TEXT, player_key TEXT, content_hash TEXT,"
+                " label TEXT, skill TEXT, recorded_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS clips_by_hash ON clips (content_hash, player_key)")
+            layout = {"feature_version": FEATURE_VERSION, "feature_dim": FEATURE_DIM}
+            for key, value in layout.items():
+                db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            stored = dict(db.execute("SELECT key, value FROM meta").fetchall())
+        if any(stored[key] != value for key, value in layout.items()):
+            raise ValueError(f"{index_dir} holds version {stored['feature_version']} movement features; "
+                             f"this version uses {FEATURE_VERSION}: rebuild the index")
+        try:
+            with open(self.vectors_path, "xb") as f:
+                f.write(npy_header(self.dtype, 0, self._header_size))
+        except FileExistsError:
+            pass
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(os.path.join(self.index_dir, INDEX_FILE), timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    # Function to add clips in one transaction. Each record is a dict with vector (from
+    # movement_features), kind (SESSION or DRILL) and optionally player, content_hash,
+    # label (a drill's name), skill (the drill's skill) and recorded_at (unix seconds,
+    # default now). A session already indexed for the same player and clip is not added
+    # again. Returns the rows of the records, in order.
+    def add(self, records):
+        import numpy as np
+        now = time.time()
+        rows = []
+        with self._connect() as db:
+            # Take the write lock up front: the next row number must not change until commit
+            db.execute("BEGIN IMMEDIATE")
+            next_row = db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM clips").fetchone()[0]
+            vectors = []
+            for record in records:
+                if record["kind"] not in KINDS:
+                    raise ValueError(f"Unknown clip kind: {record['kind']}")
+                if record.get("skill") is not None and record["skill"] not in SKILLS:
+                    raise ValueError(f"Unknown skill: {record['skill']}")
+                key = player_key(record["player"]) if record.get("player") else None
+                if record["kind"] == SESSION and record.get("content_hash"):
+                    existing = db.execute(
+                        "SELECT row FROM clips WHERE content_hash = ? AND player_key IS ? AND kind = ?",
+                        (record["content_hash"], key, SESSION),
+                    ).fetchone()
+                    if existing is not None:
+                        rows.append(existing[0])
+                        continue
+                vector = np.asarray(record["vector"], dtype=np.float32)
+                if vector.shape != (FEATURE_DIM,):
+                    raise ValueError(f"Expected a movement vector of {FEATURE_DIM} values")
+                db.execute(
+                    "INSERT INTO clips (row, kind, player, player_key, content_hash, label, skill, recorded_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (next_row + len(vectors), record["kind"], record.get("player"), key, record.get("content_hash"),
+                     record.get("label"), record.get("skill"), record.get("recorded_at", now)),
+                )
+                rows.append(next_row + len(vectors))
+                vectors.append(vector)
+            if vectors:
+                # Rows past the committed count are leftovers of a crashed insert and are overwritten
+                with open(self.vectors_path, "r+b") as f:
+                    f.seek(self._header_size + next_row * self.dtype.itemsize)
+                    f.write(np.stack(vectors).tobytes())
+                    f.seek(0)
+                    f.write(npy_header(self.dtype, next_row + len(vectors), self._header_size))
+        return rows
+
+    # Function to add one clip's vector; returns its row
+    def add_clip(self, vector, kind=SESSION, player=None, content_hash=None, label=None, skill=None,
+                 recorded_at=None):
+        record = {"vector": vector, "kind": kind, "player": player, "content_hash": content_hash,
+                  "label": label, "skill": skill}
+        if recorded_at is not None:
+            record["recorded_at"] = recorded_at
+        return self.add([record])[0]
+
+    # Function to count the indexed clips, optionally of one kind
+    def count(self, kind=None):
+        with self._connect() as db:
+            if kind is None:
+                return db.execute("SELECT COUNT(*) FROM clips").fetchone()[0]
+            return db.execute("SELECT COUNT(*) FROM clips WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def _id(self, ids, value):
+        if value is None:
+            return -1
+        return ids.setdefault(value, len(ids))
+
+    # Function to load the metadata of rows added since the last call (by any process)
+    # and reopen the memory map when the file has grown
+    def _refresh(self):
+        import numpy as np
+        with self._connect() as db:
+            new = db.execute(
+                "SELECT row, kind, player_key, label, skill FROM clips WHERE row >= ? ORDER BY row", (self._rows,)
+            ).fetchall()
+        if new:
+            self._kinds = np.concatenate([self._kinds, [KINDS.index(kind) for _, kind, _, _, _ in new]]).astype(np.int8)
+            self._players = np.concatenate(
+                [self._players, [self._id(self._player_ids, key) for _, _, key, _, _ in new]]).astype(np.int32)
+            self._labels = np.concatenate(
+                [self._labels, [self._id(self._label_ids, label) for _, _, _, label, _ in new]]).astype(np.int32)
+            self._skills = np.concatenate(
+                [self._skills, [SKILLS.index(skill) if skill else -1 for *_, skill in new]]).astype(np.int8)
+            self._rows += len(new)
+        if self._rows and (self._vectors is None or len(self._vectors) < self._rows):
+            self._vectors = np.load(self.vectors_path, mmap_mode="r")["vector"]
+
+    # Function to score every row against a vector, block by block, and return the scores
+    # of the rows passing mask (None: all rows) with their row numbers
+    def _scores(self, vector, mask):
+        import numpy as np
+        vector = np.asarray(vector, dtype=np.float32)
+        if vector.shape != (FEATURE_DIM,):
+            raise ValueError(f"Expected a movement vector of {FEATURE_DIM} values")
+        scores = np.empty(self._rows, dtype=np.float32)
+        for start in range(0, self._rows, SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, self._rows)
+            np.dot(self._vectors[start:end], vector, out=scores[start:end])
+        rows = np.arange(self._rows) if mask is None else np.flatnonzero(mask)
+        return rows, scores[rows]
+
+    # Function to build the filter mask for a search (None when nothing is filtered)
+    def _mask(self, kind=None, skill=None, exclude_player=None):
+        import numpy as np
+        mask = np.ones(self._rows, dtype=bool)
+        if kind is not None:
+            mask &= self._kinds == KINDS.index(kind)
+        if skill is not None:
+            mask &= self._skills == SKILLS.index(skill)
+        if exclude_player is not None and player_key(exclude_player) in self._player_ids:
+            mask &= self._players != self._player_ids[player_key(exclude_player)]
+        return None if mask.all() else mask
+
+    # Function to read the metadata of rows, as dicts with each row's score added
+    def _describe(self, rows, scores):
+        if not len(rows):
+            return []
+        with self._connect() as db:
+            found = db.execute(
+                "SELECT row, kind, player, content_hash, label, skill, recorded_at FROM clips"
+                f" WHERE row IN ({', '.join('?' * len(rows))})", [int(row) for row in rows],
+            ).fetchall()
+        columns = ["row", "kind", "player", "content_hash", "label", "skill", "recorded_at"]
+        by_row = {row[0]: dict(zip(columns, row)) for row in found}
+        return [dict(by_row[int(row)], score=float(score)) for row, score in zip(rows, scores)]
+
+    # Function to keep the k best-scoring rows, best first
+    @staticmethod
+    def _top(rows, scores, k):
+        import numpy as np
+        if len(rows) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+    # Function to keep the best-scoring row of each group (player or drill label), then the k best groups
+    @staticmethod
+    def _top_per_group(rows, scores, groups, k):
+        import numpy as np
+        # Only the best candidates are sorted, widening the pool until it holds k groups
+        candidates = 8 * k
+        while True:
+            top_rows, top_scores = MovementIndex._top(rows, scores, candidates)
+            _, first = np.unique(groups[top_rows], return_index=True)
+            if len(first) >= k or len(top_rows) == len(rows):
+                break
+            candidates *= 4
+        # Rows are best first, so each group's first row is its best
+        first.sort()
+        return top_rows[first[:k]], top_scores[first[:k]]
+
+    # Function to find the k indexed clips that move most like a feature vector, best first,
+    # optionally only of one kind, of drills for one skill and/or not of one player.
+    # Returns dicts with row, kind, player, content_hash, label, skill, recorded_at and score
+    # (1 for identical movement features, 0 for nothing in common). k < 1 finds nothing.
+    def search(self, vector, k=5, kind=None, skill=None, exclude_player=None):
+        if k < 1:
+            return []
+        with self._lock:
+            self._refresh()
+            if not self._rows:
+                return []
+            rows, scores = self._scores(vector, self._mask(kind, skill, exclude_player))
+        return self._describe(*self._top(rows, scores, k))
+
+    # Function to find the k other players whose sessions move most like a feature vector,
+    # each with their closest session
+    def similar_players(self, vector, player=None, k=5):
+        if k < 1:
+            return []
+        with self._lock:
+            self._refresh()
+            if not self._rows:
+                return []
+            rows, scores = self._scores(vector, self._mask(SESSION, exclude_player=player))
+            rows, scores = self._top_per_group(rows, scores, self._players, k)
+        return self._describe(rows, scores)
+
+    # Function to find the k drills whose reference clips move most like a feature vector,
+    # optionally only drills for one skill, each with its closest reference clip
+    def match_drills(self, vector, skill=None, k=5):
+        if k < 1:
+            return []
+        with self._lock:
+            self._refresh()
+            if not self._rows:
+                return []
+            rows, scores = self._scores(vector, self._mask(DRILL, skill))
+            rows, scores = self._top_per_group(rows, scores, self._labels, k)
+        return self._describe(rows, scores)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+# Function to get the process-wide movement index, creating it on first use
+def get_movement_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = MovementIndex()
+        return _index
+
+
+# Function to analyze a clip (cached like the app's analyses) and get its movement vector
+def clip_features(video_path):
+    import numpy as np
+    from ai_soccer_webapp import process_video
+    output_path, ai_ratings, ai_feedback, weakest_skill, drills, output_info = process_video(
+        video_path, output="landmarks"
+    )
+    if output_info.get("movement") is None:
+        raise ValueError(f"No player could be tracked in {video_path}")
+    return np.asarray(output_info["movement"], dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index reference drill clips and query the movement index.")
+    parser.add_argument("--index", default=DEFAULT_INDEX_DIR, help="Movement index directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add-drill", help="Index reference clips of a drill from the rules catalog")
+    add.add_argument("videos", nargs="+")
+    add.add_argument("--drill", required=True, help="Drill name, as in feedback_rules.json")
+    query = commands.add_parser("query", help="List the indexed clips that move most like a clip")
+    query.add_argument("video")
+    query.add_argument("-k", type=int, default=5)
+    query.add_argument("--kind", choices=KINDS)
+    commands.add_parser("stats", help="Count the indexed clips")
+    args = parser.parse_args()
+    if args.command == "query" and args.k < 1:
+        parser.error("-k must be at least 1")
+
+    index = MovementIndex(args.index)
+    if args.command == "add-drill":
+        from rules_engine import get_rules_engine
+        engine = get_rules_engine()
+        skills = [skill for i, skill in enumerate(engine.skills) if args.drill in engine.drills[i]]
+        if not skills:
+            parser.error(f"{args.drill!r} is not a drill in the rules catalog")
+        records = [{"vector": clip_features(path), "kind": DRILL, "label": args.drill, "skill": skills[0]}
+                   for path in args.videos]
+        rows = index.add(records)
+        print(f"Indexed {len(rows)} reference clips of {args.drill!r} ({skills[0]})")
+    elif args.command == "query":
+        vector = clip_features(args.video)
+        start = time.perf_counter()
+        matches = index.search(vector, k=args.k, kind=args.kind)
+        print(f"{len(matches)} matches in {(time.perf_counter() - start) * 1000:.1f} ms")
+        for match in matches:
+            what = match["label"] if match["kind"] == DRILL else f"{match['player']} ({(match['content_hash'] or '')[:8]})"
+            print(f"  {match['score']:.3f}  {match['kind']:<8} {what}")
+    else:
+        print(f"{index.count(SESSION)} sessions, {index.count(DRILL)} drill reference clips")
+
+
+if __name__ == "__main__":
+    main()
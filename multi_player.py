@@ -0,0 +1,240 @@
+import cv2
+import numpy as np
+
+from pipeline_metrics import get_metrics
+from pose_pool import TEAM_MAX_PER_CONFIG, get_team_pose_pool
+from pose_sampling import infer_landmarks, roi_from_landmarks
+from pose_tracking import box_contains
+from video_pipeline import NUM_LANDMARKS, LandmarkBuffer
+
+# Frames between runs of the person detector; in between, each player is followed by its own pose tracking
+DETECT_INTERVAL = 10
+
+# Width frames are shrunk to for person detection (HOG cost grows with the pixel count)
+DETECT_WIDTH = 640
+
+# HOG detection settings and the score a detection needs to start a new player
+HOG_WIN_STRIDE = (8, 8)
+HOG_SCALE = 1.05
+MIN_DETECTION_SCORE = 0.5
+
+# Box overlap (IoU) needed to match a detection to a tracked player
+MATCH_IOU = 0.3
+
+# Two players whose pose boxes overlap this much have locked onto the same person
+DUPLICATE_IOU = 0.6
+
+# Frames a player may go without a pose before the track is closed
+MAX_MISSES = 15
+
+# Players followed at once (each holds a pose estimator)
+MAX_PLAYERS = TEAM_MAX_PER_CONFIG
+
+# Seconds a clip holding no estimator waits for one from the shared team pool. A clip
+# that already holds some never waits: with two clips each holding part of the pool
+# and waiting for more, neither could ever finish. A player it can not get an
+# estimator for is picked up again at a later detection, once one is free.
+TEAM_ACQUIRE_TIMEOUT = 60
+
+# Tracks with a pose in fewer seconds than this are dropped as false starts
+MIN_TRACK_SECONDS = 1.0
+
+# Extra space kept around a detection box for the first pose crop, as a fraction of its size
+DETECTION_MARGIN = 0.2
+
+_hog = None
+
+
+# Function to get the OpenCV HOG person detector, created on first use
+def get_person_detector():
+    global _hog
+    if _hog is None:
+        _hog = cv2.HOGDescriptor()
+        _hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+    return _hog
+
+
+# Function to find people in a BGR frame. Returns pixel boxes (x0, y0, x1, y1) in full-frame coordinates.
+def detect_people(frame):
+    height, width = frame.shape[:2]
+    ratio = min(1.0, DETECT_WIDTH / width)
+    small = cv2.resize(frame, None, fx=ratio, fy=ratio, interpolation=cv2.INTER_AREA) if ratio < 1.0 else frame
+    rects, scores = get_person_detector().detectMultiScale(small, winStride=HOG_WIN_STRIDE, scale=HOG_SCALE)
+    if not len(rects):
+        return []
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    keep = cv2.dnn.NMSBoxes([list(map(int, r)) for r in rects], scores.tolist(), MIN_DETECTION_SCORE, 0.4)
+    boxes = []
+    for i in np.asarray(keep).reshape(-1):
+        x, y, w, h = rects[i] / ratio
+        boxes.append((int(x), int(y), int(x + w), int(y + h)))
+    return boxes
+
+
+# Function to compute the IoU of every box in a against every box in b, as a (len(a), len(b)) matrix
+def box_iou(a, b):
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    x0 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y0 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x1 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y1 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+# Function to greedily pair boxes by highest IoU. Returns (pairs, unmatched b indices).
+def match_boxes(a, b, threshold=MATCH_IOU):
+    if not len(a) or not len(b):
+        return [], list(range(len(b)))
+    iou = box_iou(a, b)
+    pairs = []
+    while True:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[i, j] < threshold:
+            break
+        pairs.append((int(i), int(j)))
+        iou[i, :] = -1
+        iou[:, j] = -1
+    matched = {j for _, j in pairs}
+    return pairs, [j for j in range(len(b)) if j not in matched]
+
+
+# Function to grow a detection box by DETECTION_MARGIN, clipped to the frame
+def expand_box(box, width, height, margin=DETECTION_MARGIN):
+    x0, y0, x1, y1 = box
+    pad_x = (x1 - x0) * margin
+    pad_y = (y1 - y0) * margin
+    return (int(max(0, x0 - pad_x)), int(max(0, y0 - pad_y)),
+            int(min(width, x1 + pad_x)), int(min(height, y1 + pad_y)))
+
+
+# One tracked player: its own video-mode pose estimator running on a crop that
+# follows the player, and the landmark rows from the frame it was first seen
+class PlayerTrack:
+    def __init__(self, track_id, start, box, pose):
+        self.id = track_id
+        self.start = start
+        self.box = box
+        self.first_x = box[0]
+        self.pose = pose
+        self.landmarks = LandmarkBuffer()
+        self.last = None
+        self.misses = 0
+        self.seen = 0
+
+    # Function to pose the player in this frame and move the crop if they near its edge
+    def update(self, frame, scale, timer):
+        height, width = frame.shape[:2]
+        landmarks = infer_landmarks(frame, self.pose, scale, self.box, timer)
+        self.landmarks.append(landmarks)
+        if np.isnan(landmarks[0, 0]):
+            self.misses += 1
+            return
+        self.misses = 0
+        self.seen += 1
+        self.last = landmarks
+        if not box_contains(self.box, landmarks, width, height):
+            self.box = roi_from_landmarks(landmarks, width, height) or self.box
+
+    # Function to get the pixel box around the player's current pose (the crop when there is none)
+    def pose_box(self, width, height):
+        if self.last is None or self.misses:
+            return self.box
+        return roi_from_landmarks(self.last, width, height, margin=0.0) or self.box
+
+
+# Function to detect and follow every player in a video in one decode pass.
+# A HOG person detector runs every DETECT_INTERVAL frames; new detections start a
+# track, matched ones re-seed a track that lost its player. When it finds no one and
+# no one is tracked, a track starts on the whole frame. Between detections each
+# track follows its player with its own pose estimator on a crop around them, taken
+# from the shared team pool without ever waiting while holding one (see TEAM_ACQUIRE_TIMEOUT).
+# scale downsizes the crops passed to the model, as in run_sampled.
+# Returns (landmarks, seen) where landmarks is a (frames, players, 33, 4) array (NaN
+# where a player has no pose) with players ordered by first appearance (left to right
+# among those appearing together), and seen is
+# the number of frames each player was posed in.
+def run_multi_player(cap, pose_options=None, scale=1.0, on_frames=None):
+    pose_options = pose_options or {}
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    pool = get_team_pose_pool()
+    metrics = get_metrics()
+    timer = metrics.timer()
+    active = []
+    finished = []
+    next_id = 0
+    index = 0
+
+    def close(track):
+        pool.release(track.pose, **pose_options)
+        track.pose = None
+        finished.append(track)
+
+    try:
+        while cap.isOpened():
+            timer.start()
+            ret, frame = cap.read()
+            if not ret:
+                break
+            timer.lap("decode")
+            height, width = frame.shape[:2]
+
+            if index % DETECT_INTERVAL == 0:
+                detections = detect_people(frame)
+                timer.lap("detect")
+                metrics.inc("person_detections", len(detections))
+                if not detections and not active:
+                    # HOG misses people too close to the camera: let the pose model search the whole frame
+                    detections = [(0, 0, width, height)]
+                pairs, new = match_boxes([track.pose_box(width, height) for track in active], detections)
+                for i, j in pairs:
+                    if active[i].misses:
+                        # The track lost its player: look again where the detector found them
+                        active[i].box = expand_box(detections[j], width, height)
+                for j in new:
+                    if len(active) >= MAX_PLAYERS:
+                        break
+                    try:
+                        pose = pool.acquire(timeout=TEAM_ACQUIRE_TIMEOUT if not active else 0, **pose_options)
+                    except TimeoutError:
+                        metrics.inc("players_deferred")
+                        break
+                    active.append(PlayerTrack(next_id, index, expand_box(detections[j], width, height), pose))
+                    next_id += 1
+                    metrics.inc("players_tracked")
+
+            for track in active:
+                track.update(frame, scale, timer)
+
+            # Close tracks that lost their player, or that locked onto someone another track follows
+            boxes = [track.pose_box(width, height) for track in active]
+            overlap = box_iou(boxes, boxes) if len(boxes) > 1 else np.zeros((len(boxes), len(boxes)))
+            keep = []
+            for i, track in enumerate(active):
+                duplicate = any(
+                    overlap[i, j] > DUPLICATE_IOU and not track.misses and not active[j].misses and active[j].seen > track.seen
+                    for j in range(len(active)) if j != i
+                )
+                if track.misses > MAX_MISSES or duplicate:
+                    close(track)
+                else:
+                    keep.append(track)
+            active = keep
+
+            index += 1
+            if on_frames is not None:
+                on_frames(1)
+    finally:
+        for track in active:
+            close(track)
+
+    tracks = [track for track in finished if track.seen >= MIN_TRACK_SECONDS * fps]
+    tracks.sort(key=lambda track: (track.start, track.first_x))
+    landmarks = np.full((index, len(tracks), NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+    for p, track in enumerate(tracks):
+        rows = track.landmarks.array()
+        landmarks[track.start:track.start + len(rows), p] = rows
+    return landmarks, [track.seen for track in tracks]
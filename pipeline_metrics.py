@@ -0,0 +1,281 @@
+import bisect
+import cProfile
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stages of the video loops, in pipeline order
+STAGES = ["decode", "detect", "convert", "pose", "draw", "overlay", "encode"]
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Latest samples kept per stage for the p50/p99 shown in the UI
+RECENT_SAMPLES = 2048
+
+# Seconds between memory samples (and Prometheus text file writes) while metrics are enabled
+MEMORY_SAMPLE_INTERVAL = 1.0
+
+# Where cProfile traces are written
+DEFAULT_TRACE_DIR = os.path.join(tempfile.gettempdir(), "ai_soccer_traces")
+
+# Prefix of every exported metric name
+METRIC_PREFIX = "ai_soccer"
+
+
+# Function to read this process's current resident set size in bytes (None where unsupported)
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Without /proc only the peak is available; Linux reports kilobytes, macOS bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Stand-in timer used while metrics are disabled, so the video loops only pay for an empty call
+class _NullTimer:
+    def start(self):
+        pass
+
+    def lap(self, stage):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+# Times consecutive stages of one loop: lap(stage) records the time since the
+# previous lap (or start()) against that stage. One timer per loop and thread.
+class StageTimer:
+    def __init__(self, metrics):
+        self._metrics = metrics
+        self._clock = time.perf_counter
+        self._last = self._clock()
+
+    def start(self):
+        self._last = self._clock()
+
+    def lap(self, stage):
+        now = self._clock()
+        self._metrics.observe(stage, now - self._last)
+        self._last = now
+
+
+# Process-wide counters, per-stage latency histograms and memory gauges for the
+# video pipeline. Disabled by default; timer() then hands out NULL_TIMER and
+# inc() returns straight away.
+class PipelineMetrics:
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._stop = threading.Event()
+        self.textfile = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._buckets = {}   # stage -> counts per bucket (+Inf last)
+            self._sums = {}      # stage -> total seconds
+            self._recent = {}    # stage -> deque of the latest samples
+            self._gauges = {}
+
+    # Function to switch collection on or off. While on, a background thread samples
+    # memory and, when textfile is set, rewrites the Prometheus text file.
+    # textfile=None keeps the file configured earlier.
+    def enable(self, enabled=True, sample_memory=True, textfile=None):
+        if textfile is not None:
+            self.textfile = textfile
+        self.enabled = enabled
+        if enabled and sample_memory and self._sampler is None:
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample_loop, name="metrics-sampler", daemon=True)
+            self._sampler.start()
+        elif not enabled and self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+
+    def _sample_loop(self):
+        while not self._stop.is_set():
+            self.sample_memory()
+            if self.textfile:
+                try:
+                    self.write_prometheus(self.textfile)
+                except OSError:
+                    pass
+            self._stop.wait(MEMORY_SAMPLE_INTERVAL)
+
+    def sample_memory(self):
+        rss = current_rss_bytes()
+        if rss is None:
+            return
+        with self._lock:
+            self._gauges["rss_bytes"] = rss
+            self._gauges["rss_peak_bytes"] = max(rss, self._gauges.get("rss_peak_bytes", 0))
+
+    # Function to get a timer for one loop: a real StageTimer when enabled, else NULL_TIMER
+    def timer(self):
+        return StageTimer(self) if self.enabled else NULL_TIMER
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            buckets = self._buckets.get(stage)
+            if buckets is None:
+                buckets = self._buckets[stage] = [0] * (len(LATENCY_BUCKETS) + 1)
+                self._sums[stage] = 0.0
+                self._recent[stage] = deque(maxlen=RECENT_SAMPLES)
+            buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self._sums[stage] += seconds
+            self._recent[stage].append(seconds)
+
+    def inc(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    # Function to hand over everything collected so far and start afresh.
+    # Worker processes send this back with each chunk; the parent merges it.
+    def drain(self):
+        with self._lock:
+            data = {
+                "counters": self._counters,
+                "buckets": self._buckets,
+                "sums": self._sums,
+                "recent": {stage: list(samples) for stage, samples in self._recent.items()},
+            }
+        self.reset()
+        return data
+
+    def merge(self, data):
+        with self._lock:
+            for name, value in data["counters"].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+            for stage, counts in data["buckets"].items():
+                if stage not in self._buckets:
+                    self._buckets[stage] = [0] * (len(LATENCY_BUCKETS) + 1)
+                    self._sums[stage] = 0.0
+                    self._recent[stage] = deque(maxlen=RECENT_SAMPLES)
+                self._buckets[stage] = [a + b for a, b in zip(self._buckets[stage], counts)]
+                self._sums[stage] += data["sums"][stage]
+                self._recent[stage].extend(data["recent"][stage])
+
+    # Function to summarize each stage as a dict of count, total seconds, mean and
+    # p50/p99 latency in ms (percentiles over the latest RECENT_SAMPLES frames)
+    def summary(self):
+        with self._lock:
+            stages = [stage for stage in STAGES if stage in self._buckets]
+            stages += sorted(set(self._buckets) - set(STAGES))
+            rows = []
+            for stage in stages:
+                count = sum(self._buckets[stage])
+                recent = sorted(self._recent[stage])
+                rows.append({
+                    "stage": stage,
+                    "count": count,
+                    "seconds": self._sums[stage],
+                    "mean_ms": self._sums[stage] / count * 1000 if count else None,
+                    "p50_ms": recent[len(recent) // 2] * 1000 if recent else None,
+                    "p99_ms": recent[min(len(recent) - 1, int(len(recent) * 0.99))] * 1000 if recent else None,
+                })
+            return rows
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def gauges(self):
+        with self._lock:
+            return dict(self._gauges)
+
+    # Function to render all metrics in the Prometheus text exposition format
+    def render_prometheus(self):
+        with self._lock:
+            lines = [
+                f"# HELP {METRIC_PREFIX}_stage_seconds Time spent per frame in each video pipeline stage.",
+                f"# TYPE {METRIC_PREFIX}_stage_seconds histogram",
+            ]
+            for stage, counts in self._buckets.items():
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), counts):
+                    cumulative += count
+                    lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {self._sums[stage]}')
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {cumulative}')
+            for name, value in sorted(self._counters.items()):
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+                lines.append(f"{METRIC_PREFIX}_{name}_total {value}")
+            for name, value in sorted(self._gauges.items()):
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+                lines.append(f"{METRIC_PREFIX}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    # Function to write the Prometheus text atomically (e.g. for node_exporter's textfile collector)
+    def write_prometheus(self, path):
+        partial = f"{path}.{os.getpid()}.tmp"
+        with open(partial, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(partial, path)
+
+
+_metrics = PipelineMetrics()
+
+
+# Function to get the process-wide pipeline metrics
+def get_metrics():
+    return _metrics
+
+
+# Function to serve the metrics at http://host:port/metrics from a daemon thread.
+# Returns the server; call shutdown() on it to stop.
+def serve_prometheus(port, host="127.0.0.1", metrics=None):
+    metrics = metrics or _metrics
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+# Function to profile the calling thread with cProfile and dump the stats to path
+# (open with `python -m pstats` or snakeviz). For sampling without any overhead,
+# py-spy can attach to a running server instead (`py-spy record --pid <pid>`);
+# analyses run on threads named analysis-job_N.
+@contextmanager
+def profile_trace(path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,191 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from skill_metrics import SKILLS
+
+# Where player history lives unless a path is passed explicitly
+DEFAULT_STORE_PATH = "soccer_player_history.db"
+
+# Where each set of ratings came from
+SELF = "self"
+AI = "ai"
+
+# Rows read per step when exporting, so large tables never sit in memory whole
+EXPORT_CHUNK_ROWS = 100_000
+
+# One column per skill, e.g. "Dribbling" -> "dribbling"
+SKILL_COLUMNS = {skill: skill.lower() for skill in SKILLS}
+
+
+# Function to normalize a player name for lookups, so "Sam " and "sam" are the same player
+def player_key(player):
+    return " ".join(player.split()).casefold()
+
+
+# Append-only history of self-assessments and AI ratings, one row per rating set
+# with a column per skill. SQLite in WAL mode lets many sessions and batch jobs
+# append at once while others read; lookups by player and date go through indexes.
+class PlayerStore:
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            skill_columns = ", ".join(f"{column} INTEGER NOT NULL" for column in SKILL_COLUMNS.values())
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS ratings ("
+                " id INTEGER PRIMARY KEY, player TEXT NOT NULL, player_key TEXT NOT NULL,"
+                " recorded_at REAL NOT NULL, source TEXT NOT NULL, content_hash TEXT,"
+                f" {skill_columns})"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS ratings_by_player ON ratings (player_key, recorded_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS ratings_by_date ON ratings (recorded_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS ratings_by_clip ON ratings (content_hash)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    # Function to append rating sets in one transaction. Each record is a dict with
+    # player, source, ratings ({skill: 1-10}) and optionally recorded_at (unix
+    # seconds, default now) and content_hash (the analyzed clip).
+    def append(self, records):
+        now = time.time()
+        rows = [
+            (
+                record["player"], player_key(record["player"]), record.get("recorded_at", now), record["source"],
+                record.get("content_hash"), *(int(record["ratings"][skill]) for skill in SKILL_COLUMNS),
+            )
+            for record in records
+        ]
+        if not rows:
+            return 0
+        columns = "player, player_key, recorded_at, source, content_hash, " + ", ".join(SKILL_COLUMNS.values())
+        with self._connect() as db:
+            db.executemany(
+                f"INSERT INTO ratings ({columns}) VALUES ({', '.join('?' * (5 + len(SKILL_COLUMNS)))})", rows
+            )
+        return len(rows)
+
+    # Function to record one rating set
+    def record(self, player, source, ratings, content_hash=None, recorded_at=None):
+        record = {"player": player, "source": source, "ratings": ratings, "content_hash": content_hash}
+        if recorded_at is not None:
+            record["recorded_at"] = recorded_at
+        return self.append([record])
+
+    # Function to check whether a player already has ratings from this source for a clip
+    def has_ratings(self, player, content_hash, source=AI):
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT 1 FROM ratings WHERE content_hash = ? AND player_key = ? AND source = ? LIMIT 1",
+                (content_hash, player_key(player), source),
+            ).fetchone()
+        return row is not None
+
+    # Function to count a player's saved rating sets without loading them
+    def count(self, player):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM ratings WHERE player_key = ?", (player_key(player),)).fetchone()[0]
+
+    def _query(self, player=None, since=None, until=None, source=None):
+        # pandas is imported where it is used: recording ratings does not need it
+        import pandas as pd
+        clauses, params = [], []
+        if player is not None:
+            clauses.append("player_key = ?")
+            params.append(player_key(player))
+        if since is not None:
+            clauses.append("recorded_at >= ?")
+            params.append(pd.Timestamp(since).timestamp())
+        if until is not None:
+            clauses.append("recorded_at < ?")
+            params.append(pd.Timestamp(until).timestamp())
+        if source is not None:
+            clauses.append("source = ?")
+            params.append(source)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        columns = ", ".join(f"{column} AS {skill}" for skill, column in SKILL_COLUMNS.items())
+        return f"SELECT player, recorded_at, source, content_hash, {columns} FROM ratings{where} ORDER BY recorded_at", params
+
+    # Function to read rating history as a DataFrame, optionally for one player,
+    # a date range (anything pd.Timestamp accepts) and/or one source.
+    # recorded_at comes back as a datetime column.
+    def history(self, player=None, since=None, until=None, source=None):
+        import pandas as pd
+        sql, params = self._query(player, since, until, source)
+        with self._connect() as db:
+            df = pd.read_sql_query(sql, db, params=params)
+        df["recorded_at"] = pd.to_datetime(df["recorded_at"], unit="s")
+        return df
+
+    # Function to list the players with recorded ratings
+    def players(self):
+        with self._connect() as db:
+            rows = db.execute("SELECT player FROM ratings GROUP BY player_key ORDER BY player_key").fetchall()
+        return [row[0] for row in rows]
+
+    # Function to export history to a Parquet file (needs pyarrow), in chunks so the
+    # whole table is never loaded at once. Takes the same filters as history().
+    def export_parquet(self, path, player=None, since=None, until=None, source=None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow") from None
+        import pandas as pd
+        sql, params = self._query(player, since, until, source)
+        # Fixed up front: a chunk whose content_hash is all None would otherwise be
+        # typed null and clash with later chunks
+        schema = pa.schema(
+            [("player", pa.string()), ("recorded_at", pa.timestamp("ns")), ("source", pa.string()),
+             ("content_hash", pa.string())]
+            + [(skill, pa.int64()) for skill in SKILL_COLUMNS]
+        )
+        rows = 0
+        with pq.ParquetWriter(path, schema) as writer, self._connect() as db:
+            for chunk in pd.read_sql_query(sql, db, params=params, chunksize=EXPORT_CHUNK_ROWS):
+                chunk["recorded_at"] = pd.to_datetime(chunk["recorded_at"], unit="s")
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                rows += len(chunk)
+        return rows
+
+
+# Function to average each skill per source over time periods (pandas period alias,
+# e.g. "D", "W", "M"). Returns one row per (source, period) and a column per skill.
+def skill_trends(history, freq="W"):
+    import pandas as pd
+    if history.empty:
+        return pd.DataFrame(columns=["source", "period", *SKILLS])
+    periods = history["recorded_at"].dt.to_period(freq).dt.start_time.rename("period")
+    trends = history.groupby(["source", periods])[SKILLS].mean()
+    return trends.reset_index()
+
+
+# Function to compare each player's self-assessment with the AI, per skill: the mean
+# self rating minus the mean AI rating (positive means the player rates themself higher)
+def self_vs_ai(history):
+    import pandas as pd
+    means = history.groupby(["player", "source"])[SKILLS].mean().unstack("source")
+    if SELF not in means.columns.get_level_values("source") or AI not in means.columns.get_level_values("source"):
+        return pd.DataFrame(columns=SKILLS)
+    return means.xs(SELF, axis=1, level="source") - means.xs(AI, axis=1, level="source")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+# Function to get the process-wide player store, creating it on first use
+def get_player_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PlayerStore()
+        return _store
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Where cached analyses live unless a directory is passed explicitly
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "ai_soccer_cache")
+
+# Total bytes of cached landmarks and rendered videos kept on disk
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Read size used when hashing uploads
+HASH_CHUNK_SIZE = 1024 * 1024
+
+LANDMARKS_FILE = "landmarks.npz"
+# Rendered outputs keep their own extension (.mp4 video, .webm overlay track)
+VIDEO_FILE = "processed_video"
+META_FILE = "meta.json"
+
+# Staging directories older than this were left by a crashed put() and are removed on startup
+STAGING_MAX_AGE = 3600
+
+
+# Function to hash a video file's bytes without loading it into memory
+def hash_video(video_path):
+    digest = hashlib.sha256()
+    with open(video_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Function to build a cache key from a video's content hash and the analysis settings
+def cache_key(content_hash, settings):
+    payload = json.dumps({"video": content_hash, "settings": settings}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Disk-backed cache of pose landmarks and rendered videos, keyed by content hash
+# plus settings. An SQLite index tracks entry sizes and last access so the
+# least recently used entries are evicted once the size limit is exceeded.
+# Safe to share between threads and between processes on the same disk.
+class PoseCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS entries_by_access ON entries (last_access)")
+        self.cleanup_staging()
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(os.path.join(self.cache_dir, "index.db"), timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    # Function to remove staging directories a crashed process left half-written
+    def cleanup_staging(self, max_age=STAGING_MAX_AGE):
+        now = time.time()
+        for entry in os.scandir(self.cache_dir):
+            try:
+                if entry.name.startswith(".") and entry.is_dir() and now - entry.stat().st_mtime > max_age:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except OSError:
+                pass
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    # Function to look up a cached analysis; returns None on a miss
+    def get(self, key):
+        entry_dir = self._entry_dir(key)
+        meta_path = os.path.join(entry_dir, META_FILE)
+        with self._connect() as db:
+            row = db.execute("SELECT key FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or not os.path.exists(meta_path):
+                return None
+            db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            # Evicted by another process since the lookup
+            return None
+        video_path = os.path.join(entry_dir, meta.pop("video_file", VIDEO_FILE + ".mp4"))
+        landmarks_path = os.path.join(entry_dir, LANDMARKS_FILE)
+        meta["video_path"] = video_path if os.path.exists(video_path) else None
+        meta["landmarks_path"] = landmarks_path if os.path.exists(landmarks_path) else None
+        return meta
+
+    # Function to load the (frames, 33, 4) landmark array of a cached entry
+    def load_landmarks(self, key):
+        import numpy as np
+        with np.load(os.path.join(self._entry_dir(key), LANDMARKS_FILE)) as data:
+            return data["landmarks"]
+
+    # Function to store an analysis. The rendered video, if any, is moved into the cache.
+    # Either part may be None, e.g. a render stored apart from the landmarks it was drawn from.
+    # Returns the cached entry as get() would.
+    def put(self, key, landmarks, meta, video_path=None):
+        import numpy as np
+        entry_dir = self._entry_dir(key)
+        staging = tempfile.mkdtemp(prefix=f".{key[:12]}-", dir=self.cache_dir)
+        try:
+            if landmarks is not None:
+                np.savez_compressed(os.path.join(staging, LANDMARKS_FILE), landmarks=landmarks)
+            if video_path is not None:
+                meta = dict(meta, video_file=VIDEO_FILE + os.path.splitext(video_path)[1])
+                shutil.move(video_path, os.path.join(staging, meta["video_file"]))
+            with open(os.path.join(staging, META_FILE), "w") as f:
+                json.dump(meta, f)
+            size = sum(os.path.getsize(os.path.join(staging, name)) for name in os.listdir(staging))
+            # SQLite's write lock serializes the swap with every thread and process sharing
+            # the cache, so two puts of one key never interleave the removal and the rename
+            with self._lock, self._connect() as db:
+                db.execute("BEGIN IMMEDIATE")
+                existing = db.execute("SELECT key FROM entries WHERE key = ?", (key,)).fetchone()
+                if existing is not None and os.path.isdir(entry_dir) and \
+                        set(os.listdir(entry_dir)) >= set(os.listdir(staging)):
+                    # Another worker stored the same analysis first: keep its files rather
+                    # than pulling them from under anyone reading them
+                    shutil.rmtree(staging, ignore_errors=True)
+                    db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+                else:
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                    os.replace(staging, entry_dir)
+                    db.execute(
+                        "INSERT OR REPLACE INTO entries (key, size, last_access) VALUES (?, ?, ?)",
+                        (key, size, time.time()),
+                    )
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        self.evict(keep=key)
+        return self.get(key)
+
+    # Function to drop least recently used entries until the cache fits in max_bytes
+    def evict(self, keep=None):
+        removed = []
+        with self._lock, self._connect() as db:
+            # Entries are deleted under the same write lock as put(), so a new entry is never removed
+            db.execute("BEGIN IMMEDIATE")
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return removed
+            for key, size in db.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+                total -= size
+                removed.append(key)
+        return removed
+
+    def total_bytes(self):
+        with self._connect() as db:
+            return db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# Function to get the process-wide pose cache, creating it on first use
+def get_pose_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PoseCache()
+        return _cache
@@ -0,0 +1,245 @@
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Seconds an unused pose estimator stays warm before it is closed
+DEFAULT_IDLE_TIMEOUT = 300
+
+# Upper bound on live estimators per configuration (idle + in use)
+DEFAULT_MAX_PER_CONFIG = 4
+
+# Upper bound per configuration for multi-player analysis: one estimator per tracked player
+TEAM_MAX_PER_CONFIG = 10
+
+# Upper bound per configuration for live sessions, each of which holds an estimator while it runs
+LIVE_MAX_PER_CONFIG = 4
+
+# Size of the blank frame pushed through a new estimator by warm_up()
+WARM_UP_FRAME_SIZE = 64
+
+# Options accepted by mp.solutions.pose.Pose, with MediaPipe's own defaults
+POSE_DEFAULTS = {
+    "static_image_mode": False,
+    "model_complexity": 1,
+    "smooth_landmarks": True,
+    "enable_segmentation": False,
+    "smooth_segmentation": True,
+    "min_detection_confidence": 0.5,
+    "min_tracking_confidence": 0.5,
+}
+
+
+# Function to turn Pose keyword arguments into a hashable pool key
+def pose_config(**options):
+    unknown = set(options) - set(POSE_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown Pose options: {', '.join(sorted(unknown))}")
+    config = dict(POSE_DEFAULTS, **options)
+    return tuple(sorted(config.items()))
+
+
+# Thread-safe pool of warm MediaPipe Pose estimators, keyed by configuration.
+# Each estimator is handed to one caller at a time because Pose.process is not
+# safe to call concurrently on the same graph.
+class PosePool:
+    def __init__(self, max_per_config=DEFAULT_MAX_PER_CONFIG, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.max_per_config = max_per_config
+        self.idle_timeout = idle_timeout
+        self._cond = threading.Condition()
+        self._idle = {}      # config -> list of (pose, last_released)
+        self._live = {}      # config -> number of open estimators
+        self._closed = False
+        self._reaper = None
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def acquire(self, timeout=None, **options):
+        config = pose_config(**options)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("PosePool is closed")
+                idle = self._idle.get(config)
+                if idle:
+                    pose, _ = idle.pop()
+                    self.reused += 1
+                    return pose
+                if self._live.get(config, 0) < self.max_per_config:
+                    # Reserve the slot before building so other threads see it
+                    self._live[config] = self._live.get(config, 0) + 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("Timed out waiting for a pose estimator")
+                self._cond.wait(remaining)
+
+        # Graph construction is slow, so do it outside the lock. MediaPipe itself is
+        # imported here, on first use, as loading it takes longer than the rest of the app.
+        try:
+            import mediapipe as mp
+            pose = mp.solutions.pose.Pose(**dict(config))
+        except Exception:
+            with self._cond:
+                self._live[config] -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.created += 1
+        self._start_reaper()
+        return pose
+
+    def release(self, pose, **options):
+        config = pose_config(**options)
+        # Drop tracking state so the next video does not start from this one's pose
+        try:
+            pose.reset()
+        except Exception:
+            self._discard(pose, config)
+            return
+        with self._cond:
+            if self._closed:
+                self._live[config] -= 1
+                pose.close()
+                return
+            self._idle.setdefault(config, []).append((pose, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def pose(self, timeout=None, **options):
+        estimator = self.acquire(timeout, **options)
+        try:
+            yield estimator
+        except BaseException:
+            # The graph may be mid-frame after an error, so do not hand it out again
+            self._discard(estimator, pose_config(**options))
+            raise
+        else:
+            self.release(estimator, **options)
+
+    # Function to have a ready estimator idle in the pool for these options, so the next
+    # acquire() skips importing MediaPipe, building the graph and loading the model.
+    # A blank frame is run through a new estimator since the first frame also pays setup costs.
+    def warm_up(self, **options):
+        import numpy as np
+        with self._cond:
+            if self._idle.get(pose_config(**options)):
+                return False
+        with self.pose(**options) as pose:
+            pose.process(np.zeros((WARM_UP_FRAME_SIZE, WARM_UP_FRAME_SIZE, 3), dtype=np.uint8))
+        return True
+
+    def _discard(self, pose, config):
+        with self._cond:
+            self._live[config] -= 1
+            self._cond.notify()
+        pose.close()
+
+    # Function to close estimators that have been idle longer than idle_timeout
+    def evict_idle(self, now=None):
+        now = time.monotonic() if now is None else now
+        stale = []
+        with self._cond:
+            for config, idle in self._idle.items():
+                keep = []
+                for pose, released in idle:
+                    if now - released >= self.idle_timeout:
+                        stale.append(pose)
+                        self._live[config] -= 1
+                    else:
+                        keep.append((pose, released))
+                idle[:] = keep
+            self.evicted += len(stale)
+            if stale:
+                self._cond.notify_all()
+        for pose in stale:
+            pose.close()
+        return len(stale)
+
+    def _start_reaper(self):
+        with self._cond:
+            if self._reaper is not None or self.idle_timeout is None:
+                return
+            self._reaper = threading.Thread(target=self._reap, name="pose-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        interval = max(1.0, self.idle_timeout / 2)
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed, timeout=interval)
+                if self._closed:
+                    return
+            self.evict_idle()
+
+    def stats(self):
+        with self._cond:
+            idle = sum(len(v) for v in self._idle.values())
+            live = sum(self._live.values())
+            return {
+                "live": live,
+                "idle": idle,
+                "in_use": live - idle,
+                "created": self.created,
+                "reused": self.reused,
+                "evicted": self.evicted,
+            }
+
+    # Function to close every idle estimator; ones still in use close on release
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            idle = [pose for poses in self._idle.values() for pose, _ in poses]
+            for config, poses in self._idle.items():
+                self._live[config] -= len(poses)
+            self._idle.clear()
+            self._cond.notify_all()
+        for pose in idle:
+            pose.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Function to get the process-wide pose pool, creating it on first use
+def get_pose_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PosePool()
+            atexit.register(_pool.close)
+        return _pool
+
+
+_team_pool = None
+
+
+# Function to get the pose pool used by multi-player analysis, which holds one
+# estimator per tracked player for the length of a video
+def get_team_pose_pool():
+    global _team_pool
+    with _pool_lock:
+        if _team_pool is None:
+            _team_pool = PosePool(max_per_config=TEAM_MAX_PER_CONFIG)
+            atexit.register(_team_pool.close)
+        return _team_pool
+
+
+_live_pool = None
+
+
+# Function to get the pose pool used by live analysis, kept apart from the one video
+# analyses use since a live session holds its estimator until it is stopped
+def get_live_pose_pool():
+    global _live_pool
+    with _pool_lock:
+        if _live_pool is None:
+            _live_pool = PosePool(max_per_config=LIVE_MAX_PER_CONFIG)
+            atexit.register(_live_pool.close)
+        return _live_pool
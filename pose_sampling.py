@@ -0,0 +1,115 @@
+import cv2
+import numpy as np
+
+from pipeline_metrics import NULL_TIMER, get_metrics
+from video_pipeline import LandmarkBuffer, expected_frame_count, landmarks_to_array
+
+# Extra space kept around the player's bounding box when cropping, as a fraction of its size
+DEFAULT_ROI_MARGIN = 0.35
+
+# Smallest crop side in pixels; tiny crops make the pose detector lose the player
+MIN_ROI_SIZE = 96
+
+
+# Function to build a pixel crop box around the visible landmarks of a (33, 4) array
+def roi_from_landmarks(landmarks, width, height, margin=DEFAULT_ROI_MARGIN):
+    valid = ~np.isnan(landmarks[:, 0])
+    if not valid.any():
+        return None
+    xs = landmarks[valid, 0] * width
+    ys = landmarks[valid, 1] * height
+    box_w = max(xs.max() - xs.min(), 1.0)
+    box_h = max(ys.max() - ys.min(), 1.0)
+    pad_x = max(box_w * margin, (MIN_ROI_SIZE - box_w) / 2)
+    pad_y = max(box_h * margin, (MIN_ROI_SIZE - box_h) / 2)
+    x0 = int(max(0, xs.min() - pad_x))
+    y0 = int(max(0, ys.min() - pad_y))
+    x1 = int(min(width, np.ceil(xs.max() + pad_x)))
+    y1 = int(min(height, np.ceil(ys.max() + pad_y)))
+    if x1 - x0 < 2 or y1 - y0 < 2:
+        return None
+    return x0, y0, x1, y1
+
+
+# Function to run pose inference on an optionally cropped and downscaled frame.
+# Landmarks are mapped back to full-frame normalized coordinates.
+def infer_landmarks(frame, pose, scale=1.0, roi_box=None, timer=NULL_TIMER):
+    height, width = frame.shape[:2]
+    x0, y0, x1, y1 = roi_box or (0, 0, width, height)
+    image = frame[y0:y1, x0:x1]
+    if scale < 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    timer.lap("convert")
+    landmarks = landmarks_to_array(pose.process(image_rgb))
+    timer.lap("pose")
+    if roi_box is not None:
+        crop_w, crop_h = x1 - x0, y1 - y0
+        landmarks[:, 0] = (landmarks[:, 0] * crop_w + x0) / width
+        landmarks[:, 1] = (landmarks[:, 1] * crop_h + y0) / height
+        landmarks[:, 2] *= crop_w / width
+    return landmarks
+
+
+# Function to linearly interpolate the landmarks for the frames between two keyframes.
+# If only one keyframe has a pose it is held; if neither does the gap stays NaN.
+def interpolate_landmarks(start, end, count):
+    if count <= 0:
+        return np.empty((0,) + start.shape, dtype=np.float32)
+    start_ok = not np.isnan(start[0, 0])
+    end_ok = not np.isnan(end[0, 0])
+    if start_ok and end_ok:
+        t = (np.arange(1, count + 1, dtype=np.float32) / (count + 1))[:, None, None]
+        return start + (end - start) * t
+    held = start if start_ok else end
+    return np.repeat(held[None], count, axis=0)
+
+
+# Function to analyze a video with frame-stride / downscale / ROI sampling.
+# Inference runs on every `stride`-th frame; skipped frames are only grabbed (not
+# converted) and get landmarks interpolated between the surrounding keyframes.
+# Returns the (frames, 33, 4) landmark array.
+def run_sampled(cap, pose, stride=1, scale=1.0, roi=False, on_frames=None):
+    stride = max(1, int(stride))
+    landmarks = LandmarkBuffer(expected_frame_count(cap))
+    skipped = 0
+    prev_key = None
+    roi_box = None
+    index = 0
+    timer = get_metrics().timer()
+
+    while cap.isOpened():
+        timer.start()
+        if index % stride:
+            if not cap.grab():
+                break
+            timer.lap("decode")
+            skipped += 1
+            index += 1
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        timer.lap("decode")
+        key = infer_landmarks(frame, pose, scale, roi_box, timer)
+        if roi_box is not None and np.isnan(key[0, 0]):
+            # Lost the player inside the crop: search the whole frame again
+            key = infer_landmarks(frame, pose, scale, timer=timer)
+        if roi:
+            roi_box = roi_from_landmarks(key, frame.shape[1], frame.shape[0])
+        if skipped:
+            landmarks.extend(interpolate_landmarks(prev_key, key, skipped))
+        landmarks.append(key)
+        if on_frames is not None:
+            on_frames(skipped + 1)
+        prev_key = key
+        skipped = 0
+        index += 1
+
+    # Frames after the last keyframe have nothing to interpolate towards
+    if skipped:
+        landmarks.extend(np.repeat(prev_key[None], skipped, axis=0))
+        if on_frames is not None:
+            on_frames(skipped)
+
+    return landmarks.array()
@@ -0,0 +1,177 @@
+import cv2
+import numpy as np
+
+from pipeline_metrics import get_metrics
+from pose_sampling import infer_landmarks, roi_from_landmarks
+from video_pipeline import LandmarkBuffer, expected_frame_count
+
+# One Euro filter settings for normalized landmark coordinates: the cutoff (Hz) used
+# when a joint is still, and how fast it rises with speed (per unit/second of motion)
+DEFAULT_MIN_CUTOFF = 1.5
+DEFAULT_BETA = 10.0
+DEFAULT_D_CUTOFF = 1.0
+
+# Mean absolute gray-level change (0-255) of the player's region below which the
+# previous result is reused instead of running inference again
+MOTION_THRESHOLD = 1.5
+
+# Consecutive frames a result may be reused before inference is forced
+MAX_REUSE = 3
+
+# Share of the crop box at each edge the predicted pose may enter before the crop is moved
+ROI_INSET = 0.1
+
+# Side of the grayscale thumbnail used to measure motion
+MOTION_THUMBNAIL = 32
+
+
+# One Euro filter over a whole landmark array at once (Casiez et al., CHI 2012):
+# a low-pass filter whose cutoff rises with speed, so still joints stop jittering
+# while fast ones do not lag. A frame without a pose resets the filter.
+class OneEuroFilter:
+    def __init__(self, min_cutoff=DEFAULT_MIN_CUTOFF, beta=DEFAULT_BETA, d_cutoff=DEFAULT_D_CUTOFF):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._x = None
+        self._dx = None
+        self._t = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    # Function to filter one sample taken at time t (seconds); returns the filtered values
+    def __call__(self, x, t):
+        x = np.asarray(x, dtype=np.float64)
+        if np.isnan(x).any():
+            self.reset()
+            return x
+        if self._x is None:
+            self._x, self._dx, self._t = x, np.zeros_like(x), t
+            return x
+        dt = max(t - self._t, 1e-6)
+        dx = (x - self._x) / dt
+        self._dx = self._dx + self._alpha(self.d_cutoff, dt) * (dx - self._dx)
+        cutoff = self.min_cutoff + self.beta * np.abs(self._dx)
+        self._x = self._x + self._alpha(cutoff, dt) * (x - self._x)
+        self._t = t
+        return self._x
+
+    # Function to extrapolate the filtered values `ahead` seconds forward (None before the first sample)
+    def predict(self, ahead):
+        if self._x is None:
+            return None
+        return self._x + self._dx * ahead
+
+
+# Function to smooth the x, y, z columns of a (33, 4) landmark row in place
+def smooth_landmarks(landmarks, smoother, t):
+    landmarks[:, :3] = smoother(landmarks[:, :3], t)
+    return landmarks
+
+
+# Function to check whether the visible landmarks stay clear of the edges of a crop box.
+# The crop only moves when they do not: MediaPipe tracks the pose inside the image it is
+# given, and a crop that shifts every frame throws that tracking off.
+def box_contains(box, landmarks, width, height, inset=ROI_INSET):
+    valid = ~np.isnan(landmarks[:, 0])
+    if not valid.any():
+        return False
+    x0, y0, x1, y1 = box
+    pad_x = (x1 - x0) * inset
+    pad_y = (y1 - y0) * inset
+    xs = landmarks[valid, 0] * width
+    ys = landmarks[valid, 1] * height
+    # Edges that lie on the frame border cannot move any further out
+    return (
+        (x0 == 0 or xs.min() >= x0 + pad_x) and (x1 == width or xs.max() <= x1 - pad_x)
+        and (y0 == 0 or ys.min() >= y0 + pad_y) and (y1 == height or ys.max() <= y1 - pad_y)
+    )
+
+
+# Function to make a small grayscale thumbnail of a frame region for motion checks
+def motion_thumbnail(frame, box=None):
+    if box is not None:
+        x0, y0, x1, y1 = box
+        frame = frame[y0:y1, x0:x1]
+    small = cv2.resize(frame, (MOTION_THUMBNAIL, MOTION_THUMBNAIL), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+
+# Function to analyze a video with tracking state carried across frames:
+# - roi: inference runs on a crop around the player, moved only when the position
+#   predicted from the filtered landmarks and their velocity nears its edge, and
+#   falling back to the full frame when the player is lost;
+# - reuse: when the player's region has barely changed since the last inference,
+#   the previous result is reused (at most MAX_REUSE frames in a row);
+# - smooth: a One Euro filter steadies the landmarks.
+# scale downsizes what is passed to the model, as in run_sampled.
+# Returns the (frames, 33, 4) landmark array.
+def run_tracked(cap, pose, roi=True, reuse=True, smooth=True, scale=1.0, on_frames=None,
+                min_cutoff=DEFAULT_MIN_CUTOFF, beta=DEFAULT_BETA):
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    landmarks = LandmarkBuffer(expected_frame_count(cap))
+    smoother = OneEuroFilter(min_cutoff, beta)
+    metrics = get_metrics()
+    timer = metrics.timer()
+    last = None
+    last_thumbnail = None
+    roi_box = None
+    reused = 0
+    index = 0
+
+    while cap.isOpened():
+        timer.start()
+        ret, frame = cap.read()
+        if not ret:
+            break
+        timer.lap("decode")
+        height, width = frame.shape[:2]
+        t = index / fps
+
+        if roi and last is not None:
+            predicted = smoother.predict(1.0 / fps) if smooth else None
+            guess = last.copy()
+            if predicted is not None:
+                guess[:, :3] = predicted
+            if roi_box is None or not box_contains(roi_box, guess, width, height):
+                roi_box = roi_from_landmarks(guess, width, height)
+                metrics.inc("tracking_roi_moves")
+        else:
+            roi_box = None
+
+        thumbnail = None
+        if reuse and last is not None and not np.isnan(last[0, 0]) and reused < MAX_REUSE:
+            thumbnail = motion_thumbnail(frame, roi_box)
+            if last_thumbnail is not None and np.abs(thumbnail - last_thumbnail).mean() < MOTION_THRESHOLD:
+                reused += 1
+                metrics.inc("tracking_reused_frames")
+                landmarks.append(last)
+                index += 1
+                if on_frames is not None:
+                    on_frames(1)
+                continue
+
+        raw = infer_landmarks(frame, pose, scale, roi_box, timer)
+        if roi_box is not None and np.isnan(raw[0, 0]):
+            # Lost the player inside the predicted crop: search the whole frame again
+            metrics.inc("tracking_full_frame_retries")
+            roi_box = None
+            raw = infer_landmarks(frame, pose, scale, timer=timer)
+        current = smooth_landmarks(raw, smoother, t) if smooth else raw
+        landmarks.append(current)
+        last = current
+        last_thumbnail = thumbnail if thumbnail is not None else (
+            motion_thumbnail(frame, roi_box) if reuse else None
+        )
+        reused = 0
+        index += 1
+        if on_frames is not None:
+            on_frames(1)
+
+    return landmarks.array()
@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+
+
+# Rules catalog shipped with the app: skills, rating levels, feedback text and drills.
+# Set AI_SOCCER_RULES to use another file with the same layout.
+DEFAULT_RULES_PATH = os.environ.get(
+    "AI_SOCCER_RULES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "feedback_rules.json")
+)
+
+# Ratings run from 0 to this; the level lookup table has one entry per whole rating
+MAX_RATING = 10
+
+
+# Function to read a rules catalog from a JSON file
+def load_rules(path=DEFAULT_RULES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Function to turn an int seed, a Generator or None (fresh entropy) into a numpy Generator
+def make_rng(rng=None):
+    import numpy as np
+    return rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
+
+
+# Feedback and drill rules compiled into lookup tables:
+# - level_of[rating] gives the level index of a whole rating (0 = best level);
+# - messages[skill, level] gives the feedback text for it and colors[level] its color;
+# - drills[skill, i] lists each skill's drills, drill_counts[skill] how many there are.
+# score() works on a whole (players, skills) rating matrix at once.
+class RulesEngine:
+    def __init__(self, rules):
+        import numpy as np
+        self.skills = list(rules["skills"])
+        levels = sorted(rules["levels"], key=lambda level: level["min_rating"], reverse=True)
+        self.levels = [level["name"] for level in levels]
+        thresholds = np.array([level["min_rating"] for level in levels], dtype=np.float64)
+        # Thresholds descend, so the level of a rating is the number of thresholds above it
+        self._thresholds = thresholds[::-1]
+        self.level_of = self._level(np.arange(MAX_RATING + 1))
+
+        unknown = set(rules["feedback"]) - set(self.skills)
+        if unknown:
+            raise ValueError(f"Feedback for unknown skills: {', '.join(sorted(unknown))}")
+        self.messages = np.array(
+            [[rules["feedback"][skill][level] for level in self.levels] for skill in self.skills], dtype=object
+        )
+        self.colors = [tuple(level["color"]) for level in levels]
+
+        drill_lists = [list(rules["drills"][skill]) for skill in self.skills]
+        self.drill_counts = np.array([len(drills) for drills in drill_lists])
+        self.drills = np.full((len(self.skills), self.drill_counts.max()), None, dtype=object)
+        for i, drills in enumerate(drill_lists):
+            self.drills[i, :len(drills)] = drills
+        self.drills_per_player = int(rules.get("drills_per_player", 2))
+        if self.drills_per_player > self.drill_counts.min():
+            raise ValueError("drills_per_player is larger than some skill's drill list")
+
+    # Function to map ratings (any shape) to level indices by searching the thresholds
+    def _level(self, ratings):
+        import numpy as np
+        # Ratings below the lowest threshold still get the lowest level
+        above = len(self._thresholds) - np.searchsorted(self._thresholds, ratings, side="right")
+        return np.minimum(above, len(self._thresholds) - 1)
+
+    # Function to map ratings (any shape) to level indices, using the lookup table for whole ratings
+    def levels_of(self, ratings):
+        import numpy as np
+        ratings = np.asarray(ratings)
+        if ratings.dtype.kind in "iu" and ratings.size and ratings.min() >= 0 and ratings.max() <= MAX_RATING:
+            return self.level_of[ratings]
+        return self._level(ratings)
+
+    # Function to turn a {skill: rating} dict into a (1, skills) matrix in catalog order
+    def ratings_matrix(self, ratings):
+        import numpy as np
+        return np.array([[ratings[skill] for skill in self.skills]])
+
+    # Function to score a (players, skills) rating matrix in one pass. Returns a dict of
+    # levels (players, skills), weakest (players,) skill indices - the first of equal
+    # lowest ratings in catalog order - and drills (players, drills_per_player) drill
+    # names sampled without replacement from each weakest skill's list using rng.
+    def score(self, ratings, rng=None):
+        import numpy as np
+        ratings = np.asarray(ratings)
+        weakest = np.argmin(ratings, axis=1)
+        # Sampling k of n without replacement for every row at once: rank random keys
+        # and keep the k smallest, with the keys of missing list slots pushed to the end
+        keys = make_rng(rng).random((len(ratings), self.drills.shape[1]))
+        keys[np.arange(self.drills.shape[1]) >= self.drill_counts[weakest][:, None]] = np.inf
+        picks = np.argsort(keys, axis=1)[:, :self.drills_per_player]
+        return {
+            "levels": self.levels_of(ratings),
+            "weakest": weakest,
+            "drills": self.drills[weakest[:, None], picks],
+        }
+
+    # Function to get the detailed feedback for one player as {skill: (text, color)}
+    def feedback(self, ratings):
+        levels = self.levels_of(self.ratings_matrix(ratings))[0]
+        return {
+            skill: (self.messages[i, levels[i]], self.colors[levels[i]])
+            for i, skill in enumerate(self.skills)
+        }
+
+    # Function to get one player's weakest skill and a sample of drills for it
+    def weakest_and_drills(self, ratings, rng=None):
+        scored = self.score(self.ratings_matrix(ratings), rng)
+        return self.skills[scored["weakest"][0]], list(scored["drills"][0])
+
+    # Function to score a table with one column per skill (e.g. PlayerStore.history())
+    # and return it with level, weakest_skill and recommended_drills columns added
+    def score_table(self, table, rng=None):
+        import pandas as pd
+        scored = self.score(table[self.skills].to_numpy(), rng)
+        result = table.copy()
+        for i, skill in enumerate(self.skills):
+            result[f"{skill} level"] = pd.Categorical.from_codes(scored["levels"][:, i], self.levels)
+        result["weakest_skill"] = pd.Categorical.from_codes(scored["weakest"], self.skills)
+        result["recommended_drills"] = scored["drills"].tolist()
+        return result
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+# Function to get the process-wide rules engine, compiled from the catalog on first use
+def get_rules_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RulesEngine(load_rules())
+        return _engine
@@ -0,0 +1,320 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Where per-session and per-job workspaces are created
+DEFAULT_SCRATCH_DIR = os.environ.get("AI_SOCCER_SCRATCH_DIR", os.path.join(tempfile.gettempdir(), "ai_soccer_scratch"))
+
+# Total bytes all workspaces may hold before the least recently used ones are removed
+DEFAULT_MAX_BYTES = int(os.environ.get("AI_SOCCER_SCRATCH_MAX_BYTES", 4 * 1024 ** 3))
+
+# Optional RAM-backed directory (e.g. /dev/shm/ai_soccer) for hot files such as
+# renders in progress, and how much of it they may use before falling back to disk
+DEFAULT_HOT_DIR = os.environ.get("AI_SOCCER_SCRATCH_TMPFS") or None
+DEFAULT_HOT_MAX_BYTES = int(os.environ.get("AI_SOCCER_SCRATCH_TMPFS_MAX_BYTES", 512 * 1024 ** 2))
+
+# Workspaces touched this recently are in use (possibly by another process) and never evicted
+ACTIVE_SECONDS = 120
+
+# Workspaces left untouched this long are removed even when under quota
+IDLE_TTL_SECONDS = 6 * 3600
+
+# File in each workspace recording its owner; its modification time is the last access
+LEASE_FILE = ".lease"
+
+# Tells this process apart from an earlier one that had the same pid (e.g. pid 1 in a container)
+PROCESS_TOKEN = uuid.uuid4().hex
+
+
+# Raised when a workspace cannot get the space it needs without evicting active ones
+class ScratchFullError(OSError):
+    pass
+
+
+# Function to check whether a process is still running on this machine
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Function to check whether the process that wrote a workspace lease has exited
+def owner_gone(lease, host):
+    pid = lease.get("pid")
+    if lease.get("host") != host or not isinstance(pid, int) or pid <= 0:
+        return False
+    if pid == os.getpid():
+        return lease.get("token") != PROCESS_TOKEN
+    return not pid_alive(pid)
+
+
+# Function to add up the size of every file under a directory
+def directory_bytes(path):
+    total = 0
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                total += directory_bytes(entry.path)
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            pass
+    return total
+
+
+# One workspace: a private directory for a session's uploads or a job's outputs
+class Workspace:
+    def __init__(self, scratch, name, path):
+        self.scratch = scratch
+        self.name = name
+        self.path = path
+
+    # Function to create a new empty file in the workspace and return its path
+    def file(self, suffix="", prefix="tmp"):
+        if not self.exists():
+            # Evicted while idle: start it again, empty
+            self.path = self.scratch.workspace(self.name).path
+        self.touch()
+        fd, path = tempfile.mkstemp(suffix=suffix, prefix=prefix, dir=self.path)
+        os.close(fd)
+        return path
+
+    # Function to mark the workspace as just used, which keeps it off the eviction list for a while
+    def touch(self):
+        try:
+            os.utime(os.path.join(self.path, LEASE_FILE))
+        except FileNotFoundError:
+            pass
+
+    def size(self):
+        return directory_bytes(self.path)
+
+    def exists(self):
+        return os.path.isdir(self.path)
+
+    def remove(self):
+        self.scratch.remove(self.name)
+
+
+# Bounded scratch area made of workspaces. Each workspace is a directory with a
+# lease file naming its owning process; the lease's mtime is its last access.
+# Quotas are enforced by removing whole workspaces, least recently used first,
+# skipping ones that are pinned in this process or were touched in the last
+# ACTIVE_SECONDS. Workspaces of processes that died (crashes, restarts) and ones
+# idle past IDLE_TTL_SECONDS are removed by cleanup(). Safe to share between
+# threads and between processes on the same disk.
+class ScratchSpace:
+    def __init__(self, root=DEFAULT_SCRATCH_DIR, max_bytes=DEFAULT_MAX_BYTES, hot_root=DEFAULT_HOT_DIR,
+                 hot_max_bytes=DEFAULT_HOT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hot_root = hot_root
+        self.hot_max_bytes = hot_max_bytes
+        self._lock = threading.Lock()
+        self._pinned = {}
+        self._reserve_lock = threading.Lock()
+        self._reserved = 0
+        self.evicted = 0
+        os.makedirs(root, exist_ok=True)
+        if hot_root:
+            os.makedirs(hot_root, exist_ok=True)
+
+    def _roots(self):
+        return [root for root in (self.root, self.hot_root) if root]
+
+    def _find(self, name):
+        for root in self._roots():
+            path = os.path.join(root, name)
+            if os.path.isdir(path):
+                return path
+        return None
+
+    # Function to open a workspace, creating it if needed. name defaults to a fresh
+    # unique id. A new workspace needs room under its quota for the `needed` bytes about
+    # to be written into it (e.g. an estimate of a render's size). hot=True places it on
+    # the tmpfs when one is configured and has that room under hot_max_bytes; otherwise
+    # it goes on disk, evicting idle workspaces as needed, and ScratchFullError is raised
+    # when the disk quota cannot make room for `needed` bytes.
+    def workspace(self, name=None, hot=False, needed=0):
+        name = name or uuid.uuid4().hex
+        path = self._find(name)
+        if path is None:
+            root = self.root
+            if hot and self.hot_root and self._ensure(self.hot_root, self.hot_max_bytes, needed, raise_full=False):
+                root = self.hot_root
+            else:
+                with self._reserve_lock:
+                    # An empty workspace adds nothing, so it is created even when only active ones are left
+                    self._ensure(self.root, self.max_bytes, needed, raise_full=needed > 0)
+            path = os.path.join(root, name)
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, LEASE_FILE), "w") as f:
+                json.dump({"pid": os.getpid(), "token": PROCESS_TOKEN, "host": socket.gethostname(),
+                           "created": time.time()}, f)
+        workspace = Workspace(self, name, path)
+        workspace.touch()
+        return workspace
+
+    # Function to keep a workspace from being evicted while the block runs
+    @contextmanager
+    def pinned(self, name):
+        with self._lock:
+            self._pinned[name] = self._pinned.get(name, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pinned[name] -= 1
+                if not self._pinned[name]:
+                    del self._pinned[name]
+
+    # Function to open a throwaway workspace for one job, removed when the block exits
+    @contextmanager
+    def job_workspace(self, hot=False, needed=0):
+        workspace = self.workspace(hot=hot, needed=needed)
+        try:
+            with self.pinned(workspace.name):
+                yield workspace
+        finally:
+            workspace.remove()
+
+    def remove(self, name):
+        path = self._find(name)
+        if path is not None:
+            shutil.rmtree(path, ignore_errors=True)
+
+    # Function to list (name, path, last_access, size, lease) for every workspace under a root
+    def _list(self, root):
+        rows = []
+        try:
+            entries = list(os.scandir(root))
+        except OSError:
+            return rows
+        for entry in entries:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            lease_path = os.path.join(entry.path, LEASE_FILE)
+            try:
+                last_access = os.stat(lease_path).st_mtime
+                with open(lease_path) as f:
+                    lease = json.load(f)
+            except (OSError, ValueError):
+                # Half-created, or the lease was lost: judge by the directory itself
+                try:
+                    last_access = entry.stat(follow_symlinks=False).st_mtime
+                except OSError:
+                    continue
+                lease = {}
+            rows.append((entry.name, entry.path, last_access, directory_bytes(entry.path), lease))
+        return rows
+
+    # Function to remove least recently used idle workspaces under root until `needed`
+    # more bytes fit in max_bytes. Returns whether they fit; raises ScratchFullError
+    # instead when raise_full is set and only active workspaces are left.
+    def _ensure(self, root, max_bytes, needed, raise_full=True):
+        rows = sorted(self._list(root), key=lambda row: row[2])
+        total = sum(row[3] for row in rows) + (self._reserved if root == self.root else 0)
+        if total + needed <= max_bytes:
+            return True
+        now = time.time()
+        with self._lock:
+            pinned = set(self._pinned)
+        for name, path, last_access, size, _ in rows:
+            if total + needed <= max_bytes:
+                break
+            if name in pinned or now - last_access < ACTIVE_SECONDS:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self.evicted += 1
+        if total + needed <= max_bytes:
+            return True
+        if raise_full:
+            raise ScratchFullError(
+                f"Scratch space is full ({total / 1024 ** 2:.0f} MB in use by active sessions, "
+                f"{needed / 1024 ** 2:.0f} MB more needed)"
+            )
+        return False
+
+    # Function to claim `needed` bytes on disk for the length of the block (e.g. while an
+    # upload is written), evicting idle workspaces to make room. Claims are checked one at
+    # a time, so concurrent sessions in this process cannot all pass the check and then
+    # overshoot the quota together. Raises ScratchFullError when there is no room.
+    @contextmanager
+    def reserve(self, needed):
+        with self._reserve_lock:
+            self._ensure(self.root, self.max_bytes, needed)
+            self._reserved += needed
+        try:
+            yield
+        finally:
+            with self._reserve_lock:
+                self._reserved -= needed
+
+    # Function to enforce both quotas; returns the number of workspaces removed
+    def evict(self):
+        before = self.evicted
+        self._ensure(self.root, self.max_bytes, 0, raise_full=False)
+        if self.hot_root:
+            self._ensure(self.hot_root, self.hot_max_bytes, 0, raise_full=False)
+        return self.evicted - before
+
+    # Function to remove workspaces left behind by processes that no longer run on
+    # this machine, and ones idle for longer than idle_ttl. Run at startup.
+    def cleanup(self, idle_ttl=IDLE_TTL_SECONDS):
+        removed = 0
+        host = socket.gethostname()
+        now = time.time()
+        with self._lock:
+            pinned = set(self._pinned)
+        for root in self._roots():
+            for name, path, last_access, _, lease in self._list(root):
+                if name in pinned:
+                    continue
+                stale = now - last_access > (ACTIVE_SECONDS if not lease else idle_ttl)
+                if owner_gone(lease, host) or stale:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+        return removed
+
+    # Function to report the number of workspaces and bytes used on disk and on the tmpfs
+    def usage(self):
+        rows = self._list(self.root)
+        hot = self._list(self.hot_root) if self.hot_root else []
+        return {
+            "workspaces": len(rows) + len(hot),
+            "bytes": sum(row[3] for row in rows),
+            "max_bytes": self.max_bytes,
+            "hot_bytes": sum(row[3] for row in hot),
+            "hot_max_bytes": self.hot_max_bytes if self.hot_root else 0,
+            "evicted": self.evicted,
+        }
+
+
+_scratch = None
+_scratch_lock = threading.Lock()
+
+
+# Function to get the process-wide scratch space, cleaning up after crashed or
+# restarted processes the first time it is used
+def get_scratch():
+    global _scratch
+    with _scratch_lock:
+        if _scratch is None:
+            _scratch = ScratchSpace()
+            _scratch.cleanup()
+        return _scratch
@@ -0,0 +1,396 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.connection import Client, Listener
+
+import cv2
+import numpy as np
+
+from pipeline_metrics import get_metrics
+from pose_pool import get_pose_pool
+from video_encoders import find_ffmpeg, open_capture, open_encoder
+from video_pipeline import NUM_LANDMARKS, expected_frame_count, render_overlay, render_video, run_serial
+
+# Segments shorter than this many seconds are not worth a process (and a cold pose model) of their own
+MIN_SEGMENT_SECONDS = 10
+
+# Shared secret for worker hosts; connections are authenticated with it (HMAC) before any
+# task is accepted, since tasks and results are pickled
+DEFAULT_AUTHKEY = os.environ.get("AI_SOCCER_WORKER_AUTHKEY")
+
+# Port a worker host listens on unless told otherwise
+DEFAULT_PORT = 6100
+
+
+# Function to split `frames` frames into at most `count` (start, end) frame ranges of
+# nearly equal length. The last range's end is None: it runs to the end of the file,
+# since container frame counts are estimates.
+def plan_segments(frames, count, fps=30):
+    count = max(1, min(count, frames // max(1, int(MIN_SEGMENT_SECONDS * fps))))
+    bounds = [round(frames * i / count) for i in range(count + 1)]
+    return [(bounds[i], bounds[i + 1] if i + 1 < count else None) for i in range(count)]
+
+
+# Function to open a capture positioned at frame `start`. OpenCV seeks to the keyframe
+# before it and decodes forward to the exact frame; sources that cannot seek are
+# read from the start and the frames before `start` skipped.
+def open_segment(video_path, start, hw_decode=False):
+    cap = open_capture(video_path, hw_decode)
+    if start and (not cap.set(cv2.CAP_PROP_POS_FRAMES, start) or int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start):
+        cap.release()
+        cap = open_capture(video_path, hw_decode)
+        for _ in range(start):
+            if not cap.grab():
+                break
+        get_metrics().inc("segment_seek_fallbacks")
+    return cap
+
+
+# Function to analyze the frames [start, end) of a video (end None: to the end) with its
+# own capture and pose estimator. Returns their (frames, 33, 4) landmark array.
+def analyze_segment(video_path, start, end, pose_options=None, hw_decode=False):
+    cap = open_segment(video_path, start, hw_decode)
+    try:
+        with get_pose_pool().pose(**(pose_options or {})) as pose:
+            return run_serial(cap, pose, max_frames=None if end is None else end - start)
+    finally:
+        cap.release()
+
+
+# Function to render one segment: exactly len(landmarks) frames from frame `start`, drawn
+# like render_video / render_overlay, into its own file. Returns the encoder stats.
+def render_segment(video_path, path, start, landmarks, ai_feedback, fps, size, output="video", encoder="auto",
+                   resolution="source", quality="balanced", hw_decode=False):
+    out = open_encoder(path, fps, size, backend=encoder, resolution=resolution, quality=quality,
+                       alpha=output == "overlay")
+    with out:
+        if output == "overlay":
+            render_overlay(out, landmarks, ai_feedback, size)
+        else:
+            cap = open_segment(video_path, start, hw_decode)
+            try:
+                render_video(cap, out, landmarks, ai_feedback, max_frames=len(landmarks))
+            finally:
+                cap.release()
+    return out.stats()
+
+
+# Tasks a pool can run, by name: names rather than functions are what is sent to worker hosts
+TASKS = {"analyze": analyze_segment, "render": render_segment}
+
+
+def run_task(name, args):
+    return TASKS[name](*args)
+
+
+def _init_worker():
+    # Each worker decodes one segment; several OpenCV threads per worker only contend
+    cv2.setNumThreads(1)
+
+
+# Pool of local worker processes with a map interface shared with HostPool.
+# Use as a context manager; the processes live until it exits.
+class LocalPool:
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+
+    def __enter__(self):
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._executor.shutdown(wait=exc_type is None, cancel_futures=True)
+
+    # Function to run task `name` once per argument tuple in items, in parallel.
+    # on_result(index, result), if given, is called as each one finishes.
+    # Returns the results in the order of items.
+    def map(self, name, items, on_result=None):
+        futures = {self._executor.submit(run_task, name, args): i for i, args in enumerate(items)}
+        results = [None] * len(items)
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index] = future.result()
+            if on_result is not None:
+                on_result(index, results[index])
+        return results
+
+
+# Function to parse "host:port" (port defaults to DEFAULT_PORT)
+def parse_address(address):
+    host, _, port = address.rpartition(":") if ":" in address else (address, "", "")
+    return host or "localhost", int(port or DEFAULT_PORT)
+
+
+# Pool of worker hosts started with `python segment_parallel.py serve`, with the same
+# map interface as LocalPool. Each host runs as many tasks at once as it has slots.
+# Hosts must see the video (and, for renders, the output directory) at the same paths,
+# e.g. on shared storage. Tasks in flight on a host that drops out are handed to the
+# others; a task that raises fails the whole map.
+class HostPool:
+    def __init__(self, hosts, authkey=DEFAULT_AUTHKEY):
+        if not authkey:
+            raise ValueError("Worker hosts need a shared authkey (set AI_SOCCER_WORKER_AUTHKEY)")
+        self.hosts = [parse_address(host) if isinstance(host, str) else host for host in hosts]
+        self.authkey = authkey.encode() if isinstance(authkey, str) else authkey
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def map(self, name, items, on_result=None):
+        todo = queue.Queue()
+        for index, args in enumerate(items):
+            todo.put(index)
+        results = [None] * len(items)
+        state = {"left": len(items), "error": None, "hosts": len(self.hosts)}
+        cond = threading.Condition()
+
+        def finished(index, result):
+            with cond:
+                results[index] = result
+                state["left"] -= 1
+                if on_result is not None:
+                    on_result(index, result)
+                cond.notify_all()
+
+        def fail(error):
+            with cond:
+                state["error"] = state["error"] or error
+                cond.notify_all()
+
+        def drive(address):
+            in_flight = set()
+            try:
+                conn = Client(address, authkey=self.authkey)
+            except (OSError, EOFError, multiprocessing.AuthenticationError) as e:
+                with cond:
+                    state["hosts"] -= 1
+                    cond.notify_all()
+                get_metrics().inc("worker_host_failures")
+                if not state["hosts"]:
+                    fail(f"No worker host could be reached (last: {address[0]}:{address[1]}: {e})")
+                return
+            try:
+                _, slots = conn.recv()
+                while True:
+                    with cond:
+                        if state["error"] or (not state["left"] and not in_flight):
+                            break
+                    while len(in_flight) < slots:
+                        try:
+                            index = todo.get_nowait()
+                        except queue.Empty:
+                            break
+                        conn.send(("task", index, name, items[index]))
+                        in_flight.add(index)
+                    if not in_flight:
+                        # Nothing left to send; others are still finishing theirs
+                        with cond:
+                            cond.wait(0.1)
+                        continue
+                    kind, index, payload = conn.recv()
+                    in_flight.discard(index)
+                    if kind == "error":
+                        fail(f"Task failed on {address[0]}:{address[1]}:\n{payload}")
+                    else:
+                        finished(index, payload)
+                conn.send(("close", None, None, None))
+            except (OSError, EOFError) as e:
+                # The host went away: give its tasks back to the others
+                for index in in_flight:
+                    todo.put(index)
+                get_metrics().inc("worker_host_failures")
+                with cond:
+                    state["hosts"] -= 1
+                    if not state["hosts"]:
+                        state["error"] = state["error"] or f"All worker hosts dropped out (last: {e})"
+                    cond.notify_all()
+            finally:
+                conn.close()
+
+        threads = [threading.Thread(target=drive, args=(address,), daemon=True) for address in self.hosts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if state["error"]:
+            raise RuntimeError(state["error"])
+        if state["left"]:
+            raise RuntimeError(f"{state['left']} segment tasks were not run")
+        return results
+
+
+# Function to pick the pool for segment work: worker hosts when given, else local processes
+def segment_pool(workers=None, hosts=None, authkey=DEFAULT_AUTHKEY):
+    return HostPool(hosts, authkey) if hosts else LocalPool(workers)
+
+
+# Function to analyze a video as `segments` time segments, each on its own process or host
+# with its own capture and pose estimator, and stitch the landmark series back together.
+# Every frame lands in exactly one segment, so the result lines up with run_serial's frame
+# for frame; a segment that comes back short is padded with NaN rows to keep it aligned.
+# As in run_parallel, each frame is detected on its own (static_image_mode is forced on):
+# video-mode tracking started at a segment boundary never converges back to the serial
+# path, however many frames before it are run first, while static-mode landmarks match
+# run_serial exactly. on_frames(n), if given, is called as segments finish.
+# Returns the (frames, 33, 4) array.
+def run_segmented(video_path, pool, segments, pose_options=None, hw_decode=False, on_frames=None):
+    pose_options = dict(pose_options or {}, static_image_mode=True)
+    cap = open_capture(video_path, hw_decode)
+    frames = expected_frame_count(cap)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    cap.release()
+    plan = plan_segments(frames, segments, fps)
+    metrics = get_metrics()
+
+    def done(index, landmarks):
+        metrics.inc("segments_analyzed")
+        if on_frames is not None:
+            on_frames(len(landmarks))
+
+    parts = pool.map("analyze", [(video_path, start, end, pose_options, hw_decode) for start, end in plan], done)
+    for i, (start, end) in enumerate(plan):
+        if end is not None and len(parts[i]) < end - start:
+            metrics.inc("segment_missing_frames", end - start - len(parts[i]))
+            padded = np.full((end - start, NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+            padded[:len(parts[i])] = parts[i]
+            parts[i] = padded
+    return np.concatenate(parts) if parts else np.empty((0, NUM_LANDMARKS, 4), dtype=np.float32)
+
+
+# Function to join encoded segment files into one without re-encoding (ffmpeg concat demuxer).
+# Each segment's timestamps are shifted to follow the previous one's.
+def concat_segments(paths, output_path):
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        raise RuntimeError("Joining segments needs ffmpeg")
+    fd, list_path = tempfile.mkstemp(suffix=".txt", prefix="segments_", dir=os.path.dirname(output_path) or None)
+    try:
+        with os.fdopen(fd, "w") as f:
+            for path in paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        command = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-f", "concat", "-safe", "0",
+                   "-i", list_path, "-c", "copy"]
+        if output_path.endswith(".mp4"):
+            command += ["-movflags", "+faststart"]
+        result = subprocess.run(command + [output_path], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg could not join the segments: {result.stderr.strip()}")
+    finally:
+        os.remove(list_path)
+
+
+# Function to render a video (or overlay track) in segments on the pool and join them.
+# The segments split the landmark rows, so the output has exactly one frame per row.
+# on_frames(n), if given, is called as segments finish. Returns combined encoder stats.
+def render_segmented(video_path, output_path, pool, segments, landmarks, ai_feedback, fps, size, output="video",
+                     encoder="auto", resolution="source", quality="balanced", hw_decode=False, on_frames=None):
+    plan = plan_segments(len(landmarks), segments, fps)
+    base, extension = os.path.splitext(output_path)
+    paths = [f"{base}.part{i}{extension}" for i in range(len(plan))]
+    items = [
+        (video_path, path, start, landmarks[start:end], ai_feedback, fps, size, output, encoder, resolution, quality,
+         hw_decode)
+        for path, (start, end) in zip(paths, plan)
+    ]
+
+    def done(index, stats):
+        get_metrics().inc("segments_rendered")
+        if on_frames is not None:
+            on_frames(stats["frames"])
+
+    try:
+        parts = pool.map("render", items, done)
+        concat_segments(paths, output_path)
+    finally:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+    seconds = sum(part["seconds"] for part in parts)
+    frames = sum(part["frames"] for part in parts)
+    return dict(parts[0], frames=frames, seconds=seconds, fps=frames / seconds if seconds else None,
+                bytes=os.path.getsize(output_path), segments=len(parts))
+
+
+# Function to serve segment tasks to coordinators on one connection: tasks run on the
+# host's worker processes as they arrive and results go back as they finish
+def _serve_connection(conn, executor, slots):
+    send_lock = threading.Lock()
+
+    def reply(index, future):
+        try:
+            message = ("result", index, future.result())
+        except Exception:
+            message = ("error", index, traceback.format_exc())
+        with send_lock:
+            try:
+                conn.send(message)
+            except (OSError, EOFError):
+                pass
+
+    try:
+        with send_lock:
+            conn.send(("hello", slots))
+        while True:
+            kind, index, name, args = conn.recv()
+            if kind == "close":
+                break
+            if name not in TASKS:
+                with send_lock:
+                    conn.send(("error", index, f"Unknown task: {name}"))
+                continue
+            future = executor.submit(run_task, name, args)
+            future.add_done_callback(lambda future, index=index: reply(index, future))
+    except (OSError, EOFError):
+        pass
+    finally:
+        conn.close()
+
+
+# Function to run a worker host: accept authenticated coordinators on address and run
+# their segment tasks on `slots` local worker processes
+def serve(address, authkey=DEFAULT_AUTHKEY, slots=None):
+    if not authkey:
+        raise ValueError("A worker host needs an authkey (set AI_SOCCER_WORKER_AUTHKEY)")
+    authkey = authkey.encode() if isinstance(authkey, str) else authkey
+    slots = slots or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=slots, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker)
+    with Listener(address, authkey=authkey) as listener:
+        print(f"Serving segment tasks on {address[0]}:{address[1]} with {slots} worker processes")
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError):
+                    # A client that failed authentication or hung up mid-handshake
+                    continue
+                threading.Thread(target=_serve_connection, args=(conn, executor, slots), daemon=True).start()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a worker host for segment-parallel video analysis.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    host = sub.add_parser("serve", help="Accept segment tasks from process_video(hosts=...)")
+    host.add_argument("--address", default=f"0.0.0.0:{DEFAULT_PORT}", help="host:port to listen on")
+    host.add_argument("--slots", type=int, help="Worker processes (default: one per CPU)")
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(parse_address(args.address), slots=args.slots)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# MediaPipe Pose landmark indices used by the metrics
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+
+SKILLS = ["Dribbling", "Passing", "Shooting", "Speed", "Agility"]
+
+# Landmarks below this visibility are treated as missing
+MIN_VISIBILITY = 0.5
+
+# Fewer tracked frames than this and there is not enough movement to rate
+MIN_TRACKED_FRAMES = 10
+
+# Rating given to a skill none of whose metrics could be measured (e.g. feet out of frame)
+NEUTRAL_RATING = 5
+
+# Hips count as square to the camera when closer than this in normalized x (as in the
+# original generate_feedback check) and level when their height gap is under this share of the torso
+HIP_SQUARE_X = 0.1
+HIP_LEVEL_TORSO = 0.15
+
+# A turn is a heading change above this many degrees between direction samples taken this often
+TURN_DEGREES = 60
+DIRECTION_SAMPLES_PER_SECOND = 5
+
+# Hips moving slower than this (torso lengths per second) count as standing still
+MOVING_SPEED = 1.0
+
+# Ankle separation (torso lengths) the feet must swing past to count as a step
+STEP_HYSTERESIS = 0.1
+
+# Metric values mapped to the bottom (1) and top (10) of the rating scale.
+# Distances are in torso lengths so they do not depend on how far away the camera is.
+METRIC_SCALES = {
+    "speed": (0.5, 12.0),              # p90 hip speed, torso lengths / s
+    "acceleration": (1.0, 20.0),       # p90 hip acceleration, torso lengths / s^2
+    "direction_changes": (0.05, 1.5),  # sharp turns per second of movement
+    "cadence": (0.5, 3.5),             # steps per second
+    "knee_flexion": (5.0, 35.0),       # mean knee bend, degrees short of straight
+    "hip_alignment": (0.3, 0.95),      # share of frames with square, level hips
+    "trunk_sway": (25.0, 3.0),         # std of trunk lean in degrees (lower is steadier)
+    "kick_speed": (3.0, 30.0),         # p99 ankle speed relative to the hips, torso lengths / s
+    "knee_extension_range": (10.0, 80.0),  # p95 - p5 knee angle, degrees
+}
+
+# Which metrics each rating is averaged from
+SKILL_METRICS = {
+    "Dribbling": ["cadence", "knee_flexion", "direction_changes"],
+    "Passing": ["hip_alignment", "trunk_sway"],
+    "Shooting": ["kick_speed", "knee_extension_range"],
+    "Speed": ["speed", "acceleration"],
+    "Agility": ["direction_changes", "cadence"],
+}
+
+
+# Function to fill missing frames by linear interpolation along time.
+# Works on a (frames, ...) array with NaN marking missing values.
+def fill_gaps(series):
+    import numpy as np
+    flat = series.reshape(len(series), -1).astype(np.float64)
+    frames = np.arange(len(flat))
+    for column in flat.T:
+        missing = np.isnan(column)
+        if missing.all():
+            continue
+        if missing.any():
+            column[missing] = np.interp(frames[missing], frames[~missing], column[~missing])
+    return flat.reshape(series.shape)
+
+
+# Function to apply a centered moving average along time
+def smooth(series, window):
+    import numpy as np
+    window = int(window)
+    if window <= 1 or len(series) < window:
+        return series
+    kernel = np.ones(window) / window
+    padded = np.pad(series, [(window // 2, window - 1 - window // 2)] + [(0, 0)] * (series.ndim - 1), mode="edge")
+    return np.apply_along_axis(lambda column: np.convolve(column, kernel, mode="valid"), 0, padded)
+
+
+# Function to compute the angle at b (degrees) between points a-b-c for every frame
+def joint_angle(a, b, c):
+    import numpy as np
+    ba = a - b
+    bc = c - b
+    cos = np.einsum("...i,...i->...", ba, bc) / (np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1) + 1e-9)
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+
+# Function to take a percentile that ignores NaN and is NaN when nothing was measured
+def _percentile(values, q):
+    import numpy as np
+    values = values[~np.isnan(values)]
+    return float(np.percentile(values, q)) if len(values) else float("nan")
+
+
+# Function to take a mean that ignores NaN and is NaN when nothing was measured
+def _mean(values):
+    import numpy as np
+    values = values[~np.isnan(values)]
+    return float(np.mean(values)) if len(values) else float("nan")
+
+
+# Function to count steps as alternations of the feet past each other, with hysteresis
+def count_alternations(signal, threshold):
+    import numpy as np
+    state = np.where(signal > threshold, 1, np.where(signal < -threshold, -1, 0))
+    state = state[state != 0]
+    return int(np.count_nonzero(np.diff(state)))
+
+
+# Function to turn a (frames, 33, 4) landmark series into movement metrics.
+# aspect is the frame's width / height, used to undo the separate x/y normalization.
+# Metrics that need joints which are never visible come back as NaN.
+# Returns None when the player is tracked in too few frames.
+def compute_skill_metrics(landmarks, fps, aspect=1.0):
+    import numpy as np
+    fps = float(fps) or 30.0
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    visible = landmarks[..., 3] >= MIN_VISIBILITY
+    joints = [LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE]
+    tracked = visible[:, [LEFT_HIP, RIGHT_HIP]].all(axis=1)
+    if tracked.sum() < MIN_TRACKED_FRAMES:
+        return None
+
+    # Only keep the span where the player is tracked, filling short dropouts inside it
+    first, last = np.flatnonzero(tracked)[[0, -1]]
+    points = landmarks[first:last + 1, joints, :2].astype(np.float64)
+    points[~visible[first:last + 1, joints]] = np.nan
+    points[..., 0] *= aspect
+    points = smooth(fill_gaps(points), max(1, round(fps / 10)))
+    (l_sh, r_sh, l_hip, r_hip, l_knee, r_knee, l_ankle, r_ankle) = (points[:, i] for i in range(len(joints)))
+    seconds = len(points) / fps
+
+    hips = (l_hip + r_hip) / 2
+    shoulders = (l_sh + r_sh) / 2
+    torso = _percentile(np.linalg.norm(shoulders - hips, axis=1), 50)
+    if not torso > 0:
+        # Without shoulders, fall back to hip width as the body scale
+        torso = 3 * _percentile(np.linalg.norm(l_hip - r_hip, axis=1), 50) or 1.0
+
+    # Hip speed and acceleration in torso lengths
+    velocity = np.gradient(hips, axis=0) * fps / torso
+    speed = np.linalg.norm(velocity, axis=1)
+    acceleration = np.linalg.norm(np.gradient(velocity, axis=0) * fps, axis=1)
+
+    # Sharp changes of running direction while moving
+    step = max(1, round(fps / DIRECTION_SAMPLES_PER_SECOND))
+    sampled_velocity = velocity[::step]
+    moving = np.linalg.norm(sampled_velocity, axis=1) > MOVING_SPEED
+    heading = np.degrees(np.arctan2(sampled_velocity[:, 1], sampled_velocity[:, 0]))
+    turn = np.abs((np.diff(heading) + 180) % 360 - 180)
+    turns = np.count_nonzero((turn > TURN_DEGREES) & moving[1:] & moving[:-1])
+    moving_seconds = max(moving.sum() * step / fps, 1.0)
+
+    # Steps from the feet swinging past each other
+    separation = (l_ankle[:, 0] - r_ankle[:, 0]) / torso
+    cadence = float("nan")
+    if not np.isnan(separation).all():
+        cadence = count_alternations(separation - _mean(separation), STEP_HYSTERESIS) / seconds
+
+    # Knee and trunk angles
+    knee_angles = np.concatenate([joint_angle(l_hip, l_knee, l_ankle), joint_angle(r_hip, r_knee, r_ankle)])
+    trunk = shoulders - hips
+    trunk_lean = np.degrees(np.arctan2(trunk[:, 0], -trunk[:, 1]))
+
+    # Hip alignment, after the square / level hip checks of the original posture feedback
+    hips_square = np.abs(l_hip[:, 0] - r_hip[:, 0]) / aspect < HIP_SQUARE_X
+    hips_level = np.abs(l_hip[:, 1] - r_hip[:, 1]) / torso < HIP_LEVEL_TORSO
+
+    # Foot swing speed relative to the body, for strikes
+    ankle_speed = np.concatenate([
+        np.linalg.norm(np.gradient(ankle - hips, axis=0), axis=1) for ankle in (l_ankle, r_ankle)
+    ]) * fps / torso
+
+    return {
+        "speed": _percentile(speed, 90),
+        "acceleration": _percentile(acceleration, 90),
+        "direction_changes": turns / moving_seconds,
+        "cadence": cadence,
+        "knee_flexion": 180.0 - _mean(knee_angles),
+        "hip_alignment": float(np.mean(hips_square & hips_level)),
+        "trunk_sway": float(np.nanstd(trunk_lean)) if not np.isnan(trunk_lean).all() else float("nan"),
+        "kick_speed": _percentile(ankle_speed, 99),
+        "knee_extension_range": _percentile(knee_angles, 95) - _percentile(knee_angles, 5),
+        "tracked_seconds": seconds,
+    }
+
+
+# Function to map a metric onto 0..1 using its scale in METRIC_SCALES (NaN stays NaN)
+def metric_score(name, value):
+    import numpy as np
+    low, high = METRIC_SCALES[name]
+    return float(np.clip((value - low) / (high - low), 0.0, 1.0))
+
+
+# Function to convert movement metrics into the 1-10 skill ratings used for feedback and drills
+def rate_skills(metrics):
+    import numpy as np
+    ratings = {}
+    for skill in SKILLS:
+        scores = np.array([metric_score(name, metrics[name]) for name in SKILL_METRICS[skill]])
+        scores = scores[~np.isnan(scores)]
+        ratings[skill] = int(round(1 + 9 * scores.mean())) if len(scores) else NEUTRAL_RATING
+    return ratings
@@ -0,0 +1,149 @@
+import argparse
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+# Where generated clips are kept between benchmark runs
+DEFAULT_CORPUS_DIR = os.path.join(tempfile.gettempdir(), "ai_soccer_bench_corpus")
+
+# Clips generated for the benchmark: (name, width, height, fps, seconds, kind).
+# "player" clips show a cartoon player MediaPipe can track running across a pitch;
+# "team" clips show several smaller players running drills at once (the multi-player path);
+# "noise" clips are procedural noise with no one in them (detector-only path, worst case for the encoder).
+DEFAULT_CORPUS = [
+    ("player_480p30_5s", 640, 480, 30, 5, "player"),
+    ("player_720p30_5s", 1280, 720, 30, 5, "player"),
+    ("player_1080p30_5s", 1920, 1080, 30, 5, "player"),
+    ("player_720p2997_10s", 1280, 720, 30000 / 1001, 10, "player"),
+    ("player_720p60_5s", 1280, 720, 60, 5, "player"),
+    ("player_480p24_20s", 640, 480, 24, 20, "player"),
+    ("team_720p30_5s", 1280, 720, 30, 5, "team"),
+    ("noise_720p30_5s", 1280, 720, 30, 5, "noise"),
+]
+
+# A small corpus for quick checks
+QUICK_CORPUS = [
+    ("player_480p30_2s", 640, 480, 30, 2, "player"),
+    ("noise_480p30_2s", 640, 480, 30, 2, "noise"),
+]
+
+# Players in a "team" clip
+TEAM_SIZE = 4
+
+PITCH_COLOR = (60, 140, 60)
+SKIN_COLOR = (140, 170, 220)
+SHIRT_COLOR = (40, 40, 200)
+SHORTS_COLOR = (30, 30, 30)
+SOCK_COLOR = (240, 240, 240)
+BOOT_COLOR = (20, 20, 20)
+
+
+# Function to draw a cartoon player at horizontal position cx, top rows down. Coordinates
+# are laid out for a 480-pixel-high frame and scaled; phase drives the running stride.
+def draw_player(frame, phase, cx, scale, top=0):
+    swing = np.sin(phase)
+
+    def point(x, y):
+        return int(cx + x * scale), int(top + y * scale)
+
+    def width(w):
+        return max(1, int(w * scale))
+
+    hip = point(0, 260)
+    for side in (-1, 1):
+        knee = point(side * (20 - 35 * swing), 330)
+        foot = point(side * (25 - 60 * swing), 410)
+        cv2.line(frame, hip, knee, SHORTS_COLOR, width(26))
+        cv2.line(frame, knee, foot, SOCK_COLOR, width(20))
+        cv2.ellipse(frame, (foot[0] + width(10), foot[1] + width(5)), (width(18), width(8)), 0, 0, 360, BOOT_COLOR, -1)
+    cv2.ellipse(frame, point(0, 200), (width(42), width(70)), 0, 0, 360, SHIRT_COLOR, -1)
+    for side in (-1, 1):
+        elbow = point(side * 55, 200 - side * 20 * swing)
+        hand = point(side * (65 - 20 * swing), 255)
+        cv2.line(frame, point(side * 35, 150), elbow, SHIRT_COLOR, width(18))
+        cv2.line(frame, elbow, hand, SKIN_COLOR, width(14))
+    cv2.circle(frame, point(0, 100), width(32), SKIN_COLOR, -1)
+    for side in (-1, 1):
+        cv2.circle(frame, point(side * 11, 95), width(4), (40, 40, 40), -1)
+
+
+# Function to make a frame-sized grass texture that can be panned by rolling it
+def pitch_texture(width, height, rng):
+    grain = rng.normal(0, 12, (height // 4 + 1, width // 4 + 1)).astype(np.float32)
+    grain = cv2.resize(grain, (width, height), interpolation=cv2.INTER_LINEAR)
+    stripes = 10 * np.sign(np.sin(np.arange(width, dtype=np.float32) / width * 6 * np.pi))
+    texture = np.array(PITCH_COLOR, dtype=np.float32) + (grain + stripes)[..., None]
+    return np.clip(texture, 0, 255).astype(np.uint8)
+
+
+# Function to write one synthetic clip. The same spec and seed always give the same frames.
+def render_clip(path, width, height, fps, seconds, kind="player", seed=0):
+    rng = np.random.default_rng(seed)
+    frames = max(1, round(fps * seconds))
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), float(fps), (width, height))
+    if not out.isOpened():
+        raise RuntimeError(f"Could not open a video writer for {path}")
+    try:
+        if kind == "player":
+            pitch = pitch_texture(width, height, rng)
+            scale = height / 480
+            for i in range(frames):
+                t = i / fps
+                frame = np.roll(pitch, -int(t * width / 8), axis=1)
+                # Run back and forth across the middle of the frame, about three strides a second
+                cx = width / 2 + width * 0.3 * np.sin(t * 0.8)
+                draw_player(frame, t * 3 * np.pi, cx, scale)
+                out.write(frame)
+        elif kind == "team":
+            pitch = pitch_texture(width, height, rng)
+            scale = height / 480 * 0.45
+            lanes = TEAM_SIZE
+            for i in range(frames):
+                t = i / fps
+                frame = pitch.copy()
+                # Each player shuttles within its own lane at its own pace, two rows deep
+                for n in range(lanes):
+                    lane = width / lanes
+                    cx = lane * (n + 0.5) + lane * 0.25 * np.sin(t * (0.6 + 0.2 * n) + n)
+                    top = height * (0.05 if n % 2 else 0.45)
+                    draw_player(frame, t * (2.5 + 0.5 * n) * np.pi, cx, scale, top)
+                out.write(frame)
+        elif kind == "noise":
+            small = (height // 8 + 1, width // 8 + 1, 3)
+            for _ in range(frames):
+                noise = rng.integers(0, 256, small, dtype=np.uint8)
+                out.write(cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC))
+        else:
+            raise ValueError(f"Unknown clip kind: {kind}")
+    finally:
+        out.release()
+    return path
+
+
+# Function to generate any missing clips of a corpus and return {name: path}
+def build_corpus(directory=DEFAULT_CORPUS_DIR, specs=DEFAULT_CORPUS, seed=0):
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for name, width, height, fps, seconds, kind in specs:
+        path = os.path.join(directory, f"{name}.mp4")
+        if not os.path.exists(path):
+            partial = os.path.join(directory, f".{name}.partial.mp4")
+            render_clip(partial, width, height, fps, seconds, kind, seed)
+            os.replace(partial, path)
+        paths[name] = path
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the synthetic benchmark clips.")
+    parser.add_argument("directory", nargs="?", default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("--quick", action="store_true", help="Only generate the small quick-check corpus")
+    args = parser.parse_args()
+    for name, path in build_corpus(args.directory, QUICK_CORPUS if args.quick else DEFAULT_CORPUS).items():
+        print(f"{name}: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import threading
+import time
+
+from analysis_jobs import CANCELLED, DONE, FINISHED_STATES, JobManager
+
+
+# Function to poll a job until it reaches a finished state
+def wait_finished(manager, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["status"] in FINISHED_STATES:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job stayed {job['status']}")
+
+
+def slow_runner(video_path, progress=None, content_hash=None, frames=100):
+    for i in range(frames):
+        progress(i + 1, frames)
+        time.sleep(0.01)
+    return {"frames": frames}
+
+
+def test_cancel_right_after_submit(tmp_path):
+    manager = JobManager(slow_runner, db_path=str(tmp_path / "jobs.db"))
+    try:
+        job_id = manager.submit("clip.mp4", "hash", {})
+        assert manager.cancel(job_id)
+        job = wait_finished(manager, job_id)
+        assert job["status"] == CANCELLED
+        assert job["finished_at"] is not None
+        # The cancelled job is not handed back for the same clip and settings
+        assert manager.submit("clip.mp4", "hash", {}) != job_id
+    finally:
+        manager.shutdown()
+
+
+# A job whose cancel flag is set once its thread has picked it up, before it starts
+def test_cancel_before_start_is_recorded(tmp_path):
+    release = threading.Event()
+
+    def runner(video_path, progress=None, content_hash=None, block=False):
+        if block:
+            release.wait(10)
+        return {}
+
+    manager = JobManager(runner, db_path=str(tmp_path / "jobs.db"), max_running=1)
+    try:
+        blocker = manager.submit("a.mp4", "a", {"block": True})
+        job_id = manager.submit("b.mp4", "b", {})
+        # Set the flag without cancelling the future, as when cancel() loses the race
+        manager._cancel_events[job_id].set()
+        release.set()
+        assert wait_finished(manager, blocker)["status"] == DONE
+        job = wait_finished(manager, job_id)
+        assert job["status"] == CANCELLED
+        assert job["finished_at"] is not None
+    finally:
+        manager.shutdown()
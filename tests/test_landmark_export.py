@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from landmark_export import LandmarkWriter, frame_timestamps, read_landmarks, write_landmarks
+from pose_cache import PoseCache
+
+FRAMES = 300
+FPS = 30
+
+
+# Function to make a landmark series with a few frames without a pose
+def make_landmarks(*frame_shape):
+    rng = np.random.default_rng(0)
+    landmarks = rng.random((FRAMES, *frame_shape), dtype=np.float32)
+    landmarks[10:20] = np.nan
+    return landmarks
+
+
+def formats():
+    names = ["npy", "npz"]
+    try:
+        import pyarrow  # noqa: F401
+        names.append("parquet")
+    except ImportError:
+        pass
+    return names
+
+
+@pytest.mark.parametrize("format", formats())
+@pytest.mark.parametrize("frame_shape", [(33, 4), (3, 33, 4)])
+def test_round_trip(tmp_path, format, frame_shape):
+    landmarks = make_landmarks(*frame_shape)
+    timestamps = frame_timestamps(FRAMES, FPS)
+    path = write_landmarks(str(tmp_path / f"landmarks.{format}"), landmarks, timestamps)
+
+    read_timestamps, read = read_landmarks(path)
+    assert np.array_equal(read_timestamps, timestamps)
+    assert read.dtype == np.float32
+    assert np.array_equal(read, landmarks, equal_nan=True)
+
+    # A time slice is start <= t < end
+    read_timestamps, read = read_landmarks(path, start=2.0, end=3.5)
+    assert np.array_equal(read_timestamps, timestamps[60:105])
+    assert np.array_equal(read, landmarks[60:105], equal_nan=True)
+    assert len(read_landmarks(path, start=FRAMES)[0]) == 0
+
+
+# Frames flushed so far can be read while the writer is still appending
+def test_writer_is_readable_while_open(tmp_path):
+    landmarks = make_landmarks(33, 4)
+    path = str(tmp_path / "live.npy")
+    with LandmarkWriter(path, (33, 4), chunk_frames=64) as writer:
+        for i in range(100):
+            writer.append(landmarks[i], i / FPS)
+        timestamps, read = read_landmarks(path)
+        assert len(timestamps) == 64
+        assert np.array_equal(read, landmarks[:64], equal_nan=True)
+    timestamps, read = read_landmarks(path)
+    assert np.array_equal(read, landmarks[:100], equal_nan=True)
+
+
+def test_compressed_npz(tmp_path):
+    landmarks = make_landmarks(33, 4)
+    timestamps = frame_timestamps(FRAMES, FPS)
+    path = str(tmp_path / "compressed.npz")
+    np.savez_compressed(path, timestamps=timestamps, landmarks=landmarks)
+    read_timestamps, read = read_landmarks(path, start=1.0, end=2.0)
+    assert np.array_equal(read_timestamps, timestamps[30:60])
+    assert np.array_equal(read, landmarks[30:60], equal_nan=True)
+
+
+# The pose cache stores landmarks without timestamps
+def test_pose_cache_file_is_rejected(tmp_path):
+    cache = PoseCache(str(tmp_path / "cache"))
+    entry = cache.put("a" * 64, make_landmarks(33, 4), {"fps": FPS})
+    with pytest.raises(ValueError, match="no timestamps"):
+        read_landmarks(entry["landmarks_path"])
@@ -0,0 +1,76 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import live_analysis
+import pose_pool
+from live_analysis import LiveAnalyzer
+from pose_pool import LIVE_MAX_PER_CONFIG, get_pose_pool
+from synthetic_clips import render_clip
+from video_pipeline import run_serial
+
+POSE_OPTIONS = {"model_complexity": 1}
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("clips") / "player.mp4")
+    render_clip(path, 320, 240, 30, 1, "player")
+    return path
+
+
+# Function to wait until a live session has analyzed a frame or stopped with an error
+def wait_started(analyzer, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if analyzer.stats()["analyzed"] or analyzer.error:
+            return
+        time.sleep(0.05)
+    raise AssertionError("Live session never started analyzing")
+
+
+def stop_all(analyzers):
+    for analyzer in analyzers:
+        analyzer.stop()
+
+
+# A full house of live sessions, each holding an estimator, leaves video analysis its own
+def test_live_sessions_do_not_starve_video_analysis(clip):
+    analyzers = [LiveAnalyzer(clip, pose_options=POSE_OPTIONS).start() for _ in range(LIVE_MAX_PER_CONFIG)]
+    try:
+        for analyzer in analyzers:
+            wait_started(analyzer)
+            assert analyzer.error is None
+        pool = get_pose_pool()
+        pose = pool.acquire(timeout=30, **POSE_OPTIONS)
+        try:
+            cap = cv2.VideoCapture(clip)
+            landmarks = run_serial(cap, pose)
+            cap.release()
+        finally:
+            pool.release(pose, **POSE_OPTIONS)
+        assert landmarks.shape == (30, 33, 4)
+        assert not np.isnan(landmarks).all()
+    finally:
+        stop_all(analyzers)
+
+
+# A session beyond the live limit stops with an error instead of hanging
+def test_extra_live_session_fails_fast(clip, monkeypatch):
+    monkeypatch.setattr(pose_pool, "_live_pool", pose_pool.PosePool(max_per_config=1))
+    monkeypatch.setattr(live_analysis, "LIVE_ACQUIRE_TIMEOUT", 0.5)
+    first = LiveAnalyzer(clip, pose_options=POSE_OPTIONS).start()
+    try:
+        wait_started(first)
+        second = LiveAnalyzer(clip, pose_options=POSE_OPTIONS).start()
+        try:
+            wait_started(second, timeout=10)
+            assert "Too many live sessions" in second.error
+            assert first.error is None
+        finally:
+            second.stop()
+    finally:
+        first.stop()
+        pose_pool._live_pool.close()
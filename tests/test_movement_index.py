@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from movement_index import DRILL, FEATURE_DIM, MovementIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = MovementIndex(str(tmp_path / "index"))
+    rng = np.random.default_rng(0)
+    vectors = rng.random((20, FEATURE_DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index.add([{"vector": vector, "kind": "session", "player": f"P{i % 4}", "content_hash": str(i)}
+               for i, vector in enumerate(vectors)])
+    index.add_clip(vectors[0], kind=DRILL, label="Cone Dribbling Drill", skill="Dribbling")
+    return index, vectors
+
+
+def test_search_is_exact(index):
+    index, vectors = index
+    expected = np.argsort(-(vectors @ vectors[3]), kind="stable")[:5]
+    assert [match["row"] for match in index.search(vectors[3], k=5, kind="session")] == expected.tolist()
+
+
+@pytest.mark.parametrize("k", [0, -1, -5])
+def test_k_below_one_finds_nothing(index, k):
+    index, vectors = index
+    assert index.search(vectors[0], k=k) == []
+    assert index.similar_players(vectors[0], "P0", k=k) == []
+    assert index.match_drills(vectors[0], k=k) == []
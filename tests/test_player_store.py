@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+import player_store
+from player_store import AI, SELF, PlayerStore
+from skill_metrics import SKILLS
+
+pytest.importorskip("pyarrow")
+
+
+# Self-assessments carry no clip hash, so a chunk of only those has an all-None column
+def test_export_parquet_mixes_sources_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(player_store, "EXPORT_CHUNK_ROWS", 2)
+    store = PlayerStore(str(tmp_path / "history.db"))
+    ratings = {skill: 5 for skill in SKILLS}
+    store.append(
+        [{"player": "Sam", "source": SELF, "ratings": ratings, "recorded_at": 1000 + i} for i in range(3)]
+        + [{"player": "Sam", "source": AI, "ratings": ratings, "recorded_at": 2000 + i, "content_hash": f"{i:064x}"}
+           for i in range(3)]
+    )
+    path = tmp_path / "history.parquet"
+    assert store.export_parquet(str(path)) == 6
+
+    exported = pd.read_parquet(path)
+    expected = store.history()
+    assert exported["content_hash"].tolist() == expected["content_hash"].tolist()
+    assert exported["source"].tolist() == [SELF] * 3 + [AI] * 3
+    assert (exported["recorded_at"] == expected["recorded_at"]).all()
+    assert (exported[SKILLS] == 5).all().all()
+
+
+def test_export_parquet_with_no_rows(tmp_path):
+    store = PlayerStore(str(tmp_path / "history.db"))
+    path = tmp_path / "history.parquet"
+    assert store.export_parquet(str(path), player="Nobody") == 0
+    exported = pd.read_parquet(path)
+    assert exported.empty
+    assert list(exported.columns) == ["player", "recorded_at", "source", "content_hash", *SKILLS]
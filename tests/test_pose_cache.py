@@ -0,0 +1,30 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from pose_cache import PoseCache
+
+KEY = "a" * 64
+
+
+# Worker: store the same key over and over, each time with a freshly rendered "video"
+def put_repeatedly(cache_dir, worker, count):
+    cache = PoseCache(cache_dir)
+    for i in range(count):
+        video_path = f"{cache_dir}/render_{worker}_{i}.mp4"
+        with open(video_path, "wb") as f:
+            f.write(b"x" * 4096)
+        cache.put(KEY, np.zeros((5, 33, 4), dtype=np.float32), {"worker": worker}, video_path=video_path)
+    return count
+
+
+# Batch workers in separate processes storing the same clip must not fail each other
+def test_concurrent_puts_of_one_key(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    PoseCache(cache_dir)
+    with ProcessPoolExecutor(4, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(put_repeatedly, cache_dir, worker, 25) for worker in range(4)]
+        assert [future.result() for future in futures] == [25] * 4
+    entry = PoseCache(cache_dir).get(KEY)
+    assert entry is not None and entry["video_path"] is not None and entry["landmarks_path"] is not None
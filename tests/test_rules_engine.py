@@ -0,0 +1,79 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from rules_engine import RulesEngine, load_rules
+
+# The hard-coded rules the catalog replaced, as they were in ai_soccer_webapp
+LEGACY_FEEDBACK = {
+    "Dribbling": ("✅ Excellent ball control! Keep refining speed.",
+                  "⚠️ Decent dribbling, but improve control at higher speeds.",
+                  "❌ Struggles with dribbling. Focus on close ball control."),
+    "Passing": ("✅ Strong passing accuracy. Try increasing pass speed.",
+                "⚠️ Moderate passing. Work on consistency under pressure.",
+                "❌ Passing needs work. Focus on target accuracy."),
+    "Shooting": ("✅ Great shot power! Try improving shot placement.",
+                 "⚠️ Decent shooting. Work on shot angles.",
+                 "❌ Shooting needs improvement. Focus on follow-through."),
+    "Speed": ("✅ Fast sprint speed! Work on endurance.",
+              "⚠️ Average speed. Try explosive sprint drills.",
+              "❌ Speed is low. Focus on acceleration training."),
+    "Agility": ("✅ Quick footwork! Maintain consistency in lateral moves.",
+                "⚠️ Agility is decent. Improve quick direction changes.",
+                "❌ Agility needs improvement. Do ladder and cone drills."),
+}
+LEGACY_DRILLS = {
+    "Dribbling": ["Cone Dribbling Drill", "1v1 Dribble Challenge", "Fast Feet Drills"],
+    "Passing": ["Wall Passing Drill", "Triangle Passing", "Long Pass Accuracy"],
+    "Shooting": ["Target Shooting", "One-Touch Finishing", "Shooting Under Pressure"],
+    "Speed": ["Sprint Intervals", "Ladder Drills", "Reaction Sprint Training"],
+    "Agility": ["Cone Weaving", "Quick Change of Direction", "Lateral Hurdle Jumps"],
+}
+
+# Every whole rating, plus values just around and exactly on the thresholds of 5 and 7
+RATINGS = list(range(0, 11)) + [-1, 4.5, 4.999, 5.0, 5.001, 6.5, 6.999, 7.0, 7.001, 10.5]
+
+
+def legacy_feedback(skill, rating):
+    strong, decent, weak = LEGACY_FEEDBACK[skill]
+    if rating >= 7:
+        return strong, (0, 255, 0)
+    elif rating >= 5:
+        return decent, (255, 255, 0)
+    return weak, (0, 0, 255)
+
+
+def legacy_weakest(ratings):
+    return sorted(ratings.items(), key=lambda x: x[1])[0][0]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return RulesEngine(load_rules())
+
+
+@pytest.mark.parametrize("rating", RATINGS)
+def test_feedback_matches_hard_coded_thresholds(engine, rating):
+    ratings = {skill: rating for skill in LEGACY_FEEDBACK}
+    assert engine.feedback(ratings) == {skill: legacy_feedback(skill, rating) for skill in LEGACY_FEEDBACK}
+
+
+# Whole rating matrices go through the same levels as one player at a time
+def test_score_levels_match_hard_coded_thresholds(engine):
+    matrix = np.array([[rating] * len(engine.skills) for rating in RATINGS])
+    levels = engine.score(matrix, rng=0)["levels"]
+    for row, rating in zip(levels, RATINGS):
+        for skill, level in zip(engine.skills, row):
+            assert (engine.messages[engine.skills.index(skill), level], engine.colors[level]) == \
+                legacy_feedback(skill, rating)
+
+
+# Every combination of boundary ratings, ties included, picks the same weakest skill and its drills
+def test_weakest_skill_and_drills_match(engine):
+    for i, values in enumerate(itertools.product([4, 5, 7], repeat=len(LEGACY_DRILLS))):
+        ratings = dict(zip(LEGACY_DRILLS, values))
+        weakest, drills = engine.weakest_and_drills(ratings, rng=i)
+        assert weakest == legacy_weakest(ratings)
+        assert len(drills) == len(set(drills)) == 2
+        assert set(drills) <= set(LEGACY_DRILLS[weakest])
@@ -0,0 +1,62 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+import ai_soccer_webapp
+from scratch import ACTIVE_SECONDS, LEASE_FILE, ScratchFullError, ScratchSpace
+
+QUOTA = 64 * 1024
+
+
+# Function to fill a workspace with a file of `size` bytes, optionally making it look long idle
+def fill(workspace, size, idle=False):
+    with open(workspace.file(".bin"), "wb") as f:
+        f.write(b"\0" * size)
+    if idle:
+        past = time.time() - ACTIVE_SECONDS - 60
+        os.utime(os.path.join(workspace.path, LEASE_FILE), (past, past))
+
+
+def test_disk_workspace_evicts_idle_ones_for_what_it_needs(tmp_path):
+    scratch = ScratchSpace(str(tmp_path / "scratch"), max_bytes=QUOTA)
+    old = scratch.workspace()
+    fill(old, QUOTA // 2, idle=True)
+    scratch.workspace(needed=QUOTA // 2 + 1)
+    assert not old.exists()
+    assert scratch.evicted == 1
+
+
+def test_disk_workspace_raises_when_only_active_ones_are_left(tmp_path):
+    scratch = ScratchSpace(str(tmp_path / "scratch"), max_bytes=QUOTA)
+    fill(scratch.workspace(), QUOTA // 2)
+    with pytest.raises(ScratchFullError):
+        scratch.workspace(needed=QUOTA // 2 + 1)
+    # Nothing is written into an empty workspace, so opening one still works
+    assert scratch.workspace().exists()
+
+
+# Landmark exports from a batch run make room under the quota or fail, never pile up past it
+def test_landmark_exports_stay_under_quota(tmp_path, monkeypatch):
+    scratch = ScratchSpace(str(tmp_path / "scratch"), max_bytes=QUOTA)
+    monkeypatch.setattr(ai_soccer_webapp, "get_scratch", lambda: scratch)
+    landmarks = np.zeros((60, 33, 4), dtype=np.float32)
+    exports = []
+    for _ in range(5):
+        exported = ai_soccer_webapp.export_landmark_file(landmarks, 30, "npy")
+        exports.append(exported["path"])
+        # Let the export go idle, as once the user has downloaded it
+        past = time.time() - ACTIVE_SECONDS - 60
+        os.utime(os.path.join(os.path.dirname(exported["path"]), LEASE_FILE), (past, past))
+        assert scratch.usage()["bytes"] <= QUOTA
+    assert scratch.evicted > 0
+    assert os.path.exists(exports[-1])
+
+    # With every export still in use, one more does not fit
+    for path in exports:
+        if os.path.exists(path):
+            os.utime(os.path.join(os.path.dirname(path), LEASE_FILE))
+    with pytest.raises(ScratchFullError):
+        for _ in range(5):
+            ai_soccer_webapp.export_landmark_file(landmarks, 30, "npy")
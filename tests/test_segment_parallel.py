@@ -0,0 +1,42 @@
+import cv2
+import numpy as np
+import pytest
+
+from pose_pool import get_pose_pool
+from segment_parallel import MIN_SEGMENT_SECONDS, LocalPool, plan_segments, run_segmented
+from synthetic_clips import render_clip
+from video_pipeline import run_serial
+
+FPS = 10
+
+
+# Long enough for two segments of MIN_SEGMENT_SECONDS, at a low frame rate to keep it quick
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("clips") / "player.mp4")
+    render_clip(path, 320, 240, FPS, 2 * MIN_SEGMENT_SECONDS + 1, "player")
+    return path
+
+
+def test_plan_covers_every_frame_once():
+    plan = plan_segments(1000, 4, fps=10)
+    assert plan == [(0, 250), (250, 500), (500, 750), (750, None)]
+    # Too short for as many segments as asked
+    assert plan_segments(150, 4, fps=10) == [(0, None)]
+
+
+# Stitched segments give the serial result frame for frame, whichever mode was asked for
+@pytest.mark.parametrize("static_image_mode", [False, True])
+def test_two_segments_match_serial(clip, static_image_mode):
+    pose_options = {"model_complexity": 1, "static_image_mode": static_image_mode}
+    with LocalPool(2) as pool:
+        segmented = run_segmented(clip, pool, 2, pose_options)
+    serial_options = dict(pose_options, static_image_mode=True)
+    cap = cv2.VideoCapture(clip)
+    try:
+        with get_pose_pool().pose(**serial_options) as pose:
+            serial = run_serial(cap, pose)
+    finally:
+        cap.release()
+    assert segmented.shape == serial.shape == ((2 * MIN_SEGMENT_SECONDS + 1) * FPS, 33, 4)
+    assert np.array_equal(segmented, serial, equal_nan=True)
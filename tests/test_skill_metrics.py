@@ -0,0 +1,93 @@
+import math
+
+import numpy as np
+import pytest
+
+from skill_metrics import (
+    LEFT_ANKLE, LEFT_HIP, LEFT_KNEE, LEFT_SHOULDER, MIN_TRACKED_FRAMES, NEUTRAL_RATING, RIGHT_ANKLE, RIGHT_HIP,
+    RIGHT_KNEE, RIGHT_SHOULDER, SKILLS, compute_skill_metrics, rate_skills,
+)
+
+FPS = 30
+SECONDS = 4
+TORSO = 0.2
+
+
+# Function to build a (frames, 33, 4) landmark series of an upright player running along
+# path(t) -> (x, y) of the hips, with the feet swinging past each other step_hz times a second
+def running_player(path, step_hz=1.5, scale=1.0):
+    frames = FPS * SECONDS
+    landmarks = np.zeros((frames, 33, 4), dtype=np.float32)
+    for i in range(frames):
+        t = i / FPS
+        x, y = path(t)
+        swing = 0.05 * math.sin(2 * math.pi * step_hz / 2 * t)
+        joints = {
+            LEFT_SHOULDER: (x - 0.02, y - TORSO), RIGHT_SHOULDER: (x + 0.02, y - TORSO),
+            LEFT_HIP: (x - 0.02, y), RIGHT_HIP: (x + 0.02, y),
+            LEFT_ANKLE: (x + swing, y + 0.3), RIGHT_ANKLE: (x - swing, y + 0.3),
+            # Knees a little ahead of the hip-ankle line, so the legs are bent
+            LEFT_KNEE: (x + swing / 2 + 0.02, y + 0.15), RIGHT_KNEE: (x - swing / 2 + 0.04, y + 0.15),
+        }
+        for joint, (jx, jy) in joints.items():
+            landmarks[i, joint] = (0.5 + (jx - 0.5) * scale, 0.5 + (jy - 0.5) * scale, 0.0, 1.0)
+    return landmarks
+
+
+def straight(t):
+    return 0.1 + 3 * TORSO * t / SECONDS, 0.5
+
+
+def test_straight_run():
+    metrics = compute_skill_metrics(running_player(straight), FPS)
+    assert metrics["tracked_seconds"] == pytest.approx(SECONDS)
+    # 3 torso lengths over the clip, so 0.75 a second
+    assert metrics["speed"] == pytest.approx(0.75, rel=0.01)
+    assert metrics["acceleration"] == pytest.approx(0.0, abs=0.05)
+    assert metrics["direction_changes"] == 0
+    assert metrics["cadence"] == pytest.approx(1.5, abs=0.3)
+    assert metrics["hip_alignment"] == 1.0
+    assert metrics["trunk_sway"] == pytest.approx(0.0, abs=1e-6)
+    assert 5 < metrics["knee_flexion"] < 30
+
+
+# Distances are in torso lengths, so a player twice as far from the camera rates the same
+def test_metrics_do_not_depend_on_distance():
+    near = compute_skill_metrics(running_player(straight), FPS)
+    far = compute_skill_metrics(running_player(straight, scale=0.5), FPS)
+    for name, value in near.items():
+        assert far[name] == pytest.approx(value, rel=1e-3, abs=1e-3), name
+    assert rate_skills(near) == rate_skills(far)
+
+
+def test_zigzag_counts_direction_changes():
+    def zigzag(t):
+        leg = int(t * 2)
+        phase = t * 2 - leg
+        return 0.1 + 2 * TORSO * t, 0.5 + (phase if leg % 2 == 0 else 1 - phase) * 2 * TORSO
+    metrics = compute_skill_metrics(running_player(zigzag), FPS)
+    assert metrics["direction_changes"] > 0.5
+
+
+def test_faster_runner_rates_higher_for_speed():
+    slow = rate_skills(compute_skill_metrics(running_player(straight), FPS))
+    fast = rate_skills(compute_skill_metrics(running_player(lambda t: (0.1 + 4 * t / SECONDS, 0.5)), FPS))
+    assert fast["Speed"] > slow["Speed"]
+    assert set(fast) == set(SKILLS)
+    assert all(1 <= rating <= 10 for rating in fast.values())
+
+
+def test_too_few_tracked_frames():
+    landmarks = running_player(straight)
+    landmarks[MIN_TRACKED_FRAMES - 1:, [LEFT_HIP, RIGHT_HIP], 3] = 0.0
+    assert compute_skill_metrics(landmarks, FPS) is None
+
+
+# Feet out of frame: their metrics are NaN and Shooting, measured only from them, gets the neutral rating
+def test_hidden_feet():
+    landmarks = running_player(straight)
+    landmarks[:, [LEFT_ANKLE, RIGHT_ANKLE], 3] = 0.0
+    metrics = compute_skill_metrics(landmarks, FPS)
+    assert math.isnan(metrics["cadence"])
+    assert math.isnan(metrics["kick_speed"])
+    assert rate_skills(metrics)["Shooting"] == NEUTRAL_RATING
@@ -0,0 +1,30 @@
+import cv2
+import numpy as np
+import pytest
+
+from video_encoders import find_ffmpeg, open_encoder, output_size
+
+
+def test_output_size_is_even():
+    assert output_size(641, 481) == (640, 480)
+    assert output_size(1920, 1080) == (1920, 1080)
+    assert output_size(1921, 1081, "720p") == (1280, 720)
+    assert output_size(641, 481, "720p") == (640, 480)
+
+
+@pytest.mark.parametrize("backend", ["libx264", "opencv"])
+def test_odd_sized_clip_encodes(tmp_path, backend):
+    if backend == "libx264" and find_ffmpeg() is None:
+        pytest.skip("ffmpeg is not installed")
+    path = str(tmp_path / "odd.mp4")
+    size = (321, 241)
+    with open_encoder(path, 30, size, backend=backend) as out:
+        for i in range(10):
+            out.write(np.full((size[1], size[0], 3), i * 20, dtype=np.uint8))
+    assert out.stats()["frames"] == 10
+    cap = cv2.VideoCapture(path)
+    try:
+        assert (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))) == (320, 240)
+        assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 10
+    finally:
+        cap.release()
@@ -0,0 +1,40 @@
+import cv2
+import numpy as np
+import pytest
+
+from pose_pool import get_pose_pool
+from synthetic_clips import render_clip
+from video_pipeline import run_parallel, run_serial
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("clips") / "player.mp4")
+    render_clip(path, 320, 240, 30, 2, "player")
+    return path
+
+
+def analyze_serial(path, pose_options):
+    cap = cv2.VideoCapture(path)
+    try:
+        with get_pose_pool().pose(**pose_options) as pose:
+            return run_serial(cap, pose)
+    finally:
+        cap.release()
+
+
+def analyze_parallel(path, pose_options):
+    cap = cv2.VideoCapture(path)
+    try:
+        return run_parallel(cap, workers=2, chunk_size=8, pose_options=pose_options)
+    finally:
+        cap.release()
+
+
+# The app's default video mode: chunks on separate workers must still give the serial static-mode result
+@pytest.mark.parametrize("static_image_mode", [False, True])
+def test_parallel_matches_serial_static_mode(clip, static_image_mode):
+    parallel = analyze_parallel(clip, {"model_complexity": 1, "static_image_mode": static_image_mode})
+    serial = analyze_serial(clip, {"model_complexity": 1, "static_image_mode": True})
+    assert parallel.shape == serial.shape == (60, 33, 4)
+    assert np.array_equal(parallel, serial, equal_nan=True)
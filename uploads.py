@@ -0,0 +1,54 @@
+import hashlib
+import os
+import tempfile
+
+# Where uploaded clips are spooled to disk
+DEFAULT_UPLOAD_DIR = os.path.join(tempfile.gettempdir(), "ai_soccer_uploads")
+
+# Bytes copied per step when spooling uploads
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+# Function to yield a file-like object's bytes in bounded chunks.
+# Streamlit's UploadedFile is a BytesIO sharing the upload's buffer: read(n)
+# copies only n bytes, whereas read() or getbuffer() would copy the whole clip.
+def iter_chunks(fileobj, chunk_size=UPLOAD_CHUNK_SIZE):
+    fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+# Function to stream an upload to disk in chunks, hashing it in the same pass.
+# The file is named after its SHA-256, so re-uploading the same clip lands on the
+# same path. Returns (path, content_hash); the hash matches pose_cache.hash_video.
+def spool_upload(uploaded_file, upload_dir=DEFAULT_UPLOAD_DIR, chunk_size=UPLOAD_CHUNK_SIZE):
+    os.makedirs(upload_dir, exist_ok=True)
+    suffix = os.path.splitext(getattr(uploaded_file, "name", ""))[1].lower() or ".mp4"
+    digest = hashlib.sha256()
+    fd, partial_path = tempfile.mkstemp(suffix=".part", dir=upload_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in iter_chunks(uploaded_file, chunk_size):
+                digest.update(chunk)
+                f.write(chunk)
+        content_hash = digest.hexdigest()
+        path = os.path.join(upload_dir, content_hash + suffix)
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+        raise
+    return path, content_hash
+
+
+# Function to build a deferred download source for st.download_button.
+# The file is only read when the user clicks, not on every rerun. Streamlit holds the
+# whole file in memory to serve it, so this saves the per-rerun reads, not memory.
+def deferred_download(path):
+    def read():
+        with open(path, "rb") as f:
+            return f.read()
+    return read
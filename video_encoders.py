@@ -0,0 +1,290 @@
+import functools
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from fractions import Fraction
+
+
+# Output heights for the resolution presets; None keeps the source size.
+# Videos are only ever scaled down.
+RESOLUTION_PRESETS = {
+    "source": None,
+    "1080p": 1080,
+    "720p": 720,
+    "480p": 480,
+}
+
+# H.264 constant rate factor for each quality preset (lower is better and larger)
+QUALITY_PRESETS = {
+    "high": 18,
+    "balanced": 23,
+    "small": 28,
+}
+
+# VP9 (used for the transparent overlay track) has a 0-63 CRF scale, so the presets are shifted up
+VP9_CRF_OFFSET = 8
+
+# x264 speed preset: fast enough to keep up with rendering, still far smaller than mp4v
+X264_PRESET = "veryfast"
+
+# Hardware H.264 encoders tried in order, with how the CRF maps onto each one's constant-quality option
+HARDWARE_H264_ENCODERS = {
+    "h264_nvenc": lambda crf: ["-rc", "vbr", "-cq", str(crf), "-b:v", "0"],
+    "h264_qsv": lambda crf: ["-global_quality", str(crf)],
+    "h264_videotoolbox": lambda crf: ["-q:v", str(max(1, min(100, 100 - 2 * crf)))],
+    "h264_amf": lambda crf: ["-rc", "cqp", "-qp_i", str(crf), "-qp_p", str(crf)],
+}
+
+# Encoder backends selectable in process_video:
+#   auto    - H.264 through ffmpeg when it is installed, otherwise OpenCV
+#   h264    - ffmpeg with a hardware H.264 encoder if one works on this machine, else libx264
+#   libx264 - ffmpeg with the libx264 software encoder
+#   opencv  - cv2.VideoWriter with mp4v (MPEG-4 Part 2), the original output
+ENCODER_BACKENDS = ["auto", "h264", "libx264", "opencv"]
+
+# What process_video writes: (file name offered for download, MIME type)
+OUTPUT_FORMATS = {
+    "video": ("processed_video.mp4", "video/mp4"),
+    "overlay": ("overlay.webm", "video/webm"),
+    "landmarks": ("landmarks.npz", "application/octet-stream"),
+}
+
+
+# Function to find an ffmpeg binary: the system one, else the one bundled with imageio-ffmpeg if installed
+@functools.lru_cache(maxsize=None)
+def find_ffmpeg():
+    path = shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+    except ImportError:
+        return None
+    try:
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except RuntimeError:
+        return None
+
+
+# Function to list the hardware H.264 encoders that actually open on this machine.
+# ffmpeg builds often list encoders whose device is missing, so each one is probed with a one-frame encode.
+@functools.lru_cache(maxsize=None)
+def available_hardware_encoders(ffmpeg):
+    try:
+        listing = subprocess.run(
+            [ffmpeg, "-hide_banner", "-encoders"], capture_output=True, text=True, timeout=10
+        ).stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return ()
+    working = []
+    for codec in HARDWARE_H264_ENCODERS:
+        if f" {codec} " not in listing:
+            continue
+        probe = [
+            ffmpeg, "-hide_banner", "-loglevel", "error", "-f", "lavfi", "-i", "color=size=256x256:rate=1",
+            "-frames:v", "1", "-c:v", codec, "-f", "null", "-",
+        ]
+        try:
+            if subprocess.run(probe, capture_output=True, timeout=10).returncode == 0:
+                working.append(codec)
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+    return tuple(working)
+
+
+# Function to turn a container's frame rate into an exact fraction (29.97 -> 30000/1001)
+def exact_fps(fps):
+    fps = Fraction(float(fps) or 30).limit_denominator(1001)
+    return fps if fps > 0 else Fraction(30)
+
+
+# Function to compute the output frame size for a resolution preset, keeping the
+# aspect ratio and even dimensions (required by yuv420p)
+def output_size(width, height, resolution="source"):
+    if resolution not in RESOLUTION_PRESETS:
+        raise ValueError(f"Unknown resolution preset: {resolution}")
+    target = RESOLUTION_PRESETS[resolution]
+    if target is None or height <= target:
+        # Odd source sizes are rounded down (one row or column is scaled away)
+        return max(2, width // 2 * 2), max(2, height // 2 * 2)
+    return max(2, round(width * target / height / 2) * 2), target
+
+
+# Function to open a capture, letting OpenCV use a hardware decoder when hw_decode is set.
+# OpenCV falls back to software decoding when no hardware decoder is available.
+def open_capture(video_path, hw_decode=False):
+    # OpenCV is imported where it is used so the app can read the presets above without loading it
+    import cv2
+    if hw_decode:
+        return cv2.VideoCapture(
+            video_path, cv2.CAP_ANY, [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        )
+    return cv2.VideoCapture(video_path)
+
+
+# Common bookkeeping for the encoders: frame count, time spent encoding and output size
+class _Encoder:
+    backend = None
+    codec = None
+
+    def __init__(self, path):
+        self.path = path
+        self.frames = 0
+        self.seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    # Function to report encode throughput and output size once the encoder is closed
+    def stats(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {
+            "backend": self.backend,
+            "codec": self.codec,
+            "frames": self.frames,
+            "seconds": self.seconds,
+            "fps": self.frames / self.seconds if self.seconds else None,
+            "bytes": size,
+        }
+
+
+# Encoder using cv2.VideoWriter with mp4v, the original output path.
+# Frames are resized here when a smaller resolution preset is chosen.
+class OpenCVEncoder(_Encoder):
+    backend = "opencv"
+    codec = "mp4v"
+
+    def __init__(self, path, fps, size, out_size=None):
+        super().__init__(path)
+        self.size = size
+        self.out_size = out_size or size
+        import cv2
+        self._writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), float(fps), self.out_size)
+        if not self._writer.isOpened():
+            raise RuntimeError(f"OpenCV could not open a video writer for {path}")
+
+    def write(self, frame):
+        start = time.perf_counter()
+        if self.out_size != self.size:
+            import cv2
+            frame = cv2.resize(frame, self.out_size, interpolation=cv2.INTER_AREA)
+        self._writer.write(frame)
+        self.seconds += time.perf_counter() - start
+        self.frames += 1
+
+    def close(self):
+        start = time.perf_counter()
+        self._writer.release()
+        self.seconds += time.perf_counter() - start
+
+    def abort(self):
+        self._writer.release()
+
+
+# Encoder piping raw frames into an ffmpeg subprocess.
+# The frame rate is passed as an exact fraction; scaling happens inside ffmpeg.
+# With alpha=True frames are BGRA and the output is VP9 with an alpha channel in WebM.
+class FFmpegEncoder(_Encoder):
+    backend = "ffmpeg"
+
+    def __init__(self, path, fps, size, out_size=None, codec="libx264", crf=QUALITY_PRESETS["balanced"],
+                 alpha=False, ffmpeg=None):
+        super().__init__(path)
+        ffmpeg = ffmpeg or find_ffmpeg()
+        if ffmpeg is None:
+            raise RuntimeError("ffmpeg was not found; install it or choose the OpenCV encoder")
+        self.codec = codec
+        self.size = size
+        self.channels = 4 if alpha else 3
+        fps = exact_fps(fps)
+        out_size = out_size or size
+        command = [
+            ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgra" if alpha else "bgr24",
+            "-s", f"{size[0]}x{size[1]}", "-r", f"{fps.numerator}/{fps.denominator}", "-i", "-",
+        ]
+        if out_size != size:
+            command += ["-vf", f"scale={out_size[0]}:{out_size[1]}:flags=area"]
+        if alpha:
+            command += ["-c:v", codec, "-pix_fmt", "yuva420p", "-crf", str(crf), "-b:v", "0",
+                        "-deadline", "realtime", "-cpu-used", "8", "-row-mt", "1"]
+        else:
+            if codec == "libx264":
+                command += ["-c:v", codec, "-preset", X264_PRESET, "-crf", str(crf)]
+            else:
+                command += ["-c:v", codec] + HARDWARE_H264_ENCODERS[codec](crf)
+            # yuv420p and a leading moov atom so browsers can start playing before the download ends
+            command += ["-pix_fmt", "yuv420p", "-movflags", "+faststart"]
+        command.append(path)
+        # stderr goes to a file: a pipe nobody reads could fill up and stall ffmpeg
+        self._stderr = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self._stderr)
+
+    def _error(self):
+        self._stderr.seek(0)
+        message = self._stderr.read().decode("utf-8", "replace").strip()
+        return RuntimeError(f"ffmpeg ({self.codec}) failed: {message or 'exit code ' + str(self._proc.returncode)}")
+
+    def write(self, frame):
+        import numpy as np
+        if frame.shape[:2] != (self.size[1], self.size[0]) or frame.shape[2] != self.channels:
+            raise ValueError(f"Expected {self.size[0]}x{self.size[1]} frames with {self.channels} channels")
+        start = time.perf_counter()
+        try:
+            self._proc.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            self._proc.wait()
+            raise self._error() from None
+        self.seconds += time.perf_counter() - start
+        self.frames += 1
+
+    def close(self):
+        start = time.perf_counter()
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._proc.wait()
+        self.seconds += time.perf_counter() - start
+        try:
+            if self._proc.returncode != 0:
+                raise self._error()
+        finally:
+            self._stderr.close()
+
+    def abort(self):
+        self._proc.kill()
+        self._proc.wait()
+        self._stderr.close()
+
+
+# Function to open an encoder for the chosen backend and presets.
+# alpha=True writes a transparent overlay track (needs ffmpeg); the path's extension should be .webm.
+def open_encoder(path, fps, size, backend="auto", resolution="source", quality="balanced", alpha=False):
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend: {backend}")
+    if quality not in QUALITY_PRESETS:
+        raise ValueError(f"Unknown quality preset: {quality}")
+    out_size = output_size(size[0], size[1], resolution)
+    crf = QUALITY_PRESETS[quality]
+    ffmpeg = find_ffmpeg()
+    if alpha:
+        if ffmpeg is None:
+            raise RuntimeError("Writing the overlay track needs ffmpeg")
+        return FFmpegEncoder(path, fps, size, out_size, codec="libvpx-vp9", crf=crf + VP9_CRF_OFFSET, alpha=True, ffmpeg=ffmpeg)
+    if backend == "opencv" or (backend == "auto" and ffmpeg is None):
+        return OpenCVEncoder(path, fps, size, out_size)
+    codec = "libx264"
+    if backend == "h264" and ffmpeg is not None:
+        hardware = available_hardware_encoders(ffmpeg)
+        if hardware:
+            codec = hardware[0]
+    return FFmpegEncoder(path, fps, size, out_size, codec=codec, crf=crf, ffmpeg=ffmpeg)
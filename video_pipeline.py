@@ -0,0 +1,420 @@
+import multiprocessing
+import os
+import queue
+import threading
+import traceback
+
+import cv2
+import numpy as np
+
+from pipeline_metrics import NULL_TIMER, get_metrics
+from pose_pool import get_pose_pool
+
+# Frames handed to a worker process in one task
+DEFAULT_CHUNK_SIZE = 16
+
+# Chunks allowed in flight per worker (queued, being processed or waiting to be written)
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+
+# MediaPipe Pose returns 33 landmarks, each with x, y, z and visibility
+NUM_LANDMARKS = 33
+
+
+# Function to pick a sensible default worker count for this machine
+def default_worker_count():
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+# Radius and color of the keypoint dots drawn on each landmark
+KEYPOINT_RADIUS = 8
+KEYPOINT_COLOR = (0, 255, 0)
+
+
+# Function to find the pixel offsets cv2.circle fills for a dot of this radius,
+# so every keypoint of a frame can be stamped in one indexing operation
+def _disk_offsets(radius):
+    size = 2 * radius + 1
+    canvas = np.zeros((size, size), dtype=np.uint8)
+    cv2.circle(canvas, (radius, radius), radius, 255, -1)
+    dy, dx = np.nonzero(canvas)
+    return dy - radius, dx - radius
+
+
+_DISK_DY, _DISK_DX = _disk_offsets(KEYPOINT_RADIUS)
+
+# One BGR pixel as a single 3-byte item
+_PIXEL = np.dtype((np.void, 3))
+
+# Keypoint color on a BGRA overlay canvas
+KEYPOINT_COLOR_BGRA = KEYPOINT_COLOR + (255,)
+
+# Player number labels drawn in multi-player videos
+PLAYER_LABEL_COLOR = (255, 255, 255)
+PLAYER_LABEL_COLOR_BGRA = PLAYER_LABEL_COLOR + (255,)
+
+
+# Growable (frames, 33, 4) float32 landmark array, preallocated from the
+# container's frame count so the per-frame loop only writes into rows
+class LandmarkBuffer:
+    def __init__(self, capacity=0):
+        self._data = np.empty((max(1, capacity), NUM_LANDMARKS, 4), dtype=np.float32)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, count):
+        needed = self._size + count
+        if needed > len(self._data):
+            grown = np.empty((max(needed, 2 * len(self._data)), NUM_LANDMARKS, 4), dtype=np.float32)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+
+    # Function to hand out the next (33, 4) row for the caller to fill in
+    def next_row(self):
+        self._reserve(1)
+        row = self._data[self._size]
+        self._size += 1
+        return row
+
+    def append(self, landmarks):
+        self.next_row()[:] = landmarks
+
+    def extend(self, landmarks):
+        self._reserve(len(landmarks))
+        self._data[self._size:self._size + len(landmarks)] = landmarks
+        self._size += len(landmarks)
+
+    def array(self):
+        return self._data[:self._size]
+
+
+# Function to write Pose results into a (33, 4) float32 array of x, y, z, visibility.
+# Frames without a detected pose come back as all-NaN.
+def landmarks_to_array(results, out=None):
+    if out is None:
+        out = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+    if not results.pose_landmarks:
+        out[:] = np.nan
+        return out
+    for i, lm in enumerate(results.pose_landmarks.landmark):
+        out[i] = (lm.x, lm.y, lm.z, lm.visibility)
+    return out
+
+
+# Function to draw keypoints from a (33, 4) landmark array, or a (players, 33, 4) one,
+# onto a BGR (or BGRA) frame. All dots are stamped with one indexed write over the
+# frame's pixels (viewed as 3- or 4-byte items), touching exactly the pixels cv2.circle would fill.
+def draw_landmark_array(frame, landmarks, color=KEYPOINT_COLOR):
+    h, w = frame.shape[:2]
+    points = landmarks[..., :2].reshape(-1, 2).astype(np.float64) * (w, h)
+    points = points[~np.isnan(points).any(axis=1)].astype(np.intp)
+    if not len(points):
+        return
+    xs = points[:, 0, None] + _DISK_DX
+    ys = points[:, 1, None] + _DISK_DY
+    inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+    if frame.flags.c_contiguous:
+        pixel = _PIXEL if frame.shape[2] == 3 else np.dtype((np.void, frame.shape[2]))
+        pixels = frame.view(pixel).reshape(-1)
+        np.put(pixels, (ys * w + xs)[inside], np.array(color, dtype=np.uint8).view(pixel)[0])
+    else:
+        frame[ys[inside], xs[inside]] = color
+
+
+# Function to label each player of a (players, 33, 4) landmark array "P1", "P2", ...
+# just above their head, matching the order of the per-player ratings
+def draw_player_labels(frame, players, color=PLAYER_LABEL_COLOR):
+    h, w = frame.shape[:2]
+    for number, landmarks in enumerate(players, start=1):
+        ys = landmarks[:, 1]
+        if np.isnan(ys).all():
+            continue
+        x = int(np.nanmean(landmarks[:, 0]) * w)
+        y = int(np.nanmin(ys) * h) - 2 * KEYPOINT_RADIUS
+        cv2.putText(frame, f"P{number}", (x - 12, max(20, y)), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+
+
+# Function to draw the detailed AI feedback panel onto a BGR frame
+def draw_feedback(frame, ai_feedback):
+    # Keep detailed AI feedback text on screen at all times with smaller font
+    y_offset = 50
+    font_scale = 0.6  # Reduce font size
+    font_thickness = 1  # Reduce thickness for smaller text
+    for skill, (text, color) in ai_feedback.items():
+        cv2.rectangle(frame, (30, y_offset - 20), (800, y_offset + 10), (0, 0, 0), -1)  # Background for readability
+        cv2.putText(frame, text, (40, y_offset), cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, font_thickness, cv2.LINE_AA)
+        y_offset += 30  # Reduce spacing for compact display
+
+
+# The feedback panel does not change during a video, so it is rendered once per
+# frame size and alpha-blended onto every frame. The panel is drawn over black and
+# over white: pixels that come out the same are fully covered, and the difference
+# gives the alpha of anti-aliased text edges that spill past the backgrounds.
+class FeedbackOverlay:
+    def __init__(self, ai_feedback):
+        self.ai_feedback = ai_feedback
+        self._shape = None
+
+    def _render(self, shape):
+        over_black = np.zeros(shape, dtype=np.uint8)
+        over_white = np.full(shape, 255, dtype=np.uint8)
+        draw_feedback(over_black, self.ai_feedback)
+        draw_feedback(over_white, self.ai_feedback)
+        alpha = (255 - (over_white.astype(np.int16) - over_black)).astype(np.float32) / 255
+        color = over_black.astype(np.float32)
+        self._shape = shape
+        self._roi = None
+        covered = (alpha > 0).any(axis=2)
+        if not covered.any():
+            return
+        ys, xs = np.nonzero(covered)
+        self._roi = (slice(ys.min(), ys.max() + 1), slice(xs.min(), xs.max() + 1))
+        alpha, color = alpha[self._roi], color[self._roi]
+        opaque = (alpha >= 1.0).all(axis=2)
+        self._opaque = opaque.astype(np.uint8)
+        self._panel = over_black[self._roi]
+        self._partial = np.nonzero(covered[self._roi] & ~opaque)
+        self._partial_color = color[self._partial]
+        self._partial_keep = 1.0 - alpha[self._partial]
+
+    def apply(self, frame):
+        if frame.shape != self._shape:
+            self._render(frame.shape)
+        if self._roi is None:
+            return frame
+        region = frame[self._roi]
+        cv2.copyTo(self._panel, self._opaque, region)
+        if len(self._partial[0]):
+            under = region[self._partial].astype(np.float32)
+            region[self._partial] = (self._partial_color + under * self._partial_keep + 0.5).astype(np.uint8)
+        return frame
+
+    # Function to render the panel alone as a BGRA image with transparent background
+    def layer(self, shape):
+        over_black = np.zeros(shape, dtype=np.uint8)
+        over_white = np.full(shape, 255, dtype=np.uint8)
+        draw_feedback(over_black, self.ai_feedback)
+        draw_feedback(over_white, self.ai_feedback)
+        alpha = (255 - (over_white.astype(np.int16) - over_black)).max(axis=2)
+        # over_black holds color premultiplied by alpha; undo that for straight alpha
+        color = over_black.astype(np.float32) * 255 / np.maximum(alpha, 1)[..., None]
+        return np.dstack([np.clip(color + 0.5, 0, 255).astype(np.uint8), alpha.astype(np.uint8)])
+
+
+# Function to run pose estimation on one BGR frame.
+# Landmarks go into `out` (a (33, 4) row) when given; returns the landmark array.
+def analyze_frame(frame, pose, out=None, timer=NULL_TIMER):
+    image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    timer.lap("convert")
+    landmarks = landmarks_to_array(pose.process(image_rgb), out)
+    timer.lap("pose")
+    return landmarks
+
+
+# Function to estimate the frame count of a capture for preallocating landmark storage
+def expected_frame_count(cap):
+    return max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+
+
+# Function to run pose estimation over a whole video on the calling thread.
+# on_frames(n), if given, is called after every n analyzed frames.
+# max_frames stops after that many frames (e.g. at the end of a segment).
+# Returns the (frames, 33, 4) landmark array.
+def run_serial(cap, pose, on_frames=None, max_frames=None):
+    expected = expected_frame_count(cap)
+    landmarks = LandmarkBuffer(expected if max_frames is None else min(expected, max_frames))
+    timer = get_metrics().timer()
+    while cap.isOpened() and (max_frames is None or len(landmarks) < max_frames):
+        timer.start()
+        ret, frame = cap.read()
+        if not ret:
+            break
+        timer.lap("decode")
+        analyze_frame(frame, pose, landmarks.next_row(), timer)
+        if on_frames is not None:
+            on_frames(1)
+    return landmarks.array()
+
+
+# Function to draw landmarks and the feedback panel onto every frame of a video.
+# landmarks is the (frames, 33, 4) array from one of the analysis passes, or the
+# (frames, players, 33, 4) one from multi-player analysis (players are then labelled).
+# max_frames stops after that many frames (e.g. at the end of a segment).
+def render_video(cap, out, landmarks, ai_feedback, on_frames=None, max_frames=None):
+    overlay = FeedbackOverlay(ai_feedback)
+    timer = get_metrics().timer()
+    index = 0
+    while cap.isOpened() and (max_frames is None or index < max_frames):
+        timer.start()
+        ret, frame = cap.read()
+        if not ret:
+            break
+        timer.lap("decode")
+        if index < len(landmarks):
+            draw_landmark_array(frame, landmarks[index])
+            if landmarks.ndim == 4:
+                draw_player_labels(frame, landmarks[index])
+        timer.lap("draw")
+        overlay.apply(frame)
+        timer.lap("overlay")
+        out.write(frame)
+        timer.lap("encode")
+        index += 1
+        if on_frames is not None:
+            on_frames(1)
+
+
+# Function to render only the keypoints and feedback panel on a transparent BGRA
+# canvas, one frame per landmark row. No video is decoded.
+def render_overlay(out, landmarks, ai_feedback, size, on_frames=None):
+    width, height = size
+    panel = FeedbackOverlay(ai_feedback).layer((height, width, 3))
+    frame = np.empty_like(panel)
+    timer = get_metrics().timer()
+    for row in landmarks:
+        timer.start()
+        frame[:] = panel
+        timer.lap("overlay")
+        draw_landmark_array(frame, row, KEYPOINT_COLOR_BGRA)
+        if row.ndim == 3:
+            draw_player_labels(frame, row, PLAYER_LABEL_COLOR_BGRA)
+        timer.lap("draw")
+        out.write(frame)
+        timer.lap("encode")
+        if on_frames is not None:
+            on_frames(1)
+
+
+# Worker process: run pose estimation on chunks of frames with its own pooled Pose model.
+# With collect_metrics set, the stage timings of each chunk are sent back along with it.
+def _worker_main(tasks, results, pose_options, collect_metrics=False):
+    try:
+        metrics = get_metrics()
+        metrics.enable(collect_metrics, sample_memory=False)
+        timer = metrics.timer()
+        with get_pose_pool().pose(**pose_options) as pose:
+            while True:
+                task = tasks.get()
+                if task is None:
+                    break
+                index, frames = task
+                # Chunks arrive out of order, so never carry tracking state across them
+                pose.reset()
+                landmarks = np.empty((len(frames), NUM_LANDMARKS, 4), dtype=np.float32)
+                for frame, row in zip(frames, landmarks):
+                    timer.start()
+                    analyze_frame(frame, pose, row, timer)
+                results.put((index, landmarks, metrics.drain() if collect_metrics else None))
+    except Exception:
+        results.put((None, traceback.format_exc(), None))
+
+
+# Reader stage: decode frames into chunks and feed them to the workers
+def _read_chunks(cap, tasks, slots, stop, chunk_size, state):
+    index = 0
+    timer = get_metrics().timer()
+    try:
+        while not stop.is_set():
+            frames = []
+            while len(frames) < chunk_size:
+                timer.start()
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                timer.lap("decode")
+                frames.append(frame)
+            if not frames:
+                break
+            # Wait for a free slot so decoded frames never pile up beyond the budget
+            while not slots.acquire(timeout=0.1):
+                if stop.is_set():
+                    return
+            tasks.put((index, frames))
+            index += 1
+            if len(frames) < chunk_size:
+                break
+    except Exception:
+        state["error"] = traceback.format_exc()
+    finally:
+        state["chunks"] = index
+
+
+# Function to analyze a video with a reader thread, a pool of worker processes
+# running pose inference on chunks of frames, and an in-order collector.
+# Chunks land on different estimators, so no tracking state can carry across them:
+# every frame is detected on its own (static_image_mode is forced on) and the
+# landmarks match run_serial in static image mode frame for frame. Warming each chunk
+# up on the frames before it does not help, as video-mode tracking never converges
+# back to the serial path. A worker that dies fails the run instead of stalling it.
+# Returns the (frames, 33, 4) landmark array.
+def run_parallel(cap, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, pose_options=None, on_frames=None):
+    workers = workers or default_worker_count()
+    pose_options = dict(pose_options or {}, static_image_mode=True)
+    metrics = get_metrics()
+    max_in_flight = workers * CHUNKS_IN_FLIGHT_PER_WORKER
+
+    ctx = multiprocessing.get_context("spawn")
+    tasks = ctx.Queue(maxsize=max_in_flight)
+    results = ctx.Queue(maxsize=max_in_flight)
+    procs = [
+        ctx.Process(target=_worker_main, args=(tasks, results, pose_options, metrics.enabled), daemon=True)
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+
+    slots = threading.Semaphore(max_in_flight)
+    stop = threading.Event()
+    reader_state = {"chunks": None, "error": None}
+    reader = threading.Thread(
+        target=_read_chunks, args=(cap, tasks, slots, stop, chunk_size, reader_state), daemon=True
+    )
+    reader.start()
+
+    pending = {}
+    next_index = 0
+    landmarks = LandmarkBuffer(expected_frame_count(cap))
+    try:
+        while True:
+            if reader_state["error"]:
+                raise RuntimeError(f"Frame reader failed:\n{reader_state['error']}")
+            if reader_state["chunks"] is not None and next_index >= reader_state["chunks"]:
+                break
+            try:
+                index, payload, worker_metrics = results.get(timeout=0.1)
+            except queue.Empty:
+                # Workers only exit once told to, so any exit now (OOM kill, crash) has lost its chunk
+                exited = [proc.exitcode for proc in procs if proc.exitcode is not None]
+                if exited:
+                    raise RuntimeError(f"A pose worker exited unexpectedly (exit code {exited[0]})")
+                continue
+            if index is None:
+                raise RuntimeError(f"Pose worker failed:\n{payload}")
+            if worker_metrics is not None:
+                metrics.merge(worker_metrics)
+            pending[index] = payload
+            # Collector stage: keep chunks strictly in decode order
+            while next_index in pending:
+                chunk_landmarks = pending.pop(next_index)
+                landmarks.extend(chunk_landmarks)
+                next_index += 1
+                slots.release()
+                if on_frames is not None:
+                    on_frames(len(chunk_landmarks))
+    finally:
+        stop.set()
+        reader.join()
+        for _ in procs:
+            try:
+                tasks.put(None, timeout=1)
+            except queue.Full:
+                break
+        for proc in procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        tasks.cancel_join_thread()
+        results.cancel_join_thread()
+    return landmarks.array()